@@ -0,0 +1,333 @@
+"""
+Admission control for the Emotion Analyzer app.
+Bounds how many requests run inference at once and how many may wait for a
+slot, drops work whose deadline passed before it reaches the model, and
+rate-limits each client with a token bucket. Rejections carry a status code
+and a Retry-After hint so the server can answer fast instead of queueing
+work nobody will read.
+"""
+import os
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+
+from app.metrics import Counter, Histogram
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Admission settings
+ENABLE_ADMISSION_CONTROL = os.environ.get("ENABLE_ADMISSION_CONTROL", "True").lower() == "true"
+# Requests running inference at once, and requests allowed to wait behind them
+# (keep the concurrency at least BATCH_MAX_SIZE so micro-batches can fill)
+ADMISSION_MAX_CONCURRENCY = int(os.environ.get("ADMISSION_MAX_CONCURRENCY", "16"))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "64"))
+# Deadline used when the client sends none; 0 disables the default deadline
+DEFAULT_DEADLINE_MS = float(os.environ.get("DEFAULT_DEADLINE_MS", "30000"))
+# Per-client token bucket; a rate of 0 disables rate limiting
+RATE_LIMIT_PER_SECOND = float(os.environ.get("RATE_LIMIT_PER_SECOND", "0"))
+RATE_LIMIT_BURST = float(os.environ.get("RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_MAX_CLIENTS = int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", "10000"))
+
+# Remaining time budget in milliseconds, as set by the client or a proxy
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+
+ADMISSION_REJECTED_TOTAL = Counter("emotion_admission_rejected_total", "Requests rejected by admission control by reason")
+ADMISSION_WAIT_SECONDS = Histogram("emotion_admission_wait_seconds", "Time admitted requests waited for an inference slot")
+
+
+class AdmissionError(Exception):
+    """Raised when a request is not admitted; maps to an HTTP error with Retry-After"""
+
+    status_code = 503
+    reason = "overloaded"
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+class RateLimited(AdmissionError):
+    """The client used up its token bucket"""
+
+    status_code = 429
+    reason = "rate_limited"
+
+class QueueFull(AdmissionError):
+    """Every inference slot is busy and the wait queue is full"""
+
+    reason = "queue_full"
+
+class DeadlineExceeded(AdmissionError):
+    """The request's deadline passed before inference started"""
+
+    reason = "deadline"
+
+
+def parse_deadline(header_value: Optional[str], default_ms: float = DEFAULT_DEADLINE_MS) -> Optional[float]:
+    """
+    Turn a deadline header into an absolute time.monotonic() deadline
+
+    Args:
+        header_value: Remaining budget in milliseconds, or None
+        default_ms: Budget used when the header is missing or invalid
+
+    Returns:
+        The deadline, or None when the request has no deadline
+    """
+    budget_ms = default_ms
+    if header_value:
+        try:
+            budget_ms = float(header_value)
+        except ValueError:
+            logger.debug(f"Ignoring invalid {DEADLINE_HEADER} header: {header_value!r}")
+    if budget_ms <= 0:
+        return None
+    return time.monotonic() + budget_ms / 1000.0
+
+def remaining_seconds(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left before a deadline, or None when there is no deadline"""
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def check_deadline(deadline: Optional[float], stage: str = "inference"):
+    """Raise DeadlineExceeded if the deadline has passed"""
+    if deadline is not None and time.monotonic() >= deadline:
+        ADMISSION_REJECTED_TOTAL.inc(reason=DeadlineExceeded.reason, stage=stage)
+        raise DeadlineExceeded(f"Request deadline expired before {stage}")
+
+
+class AdmissionController:
+    """
+    Bounded concurrency with a bounded wait queue.
+
+    A request first reserves a place (running or waiting), which fails fast
+    when max_concurrency + max_queue requests are already admitted, then
+    waits for a running slot until its deadline. The two steps are separate
+    so an async server can reserve on its event loop and wait on a worker.
+    """
+
+    def __init__(self, max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+                 max_queue: int = ADMISSION_MAX_QUEUE):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self._cond = threading.Condition()
+        self._admitted = 0
+        self._active = 0
+        # Moving average of how long a slot is held, for Retry-After
+        self._avg_service_seconds = 0.1
+
+    def reserve(self):
+        """Reserve a running or waiting place; raise QueueFull if there is none"""
+        with self._cond:
+            if self._admitted >= self.max_concurrency + self.max_queue:
+                ADMISSION_REJECTED_TOTAL.inc(reason=QueueFull.reason, stage="admission")
+                raise QueueFull("Server is busy, try again later", self._estimated_wait_locked())
+            self._admitted += 1
+
+    def acquire(self, deadline: Optional[float] = None):
+        """
+        Wait for a running slot with a reserved place
+
+        Raises:
+            DeadlineExceeded: If the deadline passes while waiting; the
+                reservation is released
+        """
+        started = time.perf_counter()
+        with self._cond:
+            while self._active >= self.max_concurrency:
+                remaining = remaining_seconds(deadline)
+                if remaining is not None and remaining <= 0:
+                    self._admitted -= 1
+                    ADMISSION_REJECTED_TOTAL.inc(reason=DeadlineExceeded.reason, stage="queue")
+                    raise DeadlineExceeded("Request deadline expired while queued",
+                                           self._estimated_wait_locked())
+                self._cond.wait(remaining)
+            self._active += 1
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - started)
+        return time.perf_counter()
+
+    def release(self, acquired_at: Optional[float] = None):
+        """Free a running slot taken by acquire()"""
+        with self._cond:
+            self._active -= 1
+            self._admitted -= 1
+            if acquired_at is not None:
+                held = time.perf_counter() - acquired_at
+                self._avg_service_seconds = 0.9 * self._avg_service_seconds + 0.1 * held
+            self._cond.notify()
+
+    def cancel(self):
+        """Drop a reservation that never acquired a slot"""
+        with self._cond:
+            self._admitted -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def admit(self, deadline: Optional[float] = None):
+        """Reserve, wait for a slot and run the body; raises AdmissionError when refused"""
+        self.reserve()
+        acquired_at = self.acquire(deadline)
+        try:
+            yield
+        finally:
+            self.release(acquired_at)
+
+    def reservation(self, deadline: Optional[float] = None) -> "Reservation":
+        """Reserve a place now and hand the wait for a slot to a worker thread"""
+        self.reserve()
+        return Reservation(self, deadline)
+
+    def _estimated_wait_locked(self) -> float:
+        waiting = max(0, self._admitted - self._active)
+        return (waiting + 1) * self._avg_service_seconds / self.max_concurrency
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._admitted - self._active,
+                "avg_service_ms": round(self._avg_service_seconds * 1000, 3),
+            }
+
+
+class Reservation:
+    """
+    A reserved place handed from an event loop to an inference thread.
+
+    The loop reserves (and is refused fast when full), the worker waits for
+    the slot and runs the call. If the awaiting request goes away before the
+    worker picks the call up, abandon() returns the place.
+    """
+
+    def __init__(self, controller: AdmissionController, deadline: Optional[float] = None):
+        self.controller = controller
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self._state = "reserved"
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Wait for a slot and call fn; runs on the worker thread"""
+        with self._lock:
+            if self._state != "reserved":
+                raise DeadlineExceeded("Request was abandoned before inference started")
+            self._state = "started"
+        acquired_at = self.controller.acquire(self.deadline)
+        try:
+            check_deadline(self.deadline)
+            return fn(*args, **kwargs)
+        finally:
+            self.controller.release(acquired_at)
+
+    def abandon(self):
+        """Return the place if run() never started; safe to call after it did"""
+        with self._lock:
+            if self._state == "reserved":
+                self._state = "abandoned"
+                self.controller.cancel()
+
+
+def run_admitted(fn: Callable[..., Any], *args, deadline: Optional[float] = None, **kwargs) -> Any:
+    """
+    Run a blocking inference call in an admission slot on this thread
+
+    Raises:
+        AdmissionError: When the queue is full or the deadline passes first
+    """
+    if not ENABLE_ADMISSION_CONTROL:
+        check_deadline(deadline)
+        return fn(*args, **kwargs)
+    with get_admission_controller().admit(deadline):
+        check_deadline(deadline)
+        return fn(*args, **kwargs)
+
+
+class TokenBucketLimiter:
+    """
+    Per-client token buckets refilled at a fixed rate.
+
+    Buckets live in an LRU map capped at max_clients, so a flood of distinct
+    addresses cannot grow memory without bound; an evicted client simply
+    starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, burst: float = RATE_LIMIT_BURST,
+                 max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_clients = max(1, max_clients)
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key: Optional[str], cost: float = 1.0):
+        """
+        Take tokens from a client's bucket
+
+        Raises:
+            RateLimited: If the bucket does not hold enough tokens
+        """
+        if self.rate <= 0:
+            return
+        key = key or "unknown"
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [self.burst, now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < cost:
+                retry_after = (cost - bucket[0]) / self.rate
+                ADMISSION_REJECTED_TOTAL.inc(reason=RateLimited.reason, stage="rate_limit")
+                raise RateLimited("Rate limit exceeded, slow down", retry_after)
+            bucket[0] -= cost
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"rate": self.rate, "burst": self.burst, "clients": len(self._buckets)}
+
+
+# Shared instances
+_admission_controller = None
+_rate_limiter = None
+_instances_lock = threading.Lock()
+
+def get_admission_controller() -> AdmissionController:
+    """Return the process-wide admission controller, creating it on first use"""
+    global _admission_controller
+    if _admission_controller is None:
+        with _instances_lock:
+            if _admission_controller is None:
+                _admission_controller = AdmissionController()
+    return _admission_controller
+
+def get_rate_limiter() -> TokenBucketLimiter:
+    """Return the process-wide per-client rate limiter, creating it on first use"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _instances_lock:
+            if _rate_limiter is None:
+                _rate_limiter = TokenBucketLimiter()
+    return _rate_limiter
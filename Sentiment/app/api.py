@@ -1,26 +1,137 @@
-from flask import Flask, request, jsonify
-from predict import predict_emotions
-from db import save_prediction  # NEW
+"""
+Inference-only API for the Emotion Analyzer model
+A slim Flask app without MongoDB, templates or CORS. It imports only the
+prediction path and loads the model in the background, so it answers
+/health/live as soon as Flask is up.
+
+Usage:
+    python -m app.api
+"""
+from flask import Flask, Response, request, jsonify, g
+from app.predict import (
+    predict_emotions, is_model_loaded, is_model_ready,
+    get_model_load_error, start_model_loading
+)
+from app.scheduler import get_scheduler, predict_bulk, ENABLE_MICRO_BATCHING
+from app.cache import get_prediction_cache, ENABLE_PREDICTION_CACHE
+from app.metrics import render_metrics, REQUEST_TEXT_CHARS, REQUESTS_TOTAL, ERRORS_TOTAL
+from app.admission import AdmissionError, DEADLINE_HEADER, get_rate_limiter, parse_deadline, run_admitted
+from functools import wraps
+import os
 
 app = Flask(__name__)
 
+BATCH_MAX_TEXTS = int(os.environ.get('BATCH_MAX_TEXTS', 1000))
+
+# Load the model in the background so the server binds right away
+start_model_loading()
+
+def admission_controlled(view):
+    """Rate-limit the client and attach the request deadline as g.deadline"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        get_rate_limiter().check(request.remote_addr)
+        g.deadline = parse_deadline(request.headers.get(DEADLINE_HEADER))
+        return view(*args, **kwargs)
+    return wrapper
+
+def analyze_text(text, deadline=None):
+    """Predict emotions for one text through the cache, admission control and micro-batcher"""
+    if ENABLE_MICRO_BATCHING:
+        compute = lambda: run_admitted(lambda: get_scheduler().predict(text, deadline=deadline), deadline=deadline)
+    else:
+        compute = lambda: run_admitted(predict_emotions, text, deadline=deadline)
+
+    if ENABLE_PREDICTION_CACHE:
+        return get_prediction_cache().get_or_compute(text, compute, deadline=deadline)
+    return compute()
+
 @app.route('/predict', methods=['POST'])
+@admission_controlled
 def predict():
-    data = request.get_json()
-    if not data or 'text' not in data:
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('text'), str):
         return jsonify({"error": "Please provide 'text' field in JSON body"}), 400
 
-    text = data['text']
+    text = data['text'].strip()
+    if not text:
+        return jsonify({"error": "Input text cannot be empty"}), 400
+    if len(text) > 512:
+        return jsonify({"error": "Input text too long. Max 512 characters allowed"}), 400
+    REQUEST_TEXT_CHARS.observe(len(text))
+
+    try:
+        return jsonify({"emotions": analyze_text(text, g.deadline)})
+    except AdmissionError:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"Prediction error: {str(e)}"}), 500
 
+@app.route('/api/predict/batch', methods=['POST'])
+@admission_controlled
+def predict_batch():
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('texts'), list) or not data['texts']:
+        return jsonify({"error": "Please provide a 'texts' list in JSON body"}), 400
+    if len(data['texts']) > BATCH_MAX_TEXTS:
+        return jsonify({"error": f"Too many texts. Max {BATCH_MAX_TEXTS} texts allowed per request"}), 400
     try:
-        emotions = predict_emotions(text)
-        top_emotions = dict(list(emotions.items())[:5])
-        
-        save_prediction(text, top_emotions)  # NEW
+        top_n = int(data.get('top_n', 5))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'top_n' must be an integer"}), 400
+
+    texts = []
+    for index, text in enumerate(data['texts']):
+        if not isinstance(text, str) or not text.strip():
+            return jsonify({"error": f"Text at index {index} cannot be empty"}), 400
+        if len(text.strip()) > 512:
+            return jsonify({"error": f"Text at index {index} too long. Max 512 characters allowed"}), 400
+        texts.append(text.strip())
+        REQUEST_TEXT_CHARS.observe(len(texts[-1]))
 
-        return jsonify({"emotions": top_emotions})
+    try:
+        deadline = g.deadline
+        results = run_admitted(lambda: predict_bulk(texts, top_n=top_n, deadline=deadline), deadline=deadline)
+    except AdmissionError:
+        raise
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"error": f"Prediction error: {str(e)}"}), 500
+    return jsonify({"results": [{"emotions": emotions} for emotions in results], "count": len(results)})
+
+@app.route('/health/live')
+def liveness_check():
+    return jsonify({"status": "alive"})
+
+@app.route('/health/ready')
+def readiness_check():
+    # Retries a failed background load once its backoff has passed
+    start_model_loading()
+    if is_model_ready():
+        return jsonify({"status": "ready"})
+    response = {"status": "loading" if is_model_loaded() else "not_ready"}
+    if get_model_load_error():
+        response["status"] = "failed"
+        response["error"] = get_model_load_error()
+    return jsonify(response), 503
+
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+@app.errorhandler(AdmissionError)
+def admission_error(error):
+    response = jsonify({"error": str(error), "reason": error.reason})
+    response.status_code = error.status_code
+    response.headers["Retry-After"] = error.retry_after_header
+    return response
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or "unmatched"
+    REQUESTS_TOTAL.inc(endpoint=endpoint, status=response.status_code)
+    if response.status_code >= 400:
+        ERRORS_TOTAL.inc(endpoint=endpoint, status=response.status_code)
+    return response
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    app.run(host="0.0.0.0", port=int(os.environ.get('PORT', 5000)), threaded=True)
@@ -0,0 +1,319 @@
+"""
+Local model artifact store for the Emotion Analyzer app.
+Downloads a pinned Hub revision once into MODEL_ARTIFACT_DIR with a checksum
+manifest, and loads its safetensors weights as views over a memory-mapped
+file, so boots are page-cache hits and processes share the weight pages.
+"""
+import os
+import json
+import time
+import shutil
+import struct
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Artifact settings
+MODEL_ARTIFACT_DIR = os.environ.get("MODEL_ARTIFACT_DIR", os.path.join(os.path.dirname(__file__), "model_artifacts"))
+# Strict offline mode: never touch the network, fail fast if the artifact is missing
+MODEL_OFFLINE = os.environ.get("MODEL_OFFLINE", "False").lower() == "true"
+# Expected sha256 of the weights file; checked on fetch and on "sha256" verification
+MODEL_ARTIFACT_SHA256 = os.environ.get("MODEL_ARTIFACT_SHA256", "").lower()
+# Startup verification: "none", "size" (default) or "sha256" (reads every byte)
+MODEL_ARTIFACT_VERIFY = os.environ.get("MODEL_ARTIFACT_VERIFY", "size").lower()
+
+MANIFEST_FILE = "manifest.json"
+WEIGHTS_FILE = "model.safetensors"
+ARTIFACT_PATTERNS = [
+    "config.json", "vocab.txt", "tokenizer.json", "tokenizer_config.json", "special_tokens_map.json",
+    "*.safetensors", "pytorch_model.bin",
+]
+
+
+class ArtifactError(RuntimeError):
+    """Raised when a model artifact is missing or fails verification"""
+
+
+def _safe_name(value: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in value)
+
+def _repo_dir(repo_id: str) -> str:
+    return os.path.join(MODEL_ARTIFACT_DIR, _safe_name(repo_id))
+
+def _is_commit(revision: str) -> bool:
+    return len(revision) == 40 and all(c in "0123456789abcdef" for c in revision)
+
+def _ref_path(repo_id: str, revision: str) -> str:
+    return os.path.join(_repo_dir(repo_id), "refs", _safe_name(revision))
+
+def sha256_file(path: str, chunk_size: int = 8 * 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Lookup and verification
+
+def find_artifact(repo_id: str, revision: str) -> Optional[str]:
+    """
+    Return the local artifact directory for a repo revision, if present
+
+    Branch and tag names resolve through the refs file written at fetch time,
+    so a pinned artifact keeps being used until it is fetched again.
+    """
+    commit = revision
+    if not _is_commit(revision):
+        try:
+            with open(_ref_path(repo_id, revision)) as f:
+                commit = f.read().strip()
+        except OSError:
+            return None
+    path = os.path.join(_repo_dir(repo_id), commit)
+    return path if os.path.isfile(os.path.join(path, MANIFEST_FILE)) else None
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+def verify_artifact(path: str, mode: str = MODEL_ARTIFACT_VERIFY) -> Dict[str, Any]:
+    """
+    Check the artifact files against its manifest
+
+    Args:
+        path: Artifact directory
+        mode: "none", "size" or "sha256"
+
+    Returns:
+        The manifest
+
+    Raises:
+        ArtifactError: If a file is missing or does not match
+    """
+    manifest = read_manifest(path)
+    if MODEL_ARTIFACT_SHA256 and manifest["files"].get(WEIGHTS_FILE, {}).get("sha256") != MODEL_ARTIFACT_SHA256:
+        raise ArtifactError(f"Artifact {path} was not built from weights with sha256 {MODEL_ARTIFACT_SHA256}")
+    if mode == "none":
+        return manifest
+
+    started = time.perf_counter()
+    for name, expected in manifest["files"].items():
+        file_path = os.path.join(path, name)
+        if not os.path.isfile(file_path):
+            raise ArtifactError(f"Artifact file missing: {file_path}")
+        if os.path.getsize(file_path) != expected["size"]:
+            raise ArtifactError(f"Artifact file has the wrong size: {file_path}")
+        if mode == "sha256" and sha256_file(file_path) != expected["sha256"]:
+            raise ArtifactError(f"Artifact file checksum mismatch: {file_path}")
+    logger.info(f"Verified model artifact ({mode}) in {time.perf_counter() - started:.2f}s")
+    return manifest
+
+
+# Fetching
+
+def fetch_artifact(repo_id: str, revision: str, token: Optional[str] = None, force: bool = False) -> str:
+    """
+    Download a repo revision into the artifact store
+
+    The revision is resolved to a commit, the tokenizer, config and weights
+    are downloaded, a pytorch_model.bin checkpoint is converted to
+    safetensors, and a manifest with per-file sha256 checksums is written.
+    The directory appears atomically once complete.
+
+    Args:
+        repo_id: Hub model id
+        revision: Branch, tag or commit to pin
+        token: Optional Hub token
+        force: Download again even if the artifact exists
+
+    Returns:
+        Path of the artifact directory
+    """
+    if MODEL_OFFLINE:
+        raise ArtifactError("MODEL_OFFLINE is set; refusing to download the model artifact")
+    from huggingface_hub import HfApi, snapshot_download
+
+    commit = HfApi().model_info(repo_id, revision=revision, token=token).sha
+    path = os.path.join(_repo_dir(repo_id), commit)
+    if os.path.isfile(os.path.join(path, MANIFEST_FILE)) and not force:
+        logger.info(f"Model artifact for {repo_id}@{commit} already present")
+    else:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        logger.info(f"Downloading {repo_id}@{commit} into the artifact store")
+        # Real files, not symlinks into the Hub cache, so the store is self-contained
+        snapshot_download(repo_id, revision=commit, token=token, local_dir=tmp_path,
+                          local_dir_use_symlinks=False, allow_patterns=ARTIFACT_PATTERNS)
+
+        bin_path = os.path.join(tmp_path, "pytorch_model.bin")
+        if not os.path.exists(os.path.join(tmp_path, WEIGHTS_FILE)) and os.path.exists(bin_path):
+            _convert_to_safetensors(bin_path, os.path.join(tmp_path, WEIGHTS_FILE))
+        if os.path.exists(bin_path):
+            os.remove(bin_path)
+        if not os.path.exists(os.path.join(tmp_path, WEIGHTS_FILE)):
+            raise ArtifactError(f"{repo_id}@{commit} has no safetensors or pytorch_model.bin weights")
+
+        files = {}
+        for name in sorted(os.listdir(tmp_path)):
+            file_path = os.path.join(tmp_path, name)
+            if os.path.isfile(file_path):
+                files[name] = {"size": os.path.getsize(file_path), "sha256": sha256_file(file_path)}
+        if MODEL_ARTIFACT_SHA256 and files[WEIGHTS_FILE]["sha256"] != MODEL_ARTIFACT_SHA256:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise ArtifactError(f"Downloaded weights sha256 {files[WEIGHTS_FILE]['sha256']} "
+                                f"does not match MODEL_ARTIFACT_SHA256 {MODEL_ARTIFACT_SHA256}")
+
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+            json.dump({
+                "repo_id": repo_id,
+                "revision": revision,
+                "commit": commit,
+                "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "files": files
+            }, f, indent=2)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        logger.info(f"Stored model artifact at {path} (weights sha256 {files[WEIGHTS_FILE]['sha256']})")
+
+    if not _is_commit(revision):
+        ref_path = _ref_path(repo_id, revision)
+        os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+        with open(f"{ref_path}.tmp", "w") as f:
+            f.write(commit)
+        os.replace(f"{ref_path}.tmp", ref_path)
+    return path
+
+def _convert_to_safetensors(bin_path: str, out_path: str):
+    import torch
+    from safetensors.torch import save_file
+    state_dict = torch.load(bin_path, map_location="cpu")
+    save_file({name: tensor.contiguous() for name, tensor in state_dict.items()}, out_path, metadata={"format": "pt"})
+    logger.info(f"Converted {os.path.basename(bin_path)} to safetensors")
+
+def resolve_artifact(repo_id: str, revision: str, token: Optional[str] = None) -> str:
+    """
+    Return a verified artifact directory, fetching it once when allowed
+
+    Raises:
+        ArtifactError: In offline mode when the artifact is missing, or when
+            verification fails
+    """
+    path = find_artifact(repo_id, revision)
+    if path is None:
+        if MODEL_OFFLINE:
+            raise ArtifactError(f"No local artifact for {repo_id}@{revision} in {MODEL_ARTIFACT_DIR} "
+                                f"and MODEL_OFFLINE is set; run 'python fetch_model.py' first")
+        path = fetch_artifact(repo_id, revision, token=token)
+    verify_artifact(path)
+    return path
+
+
+# Memory-mapped loading
+
+_SAFETENSORS_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+def load_safetensors_mmap(path: str):
+    """
+    Return a state dict whose tensors are views over a mapping of the file
+
+    The mapping is private (copy-on-write), so the weights stay page-cache
+    pages shared by every process that maps the same file, and nothing the
+    process does can modify the file.
+    """
+    import torch
+
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+    header.pop("__metadata__", None)
+    data_start = 8 + header_size
+
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=os.path.getsize(path))
+    state_dict = {}
+    for name, info in header.items():
+        dtype = getattr(torch, _SAFETENSORS_DTYPES[info["dtype"]])
+        begin, end = info["data_offsets"]
+        itemsize = torch.empty((), dtype=dtype).element_size()
+        offset = data_start + begin
+        if offset % itemsize:
+            # Misaligned entries cannot be viewed in place; copy just this one
+            raw = torch.empty(0, dtype=torch.uint8).set_(storage, offset, (end - begin,))
+            tensor = raw.clone().view(dtype).reshape(info["shape"])
+        else:
+            tensor = torch.empty(0, dtype=dtype).set_(storage, offset // itemsize, info["shape"])
+        state_dict[name] = tensor
+    return state_dict
+
+def materialize_buffers(model, config) -> bool:
+    """
+    Recreate the non-persistent buffers left on the meta device
+
+    They are not stored in the weights file, so load_state_dict never
+    assigns them. Returns False if a buffer is not one BERT is known to use.
+    """
+    import torch
+
+    for module in model.modules():
+        for name, buffer in list(module.named_buffers(recurse=False)):
+            if buffer is None or not buffer.is_meta:
+                continue
+            if name == "position_ids":
+                value = torch.arange(config.max_position_embeddings).expand((1, -1))
+            elif name == "token_type_ids":
+                value = torch.zeros((1, config.max_position_embeddings), dtype=torch.long)
+            else:
+                logger.warning(f"Cannot rebuild buffer {name} of {type(module).__name__}")
+                return False
+            module.register_buffer(name, value, persistent=False)
+    return True
+
+def load_model_mmap(path: str, **config_kwargs):
+    """
+    Build BertForSequenceClassification with weights mapped from the artifact
+
+    Falls back to from_pretrained when the installed torch cannot assign
+    mapped tensors as parameters.
+    """
+    import inspect
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification
+
+    weights_path = os.path.join(path, WEIGHTS_FILE)
+    if "assign" not in inspect.signature(torch.nn.Module.load_state_dict).parameters:
+        logger.warning("torch < 2.1 cannot assign mapped tensors; loading weights into memory")
+        return BertForSequenceClassification.from_pretrained(path, local_files_only=True, **config_kwargs)
+
+    started = time.perf_counter()
+    config = BertConfig.from_pretrained(path, local_files_only=True, **config_kwargs)
+    # Build the skeleton on the meta device so no fp32 copy of the weights is
+    # allocated and randomly initialized before the mapped tensors replace it
+    with torch.device("meta"):
+        model = BertForSequenceClassification(config)
+    state_dict = load_safetensors_mmap(weights_path)
+    missing, unexpected = model.load_state_dict(state_dict, strict=False, assign=True)
+    if missing:
+        # Legacy key names need from_pretrained's renaming rules
+        logger.warning(f"Weights missing from {weights_path} ({missing[:5]}); loading with from_pretrained")
+        return BertForSequenceClassification.from_pretrained(path, local_files_only=True, **config_kwargs)
+    if not materialize_buffers(model, config):
+        logger.warning(f"Loading {path} with from_pretrained instead")
+        return BertForSequenceClassification.from_pretrained(path, local_files_only=True, **config_kwargs)
+    if unexpected:
+        logger.warning(f"Unused weights in {weights_path}: {unexpected}")
+    model.requires_grad_(False)
+    logger.info(f"Mapped {len(state_dict)} tensors from {weights_path} in {time.perf_counter() - started:.2f}s")
+    return model
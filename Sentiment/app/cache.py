@@ -0,0 +1,345 @@
+"""
+Prediction cache for the Emotion Analyzer app.
+Bounded LRU/TTL cache keyed by normalized text and model identity, with
+in-flight coalescing so concurrent identical requests share one forward pass.
+An optional SQLite store persists results across restarts and processes.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Iterable, List, Optional, Any
+from dotenv import load_dotenv
+
+from app.predict import get_model_identity, predict_emotions_batch
+from app.admission import DeadlineExceeded, remaining_seconds
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Cache settings
+ENABLE_PREDICTION_CACHE = os.environ.get("ENABLE_PREDICTION_CACHE", "True").lower() == "true"
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "3600"))
+
+# Disk store settings (disabled unless a path is configured)
+PREDICTION_DISK_CACHE_PATH = os.environ.get("PREDICTION_DISK_CACHE_PATH", "")
+PREDICTION_CACHE_WARMUP_SIZE = int(os.environ.get("PREDICTION_CACHE_WARMUP_SIZE", "500"))
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so texts that tokenize identically share a cache entry"""
+    return " ".join(text.split())
+
+def make_cache_key(text: str, model_identity: Optional[str] = None) -> str:
+    """Hash the normalized text together with the model identity"""
+    if model_identity is None:
+        model_identity = get_model_identity()
+    payload = f"{model_identity}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class DiskPredictionStore:
+    """
+    SQLite-backed prediction store shared by every process on one box.
+
+    The database runs in WAL mode so readers in other worker processes are
+    never blocked by a writer. Each thread (and each forked process) opens
+    its own connection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "key TEXT PRIMARY KEY, "
+            "emotions TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        conn.commit()
+        logger.info(f"Disk prediction store opened at {path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening it after a fork"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Dict[str, float]]:
+        """Return a stored prediction or None"""
+        row = self._connection().execute(
+            "SELECT emotions FROM predictions WHERE key = ?", (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def contains_many(self, keys: List[str]) -> set:
+        """Return the subset of keys already present in the store"""
+        found = set()
+        conn = self._connection()
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = conn.execute(
+                f"SELECT key FROM predictions WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            found.update(row[0] for row in rows)
+        return found
+
+    def put_many(self, items: Iterable[tuple]):
+        """Store (key, emotions) pairs in one transaction"""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO predictions (key, emotions, created_at) VALUES (?, ?, ?)",
+                [(key, json.dumps(emotions), now) for key, emotions in items]
+            )
+
+    def put(self, key: str, emotions: Dict[str, float]):
+        """Store a single prediction"""
+        self.put_many([(key, emotions)])
+
+    def count(self) -> int:
+        """Return the number of stored predictions"""
+        return self._connection().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and single-flight computation.
+
+    When a disk store is attached, memory misses are looked up there before
+    computing, and computed results are written through to it.
+    """
+
+    def __init__(self, max_size: int = PREDICTION_CACHE_SIZE, ttl: float = PREDICTION_CACHE_TTL,
+                 disk_store: Optional[DiskPredictionStore] = None):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.disk_store = disk_store
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        # Cache statistics
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._disk_hits = 0
+        self._disk_errors = 0
+
+    def _get_locked(self, key: str) -> Optional[Dict[str, float]]:
+        """Look up a live entry; the caller must hold the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self._expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key: str) -> Optional[Dict[str, float]]:
+        """Return a cached prediction or None"""
+        with self._lock:
+            value = self._get_locked(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return dict(value)
+
+    def set(self, key: str, value: Dict[str, float]):
+        """Store a prediction, evicting the least recently used entries if full"""
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._entries[key] = (dict(value), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get_or_compute(self, text: str, compute: Callable[[], Dict[str, float]],
+                       deadline: Optional[float] = None) -> Dict[str, float]:
+        """
+        Return the cached prediction for a text, computing it at most once
+
+        Concurrent callers asking for the same uncached text wait on the
+        first caller's result instead of running their own forward pass,
+        but never past their own deadline.
+
+        Args:
+            text: Input text to analyze
+            compute: Callable producing the prediction on a cache miss
+            deadline: Absolute time.monotonic() deadline, or None
+
+        Returns:
+            Dictionary mapping emotion labels to probabilities
+
+        Raises:
+            DeadlineExceeded: If the deadline passes while waiting on another caller
+        """
+        key = make_cache_key(text)
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                self._hits += 1
+                return dict(value)
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self._coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self._misses += 1
+                leader = True
+
+        if not leader:
+            remaining = remaining_seconds(deadline)
+            try:
+                return dict(future.result(timeout=max(0.0, remaining) if remaining is not None else None))
+            except FutureTimeoutError:
+                raise DeadlineExceeded("Request deadline expired waiting for a coalesced prediction")
+
+        try:
+            value = self._disk_get(key)
+            if value is None:
+                value = compute()
+                self._disk_put(key, value)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return dict(value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _disk_get(self, key: str) -> Optional[Dict[str, float]]:
+        """Look up the disk store, treating store errors as misses"""
+        if self.disk_store is None:
+            return None
+        try:
+            value = self.disk_store.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Disk prediction store read failed: {str(e)}")
+            with self._lock:
+                self._disk_errors += 1
+            return None
+        if value is not None:
+            with self._lock:
+                self._disk_hits += 1
+        return value
+
+    def _disk_put(self, key: str, value: Dict[str, float]):
+        """Write through to the disk store without failing the request"""
+        if self.disk_store is None:
+            return
+        try:
+            self.disk_store.put(key, value)
+        except sqlite3.Error as e:
+            logger.warning(f"Disk prediction store write failed: {str(e)}")
+            with self._lock:
+                self._disk_errors += 1
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "inflight": len(self._inflight),
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "disk_store": self.disk_store.path if self.disk_store else None,
+                "disk_hits": self._disk_hits,
+                "disk_errors": self._disk_errors,
+            }
+
+
+# Shared cache instance
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_prediction_cache() -> PredictionCache:
+    """Return the process-wide prediction cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                disk_store = None
+                if PREDICTION_DISK_CACHE_PATH:
+                    try:
+                        disk_store = DiskPredictionStore(PREDICTION_DISK_CACHE_PATH)
+                    except sqlite3.Error as e:
+                        logger.error(f"Could not open disk prediction store: {str(e)}")
+                _cache = PredictionCache(disk_store=disk_store)
+    return _cache
+
+def warm_up_disk_store(texts: List[str], batch_size: int = 64) -> int:
+    """
+    Pre-populate the disk store with predictions for the given texts
+
+    Args:
+        texts: Texts to score, typically the most frequent past inputs
+        batch_size: Number of texts scored per batch
+
+    Returns:
+        Number of new predictions written to the store
+    """
+    store = get_prediction_cache().disk_store
+    if store is None or not texts:
+        return 0
+
+    model_identity = get_model_identity()
+    keyed = {make_cache_key(text, model_identity): text for text in texts}
+    existing = store.contains_many(list(keyed))
+    missing = [(key, text) for key, text in keyed.items() if key not in existing]
+
+    for start in range(0, len(missing), batch_size):
+        chunk = missing[start:start + batch_size]
+        results = predict_emotions_batch([text for _, text in chunk])
+        store.put_many(zip([key for key, _ in chunk], results))
+
+    logger.info(f"Disk prediction store warm-up added {len(missing)} of {len(keyed)} texts")
+    return len(missing)
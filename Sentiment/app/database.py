@@ -2,14 +2,21 @@
 Database module for MongoDB integration with the Emotion Analyzer app.
 This module handles all database operations including connection and CRUD operations.
 """
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, DESCENDING
+from pymongo.errors import BulkWriteError
 from datetime import datetime
+import asyncio
+import base64
+import json
 import logging
+import threading
+import time
 from typing import Dict, List, Optional, Any
 from bson import ObjectId
 import os
 from dotenv import load_dotenv
 import ssl
+from app.metrics import DB_WRITE_SECONDS, gauge_lines, register_collector
 
 # Load environment variables from .env file
 load_dotenv()
@@ -23,13 +30,22 @@ logger = logging.getLogger(__name__)
 MONGO_URI = os.environ.get("MONGO_URI", "")
 DB_NAME = os.environ.get("DB_NAME", "emotion_analyzer")
 
-# Safety check to prevent hardcoded credentials in logs
-if not MONGO_URI:
-    logger.error("MONGO_URI environment variable is not set")
-    raise ValueError("MONGO_URI environment variable is not set")
-
 # Database and collection names
 PREDICTIONS_COLLECTION = "predictions"
+STATS_COLLECTION = "prediction_stats"
+
+# Write-behind buffer settings
+WRITE_BUFFER_ENABLED = os.environ.get("WRITE_BUFFER_ENABLED", "True").lower() == "true"
+WRITE_BUFFER_MAX_SIZE = int(os.environ.get("WRITE_BUFFER_MAX_SIZE", "10000"))
+WRITE_BUFFER_BATCH_SIZE = int(os.environ.get("WRITE_BUFFER_BATCH_SIZE", "100"))
+WRITE_BUFFER_FLUSH_INTERVAL = float(os.environ.get("WRITE_BUFFER_FLUSH_INTERVAL", "1.0"))
+WRITE_BUFFER_PUT_TIMEOUT = float(os.environ.get("WRITE_BUFFER_PUT_TIMEOUT", "0.05"))
+
+# Seconds an estimated document count is reused before asking the server again
+COUNT_CACHE_TTL = float(os.environ.get("COUNT_CACHE_TTL", "30"))
+
+# Fields left out of listing queries
+LIST_PROJECTION = {"request_info": 0}
 
 # MongoDB client instance
 client = None
@@ -38,6 +54,13 @@ db = None
 async def connect_to_mongodb():
     """Establish connection to MongoDB"""
     global client, db
+    # Imported on first connect; motor is only needed once the app talks to MongoDB
+    from motor.motor_asyncio import AsyncIOMotorClient
+    # Checked here rather than at import, so inference-only code paths can
+    # import this module without a database configured
+    if not MONGO_URI:
+        logger.error("MONGO_URI environment variable is not set")
+        raise ValueError("MONGO_URI environment variable is not set")
     try:
         # Don't log the full URI as it contains credentials
         logger.info(f"Connecting to MongoDB cluster...")
@@ -61,6 +84,9 @@ async def connect_to_mongodb():
         
         # Create indexes for better performance
         await db[PREDICTIONS_COLLECTION].create_index("timestamp")
+        # Supports keyset pagination over (timestamp, _id)
+        await db[PREDICTIONS_COLLECTION].create_index([("timestamp", DESCENDING), ("_id", DESCENDING)])
+        await db[STATS_COLLECTION].create_index([("kind", 1), ("date", -1)])
         
         return db
     except Exception as e:
@@ -74,6 +100,21 @@ async def close_mongodb_connection():
         logger.info("Closing MongoDB connection")
         client.close()
 
+def build_prediction_doc(text: str, emotions: Dict[str, float],
+                         request_info: Optional[Dict[str, Any]] = None,
+                         timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+    """Build the document stored for a single prediction"""
+    prediction_doc = {
+        "text": text,
+        "emotions": emotions,
+        "timestamp": timestamp or datetime.utcnow(),
+    }
+    
+    # Add request info if provided
+    if request_info:
+        prediction_doc["request_info"] = request_info
+    return prediction_doc
+
 async def save_prediction(text: str, emotions: Dict[str, float], 
                          request_info: Optional[Dict[str, Any]] = None) -> str:
     """
@@ -88,17 +129,10 @@ async def save_prediction(text: str, emotions: Dict[str, float],
         The ID of the inserted document
     """
     try:
-        prediction_doc = {
-            "text": text,
-            "emotions": emotions,
-            "timestamp": datetime.utcnow(),
-        }
-        
-        # Add request info if provided
-        if request_info:
-            prediction_doc["request_info"] = request_info
-            
-        result = await db[PREDICTIONS_COLLECTION].insert_one(prediction_doc)
+        prediction_doc = build_prediction_doc(text, emotions, request_info)
+        with DB_WRITE_SECONDS.time():
+            result = await db[PREDICTIONS_COLLECTION].insert_one(prediction_doc)
+        await try_update_stats([prediction_doc])
         prediction_id = str(result.inserted_id)
         logger.info(f"Saved prediction with ID: {prediction_id}")
         return prediction_id
@@ -106,6 +140,323 @@ async def save_prediction(text: str, emotions: Dict[str, float],
         logger.error(f"Error saving prediction: {str(e)}")
         raise
 
+async def save_predictions(texts: List[str], emotions_list: List[Dict[str, float]],
+                           request_info: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Save several predictions to the database with a single bulk insert
+    
+    Args:
+        texts: The input texts that were analyzed
+        emotions_list: Dictionary of emotions and their scores for each text
+        request_info: Optional dictionary containing request metadata shared by all texts
+        
+    Returns:
+        The IDs of the inserted documents, in input order
+    """
+    try:
+        timestamp = datetime.utcnow()
+        prediction_docs = [
+            build_prediction_doc(text, emotions, request_info, timestamp)
+            for text, emotions in zip(texts, emotions_list)
+        ]
+        
+        if not prediction_docs:
+            return []
+        
+        with DB_WRITE_SECONDS.time():
+            result = await db[PREDICTIONS_COLLECTION].insert_many(prediction_docs)
+        await try_update_stats(prediction_docs)
+        prediction_ids = [str(inserted_id) for inserted_id in result.inserted_ids]
+        logger.info(f"Saved {len(prediction_ids)} predictions in bulk")
+        return prediction_ids
+    except Exception as e:
+        logger.error(f"Error saving predictions: {str(e)}")
+        raise
+
+class PredictionWriteBuffer:
+    """
+    Write-behind buffer for prediction documents
+    
+    Request threads hand documents over with put() and return immediately.
+    A flusher task on the database event loop writes them with
+    insert_many(ordered=False) whenever a batch fills up or the flush
+    interval passes. When the buffer is full, put() blocks for at most
+    put_timeout seconds before dropping the document.
+    """
+    
+    def __init__(self, max_size: int = WRITE_BUFFER_MAX_SIZE,
+                 batch_size: int = WRITE_BUFFER_BATCH_SIZE,
+                 flush_interval: float = WRITE_BUFFER_FLUSH_INTERVAL,
+                 put_timeout: float = WRITE_BUFFER_PUT_TIMEOUT):
+        self.max_size = max(1, max_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        
+        self._docs: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task = None
+        self._stopping = False
+        
+        # Buffer statistics
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._flushes = 0
+        self._last_batch_size = 0
+        self._total_flush_seconds = 0.0
+        self._max_flush_seconds = 0.0
+    
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Start the flusher task on an event loop running in another thread"""
+        asyncio.run_coroutine_threadsafe(self.start_async(), loop).result(timeout=5)
+    
+    async def start_async(self):
+        """Start the flusher task on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._flush_loop())
+        logger.info(f"Prediction write buffer started (batch_size={self.batch_size}, "
+                    f"flush_interval={self.flush_interval}s, max_size={self.max_size})")
+    
+    def is_running(self) -> bool:
+        """Return True while the flusher task is alive"""
+        return self._task is not None and not self._task.done()
+    
+    def put(self, doc: Dict[str, Any], timeout: Optional[float] = None) -> bool:
+        """
+        Queue a document for writing without waiting for the database
+        
+        Args:
+            doc: Prediction document to insert
+            timeout: Longest wait for room when the buffer is full; defaults
+                to put_timeout. Pass 0 on the flusher's own event loop, where
+                waiting can never free space
+            
+        Returns:
+            True if the document was queued, False if it was dropped
+        """
+        with self._cond:
+            if self._stopping:
+                self._dropped += 1
+                return False
+            if len(self._docs) >= self.max_size:
+                # Backpressure: wait briefly for the flusher to make room
+                wait = self.put_timeout if timeout is None else timeout
+                self._cond.wait_for(lambda: len(self._docs) < self.max_size, timeout=wait)
+                if len(self._docs) >= self.max_size:
+                    self._dropped += 1
+                    logger.warning("Prediction write buffer full, dropping document")
+                    return False
+            self._docs.append(doc)
+            self._enqueued += 1
+            batch_ready = len(self._docs) >= self.batch_size
+        
+        if batch_ready and self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return True
+    
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            batch = self._docs[:self.batch_size]
+            del self._docs[:self.batch_size]
+            self._cond.notify_all()
+        return batch
+    
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if self._stopping:
+                break
+    
+    async def flush(self):
+        """Write every buffered document"""
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            await self._write_batch(batch)
+    
+    async def _write_batch(self, batch: List[Dict[str, Any]]):
+        started = time.perf_counter()
+        written_docs = []
+        try:
+            await db[PREDICTIONS_COLLECTION].insert_many(batch, ordered=False)
+            written_docs = batch
+        except BulkWriteError as e:
+            # Unordered inserts keep going past failures; keep what made it
+            failed_indexes = {error["index"] for error in e.details.get("writeErrors", [])}
+            written_docs = [doc for i, doc in enumerate(batch) if i not in failed_indexes]
+            logger.error(f"Bulk insert partially failed: {len(batch) - len(written_docs)} of {len(batch)} documents not written")
+        except Exception as e:
+            logger.error(f"Bulk insert of {len(batch)} predictions failed: {str(e)}")
+        
+        written = len(written_docs)
+        if written_docs:
+            await try_update_stats(written_docs)
+        
+        elapsed = time.perf_counter() - started
+        DB_WRITE_SECONDS.observe(elapsed)
+        with self._cond:
+            self._flushes += 1
+            self._written += written
+            self._failed += len(batch) - written
+            self._last_batch_size = len(batch)
+            self._total_flush_seconds += elapsed
+            self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+    
+    async def drain(self):
+        """Stop accepting documents and write everything still buffered"""
+        with self._cond:
+            self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        if self._task is not None:
+            await self._task
+        await self.flush()
+        logger.info(f"Prediction write buffer drained ({self._written} documents written)")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return flush latency, batch size and dropped-document counters"""
+        with self._cond:
+            return {
+                "pending": len(self._docs),
+                "max_size": self.max_size,
+                "enqueued": self._enqueued,
+                "written": self._written,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "flushes": self._flushes,
+                "last_batch_size": self._last_batch_size,
+                "avg_batch_size": round((self._written + self._failed) / self._flushes, 3) if self._flushes else 0.0,
+                "avg_flush_ms": round(self._total_flush_seconds * 1000 / self._flushes, 3) if self._flushes else 0.0,
+                "max_flush_ms": round(self._max_flush_seconds * 1000, 3),
+            }
+
+# Shared write buffer instance
+write_buffer = PredictionWriteBuffer()
+
+def collect_write_buffer_metrics() -> List[str]:
+    """Scrape-time write buffer values; registered here so /metrics never imports the database layer"""
+    if not write_buffer.is_running():
+        return []
+    buffer_stats = write_buffer.stats()
+    lines = gauge_lines("emotion_write_buffer_pending", "Predictions waiting to be written", buffer_stats.get("pending"))
+    lines += gauge_lines("emotion_write_buffer_written_total", "Predictions written by the buffer", buffer_stats.get("written"), "counter")
+    lines += gauge_lines("emotion_write_buffer_dropped_total", "Predictions dropped under backpressure", buffer_stats.get("dropped"), "counter")
+    return lines
+
+register_collector(collect_write_buffer_metrics)
+
+def enqueue_prediction(text: str, emotions: Dict[str, float],
+                       request_info: Optional[Dict[str, Any]] = None,
+                       timeout: Optional[float] = None) -> bool:
+    """
+    Queue a prediction for a write-behind bulk insert
+    
+    Returns:
+        True if the prediction was queued, False if it was dropped
+    """
+    return write_buffer.put(build_prediction_doc(text, emotions, request_info), timeout=timeout)
+
+def _stats_increments(prediction_docs: List[Dict[str, Any]], sign: int = 1) -> Dict[str, Dict[str, Any]]:
+    """Sum the counter increments for a group of prediction documents"""
+    increments: Dict[str, Dict[str, Any]] = {}
+    
+    def add(key: str, fields: Dict[str, Any], inc: Dict[str, float]):
+        entry = increments.setdefault(key, {"fields": fields, "inc": {}})
+        for name, value in inc.items():
+            entry["inc"][name] = entry["inc"].get(name, 0) + sign * value
+    
+    for doc in prediction_docs:
+        add("totals", {"kind": "totals"}, {"count": 1})
+        timestamp = doc.get("timestamp")
+        if isinstance(timestamp, datetime):
+            date = timestamp.strftime("%Y-%m-%d")
+            add(f"day:{date}", {"kind": "day", "date": date}, {"count": 1})
+        for emotion, score in (doc.get("emotions") or {}).items():
+            add(f"emotion:{emotion}", {"kind": "emotion", "emotion": emotion},
+                {"count": 1, "score_sum": float(score)})
+    return increments
+
+async def update_stats(prediction_docs: List[Dict[str, Any]], sign: int = 1):
+    """
+    Apply $inc upserts for saved (sign=1) or deleted (sign=-1) predictions
+    
+    Keeps a small stats collection with one document for the total count,
+    one per emotion (occurrence count and score sum) and one per day.
+    """
+    increments = _stats_increments(prediction_docs, sign)
+    if not increments:
+        return
+    operations = [
+        UpdateOne({"_id": key}, {"$inc": entry["inc"], "$set": entry["fields"]}, upsert=True)
+        for key, entry in increments.items()
+    ]
+    await db[STATS_COLLECTION].bulk_write(operations, ordered=False)
+
+async def try_update_stats(prediction_docs: List[Dict[str, Any]], sign: int = 1):
+    """Update the stats counters without failing the write that triggered it"""
+    try:
+        await update_stats(prediction_docs, sign)
+    except Exception as e:
+        logger.error(f"Error updating stats counters: {str(e)}")
+
+async def rebuild_stats() -> int:
+    """
+    Rebuild the stats counters from the full predictions collection
+    
+    This is the one-shot backfill for data saved before counters existed.
+    Increments applied by concurrent writes while it runs may be lost, so
+    run it before traffic arrives or during a quiet period.
+    
+    Returns:
+        Total number of predictions counted
+    """
+    total_count = await db[PREDICTIONS_COLLECTION].count_documents({})
+    
+    emotion_pipeline = [
+        {"$project": {"emotion_pairs": {"$objectToArray": "$emotions"}}},
+        {"$unwind": "$emotion_pairs"},
+        {"$group": {
+            "_id": "$emotion_pairs.k",
+            "score_sum": {"$sum": "$emotion_pairs.v"},
+            "count": {"$sum": 1}
+        }}
+    ]
+    day_pipeline = [
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+            "count": {"$sum": 1}
+        }}
+    ]
+    emotion_rows = await db[PREDICTIONS_COLLECTION].aggregate(emotion_pipeline, allowDiskUse=True).to_list(length=None)
+    day_rows = await db[PREDICTIONS_COLLECTION].aggregate(day_pipeline, allowDiskUse=True).to_list(length=None)
+    
+    stats_docs = [{"_id": "totals", "kind": "totals", "count": total_count, "backfilled": True}]
+    stats_docs += [
+        {"_id": f"emotion:{row['_id']}", "kind": "emotion", "emotion": row["_id"],
+         "count": row["count"], "score_sum": row["score_sum"]}
+        for row in emotion_rows
+    ]
+    stats_docs += [
+        {"_id": f"day:{row['_id']}", "kind": "day", "date": row["_id"], "count": row["count"]}
+        for row in day_rows if row["_id"]
+    ]
+    
+    await db[STATS_COLLECTION].delete_many({})
+    await db[STATS_COLLECTION].insert_many(stats_docs)
+    logger.info(f"Rebuilt stats counters for {total_count} predictions")
+    return total_count
+
 async def get_predictions(limit: int = 50, skip: int = 0) -> List[Dict]:
     """
     Retrieve predictions from the database with pagination
@@ -118,7 +469,10 @@ async def get_predictions(limit: int = 50, skip: int = 0) -> List[Dict]:
         List of prediction documents
     """
     try:
-        cursor = db[PREDICTIONS_COLLECTION].find().sort("timestamp", -1).skip(skip).limit(limit)
+        cursor = (db[PREDICTIONS_COLLECTION]
+                  .find({}, LIST_PROJECTION)
+                  .sort([("timestamp", DESCENDING), ("_id", DESCENDING)])
+                  .skip(skip).limit(limit))
         predictions = await cursor.to_list(length=limit)
         
         # Convert ObjectId to string for JSON serialization
@@ -130,6 +484,114 @@ async def get_predictions(limit: int = 50, skip: int = 0) -> List[Dict]:
         logger.error(f"Error retrieving predictions: {str(e)}")
         raise
 
+def encode_page_cursor(prediction: Dict[str, Any]) -> str:
+    """Build an opaque continuation token from the last prediction of a page"""
+    payload = json.dumps({"t": prediction["timestamp"].isoformat(), "id": str(prediction["_id"])})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def decode_page_cursor(token: str):
+    """
+    Decode a continuation token into its (timestamp, ObjectId) position
+    
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), ObjectId(payload["id"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+async def get_predictions_page(limit: int = 50, cursor: Optional[str] = None, skip: int = 0):
+    """
+    Retrieve one page of predictions using keyset pagination
+    
+    Pages are ordered by (timestamp, _id) descending and continue strictly
+    after the cursor position, so each page costs O(limit) with the compound
+    index no matter how deep it is. Legacy offset pages pass skip instead of
+    a cursor; they still return a cursor so clients can switch to keyset paging.
+    
+    Args:
+        limit: Maximum number of predictions to return
+        cursor: Continuation token from the previous page, or None for the first page
+        skip: Documents to skip when no cursor is given (legacy page parameter)
+        
+    Returns:
+        Tuple of (list of prediction documents, next cursor or None)
+    """
+    query = {}
+    if cursor:
+        timestamp, last_id = decode_page_cursor(cursor)
+        query = {"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": last_id}}
+        ]}
+    
+    try:
+        # Fetch one extra document to know whether another page exists
+        results = await (db[PREDICTIONS_COLLECTION]
+                         .find(query, LIST_PROJECTION)
+                         .sort([("timestamp", DESCENDING), ("_id", DESCENDING)])
+                         .skip(0 if cursor else skip)
+                         .limit(limit + 1)
+                         .to_list(length=limit + 1))
+        
+        predictions = results[:limit]
+        next_cursor = encode_page_cursor(predictions[-1]) if len(results) > limit else None
+        
+        for prediction in predictions:
+            prediction["_id"] = str(prediction["_id"])
+        return predictions, next_cursor
+    except Exception as e:
+        logger.error(f"Error retrieving predictions page: {str(e)}")
+        raise
+
+_count_cache = {"value": None, "expires_at": 0.0}
+
+async def count_predictions() -> int:
+    """
+    Return the total number of predictions without scanning the collection
+    
+    Uses the maintained stats counters when they have been backfilled,
+    otherwise a cached estimated_document_count.
+    """
+    try:
+        totals = await db[STATS_COLLECTION].find_one({"_id": "totals"})
+        if totals and totals.get("backfilled"):
+            return int(totals["count"])
+        
+        now = time.monotonic()
+        if _count_cache["value"] is None or now >= _count_cache["expires_at"]:
+            _count_cache["value"] = await db[PREDICTIONS_COLLECTION].estimated_document_count()
+            _count_cache["expires_at"] = now + COUNT_CACHE_TTL
+        return _count_cache["value"]
+    except Exception as e:
+        logger.error(f"Error counting predictions: {str(e)}")
+        raise
+
+async def get_frequent_texts(limit: int = 500) -> List[str]:
+    """
+    Retrieve the most frequently analyzed texts
+    
+    Args:
+        limit: Maximum number of texts to return
+        
+    Returns:
+        List of texts ordered by how often they were analyzed
+    """
+    try:
+        pipeline = [
+            {"$group": {"_id": "$text", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": limit}
+        ]
+        cursor = db[PREDICTIONS_COLLECTION].aggregate(pipeline, allowDiskUse=True)
+        rows = await cursor.to_list(length=limit)
+        return [row["_id"] for row in rows if isinstance(row["_id"], str)]
+    except Exception as e:
+        logger.error(f"Error retrieving frequent texts: {str(e)}")
+        raise
+
 async def get_prediction_by_id(prediction_id: str) -> Optional[Dict]:
     """
     Retrieve a specific prediction by ID
@@ -160,9 +622,10 @@ async def delete_prediction(prediction_id: str) -> bool:
         True if deletion was successful, False otherwise
     """
     try:
-        result = await db[PREDICTIONS_COLLECTION].delete_one({"_id": ObjectId(prediction_id)})
-        success = result.deleted_count > 0
+        deleted = await db[PREDICTIONS_COLLECTION].find_one_and_delete({"_id": ObjectId(prediction_id)})
+        success = deleted is not None
         if success:
+            await try_update_stats([deleted], sign=-1)
             logger.info(f"Deleted prediction with ID: {prediction_id}")
         else:
             logger.warning(f"No prediction found with ID: {prediction_id}")
@@ -176,79 +639,41 @@ async def get_stats() -> Dict:
     Get statistics about predictions
     
     Returns:
-        Dictionary with statistics like total count, top emotions, etc.
+        Dictionary with statistics like total count, top emotions, etc.;
+        "backfilled" is False until backfill_stats.py has built the counters
+        from existing history, so older predictions may be missing
     """
     try:
-        # Get total count
-        total_count = await db[PREDICTIONS_COLLECTION].count_documents({})
+        # Read the incrementally maintained counters; never rebuild them on a
+        # request path, where it would race live $inc updates
+        totals = await db[STATS_COLLECTION].find_one({"_id": "totals"})
+        backfilled = bool(totals and totals.get("backfilled"))
+        if not backfilled:
+            logger.warning("Stats counters have not been backfilled; run backfill_stats.py")
+        total_count = totals["count"] if totals else 0
         
         # Get top emotions by frequency
-        pipeline = [
-            # Convert emotions dict to array of key-value pairs
-            {"$project": {
-                "emotion_pairs": {"$objectToArray": "$emotions"}
-            }},
-            # Unwind the array to get one document per emotion
-            {"$unwind": "$emotion_pairs"},
-            # Group by emotion name and calculate statistics
-            {"$group": {
-                "_id": "$emotion_pairs.k",  # k is the key (emotion name)
-                "average_score": {"$avg": "$emotion_pairs.v"},  # v is the value (score)
-                "count": {"$sum": 1}
-            }},
-            # Reshape the output to match expected format
-            {"$project": {
-                "_id": 0,
-                "emotion": "$_id",
-                "average_score": 1,
-                "count": 1
-            }},
-            # Sort by count in descending order
-            {"$sort": {"count": -1}},
-            {"$limit": 5}
-        ]
-        
-        cursor = db[PREDICTIONS_COLLECTION].aggregate(pipeline)
-        top_emotions_list = await cursor.to_list(length=10)
-        
-        # Get predictions over time (by day)
-        pipeline = [
-            {"$group": {
-                "_id": {
-                    "year": {"$year": "$timestamp"},
-                    "month": {"$month": "$timestamp"},
-                    "day": {"$dayOfMonth": "$timestamp"}
-                },
-                "count": {"$sum": 1}
-            }},
-            # Format the date
-            {"$project": {
-                "_id": 0,
-                "date": {
-                    "$dateToString": {
-                        "format": "%Y-%m-%d",
-                        "date": {
-                            "$dateFromParts": {
-                                "year": "$_id.year",
-                                "month": "$_id.month",
-                                "day": "$_id.day"
-                            }
-                        }
-                    }
-                },
-                "count": 1
-            }},
-            {"$sort": {"date": 1}},
-            {"$limit": 30}  # Last 30 days
+        emotion_docs = await db[STATS_COLLECTION].find({"kind": "emotion", "count": {"$gt": 0}}).to_list(length=None)
+        top_emotions_list = [
+            {
+                "emotion": doc["emotion"],
+                "average_score": doc["score_sum"] / doc["count"],
+                "count": doc["count"]
+            }
+            for doc in sorted(emotion_docs, key=lambda d: d["count"], reverse=True)[:5]
         ]
         
-        cursor = db[PREDICTIONS_COLLECTION].aggregate(pipeline)
-        predictions_by_day = await cursor.to_list(length=30)
+        # Get predictions over the last 30 days with data, oldest first
+        cursor = db[STATS_COLLECTION].find(
+            {"kind": "day", "count": {"$gt": 0}}, {"_id": 0, "date": 1, "count": 1}
+        ).sort("date", -1).limit(30)
+        predictions_by_day = list(reversed(await cursor.to_list(length=30)))
         
         return {
             "total_predictions": total_count,
             "top_emotions": top_emotions_list,
-            "predictions_by_day": predictions_by_day
+            "predictions_by_day": predictions_by_day,
+            "backfilled": backfilled
         }
     except Exception as e:
         logger.error(f"Error getting stats: {str(e)}")
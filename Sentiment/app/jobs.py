@@ -0,0 +1,538 @@
+"""
+Background batch jobs for the Emotion Analyzer app.
+Clients submit a list or NDJSON file of texts and get a job ID back; worker
+threads score the texts in batches and store compact results in SQLite, so
+large jobs survive restarts, need no external broker, and are fetched page
+by page. Workers step aside while interactive requests are in flight.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import tempfile
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.predict import TOP_N
+from app.scheduler import get_scheduler, predict_bulk, ENABLE_MICRO_BATCHING, INTERACTIVE_LANE
+from app.metrics import Counter
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Job settings
+ENABLE_BATCH_JOBS = os.environ.get("ENABLE_BATCH_JOBS", "True").lower() == "true"
+# Kept out of the code tree; point it at a persistent volume to keep jobs across reboots
+BATCH_JOBS_DB_PATH = os.environ.get("BATCH_JOBS_DB_PATH", os.path.join(tempfile.gettempdir(), "emotion-analyzer", "jobs.sqlite3"))
+BATCH_JOB_WORKERS = int(os.environ.get("BATCH_JOB_WORKERS", "1"))
+BATCH_JOB_BATCH_SIZE = int(os.environ.get("BATCH_JOB_BATCH_SIZE", "32"))
+BATCH_JOB_MAX_TEXTS = int(os.environ.get("BATCH_JOB_MAX_TEXTS", "100000"))
+BATCH_JOB_RESULTS_PAGE_SIZE = int(os.environ.get("BATCH_JOB_RESULTS_PAGE_SIZE", "500"))
+BATCH_JOB_RETENTION_HOURS = float(os.environ.get("BATCH_JOB_RETENTION_HOURS", "24"))
+# Longest a worker waits for interactive traffic to drain before each batch
+BATCH_JOB_MAX_YIELD_MS = float(os.environ.get("BATCH_JOB_MAX_YIELD_MS", "200"))
+# Running jobs without progress for this long are taken over by another worker
+BATCH_JOB_STALE_SECONDS = float(os.environ.get("BATCH_JOB_STALE_SECONDS", "300"))
+BATCH_JOB_POLL_SECONDS = 1.0
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+BATCH_JOB_TEXTS_TOTAL = Counter("emotion_batch_job_texts_total", "Texts scored by background batch jobs")
+
+
+def _compact(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+class JobStore:
+    """
+    SQLite-backed job queue and result store.
+
+    Items hold their text only until they are scored; afterwards just the
+    compact result remains. Like the disk prediction store, the database
+    runs in WAL mode and each thread (and forked process) opens its own
+    connection, so several server processes can share one job queue.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, "
+            "status TEXT NOT NULL, "
+            "top_n INTEGER NOT NULL, "
+            "total INTEGER NOT NULL, "
+            "processed INTEGER NOT NULL DEFAULT 0, "
+            "errors INTEGER NOT NULL DEFAULT 0, "
+            "error TEXT, "
+            "created_at REAL NOT NULL, "
+            "started_at REAL, "
+            "updated_at REAL NOT NULL, "
+            "finished_at REAL, "
+            "owner TEXT)"
+        )
+        # Stores created before claims carried an owner token
+        if "owner" not in [column[1] for column in conn.execute("PRAGMA table_info(jobs)")]:
+            conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_items ("
+            "job_id TEXT NOT NULL, "
+            "idx INTEGER NOT NULL, "
+            "item_id TEXT, "
+            "text TEXT, "
+            "result TEXT, "
+            "error TEXT, "
+            "PRIMARY KEY (job_id, idx)) WITHOUT ROWID"
+        )
+        conn.commit()
+        logger.info(f"Batch job store opened at {path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening it after a fork"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10.0)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create_job(self, records: Iterable[Dict[str, Any]], top_n: int = TOP_N,
+                   max_texts: int = BATCH_JOB_MAX_TEXTS) -> Dict[str, Any]:
+        """
+        Store a new queued job
+
+        Records come from app.streaming (make_record / iter_ndjson_records) and
+        are inserted as they are read, so a large upload is never held in memory.
+
+        Raises:
+            ValueError: If the job is empty or has more than max_texts records
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connection()
+        total = 0
+        errors = 0
+        with conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, top_n, total, created_at, updated_at) VALUES (?, ?, ?, 0, ?, ?)",
+                (job_id, JOB_QUEUED, top_n, now, now)
+            )
+            rows = []
+            for record in records:
+                total += 1
+                if total > max_texts:
+                    raise ValueError(f"Too many texts. Max {max_texts} texts allowed per job")
+                errors += "error" in record
+                rows.append((
+                    job_id, record["index"],
+                    _compact(record["id"]) if "id" in record else None,
+                    record.get("text"), record.get("error")
+                ))
+                if len(rows) >= 1000:
+                    conn.executemany("INSERT INTO job_items (job_id, idx, item_id, text, error) VALUES (?, ?, ?, ?, ?)", rows)
+                    rows = []
+            if total == 0:
+                raise ValueError("Input texts cannot be empty")
+            if rows:
+                conn.executemany("INSERT INTO job_items (job_id, idx, item_id, text, error) VALUES (?, ?, ?, ?, ?)", rows)
+            # Invalid records are finished on arrival
+            conn.execute("UPDATE jobs SET total = ?, processed = ?, errors = ? WHERE id = ?",
+                         (total, errors, errors, job_id))
+        logger.info(f"Queued batch job {job_id} with {total} texts")
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job's status and progress, or None if it does not exist"""
+        row = self._connection().execute(
+            "SELECT id, status, top_n, total, processed, errors, error, created_at, started_at, finished_at "
+            "FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("id", "status", "top_n", "total", "processed", "errors", "error",
+                        "created_at", "started_at", "finished_at"), row))
+        job["progress"] = round(job["processed"] / job["total"], 4) if job["total"] else 1.0
+        return job
+
+    def claim_next_job(self, stale_seconds: float = BATCH_JOB_STALE_SECONDS) -> Optional[Tuple[str, str]]:
+        """
+        Mark the oldest queued (or abandoned running) job as running
+
+        Returns:
+            (job ID, owner token), or None if there is nothing to claim. Writes
+            made with the token stop taking effect once another worker takes
+            the job over, so a stalled worker cannot clobber its successor.
+        """
+        conn = self._connection()
+        now = time.time()
+        owner = uuid.uuid4().hex
+        row = conn.execute(
+            "SELECT id, status FROM jobs WHERE status = ? OR (status = ? AND updated_at < ?) "
+            "ORDER BY created_at LIMIT 1",
+            (JOB_QUEUED, JOB_RUNNING, now - stale_seconds)
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            # Only one worker (in any process) wins the update
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, started_at = COALESCE(started_at, ?), updated_at = ? "
+                "WHERE id = ? AND status = ?",
+                (JOB_RUNNING, owner, now, now, row[0], row[1])
+            ).rowcount
+        return (row[0], owner) if claimed else None
+
+    def heartbeat(self, job_id: str, owner: str) -> bool:
+        """Keep a claimed job from going stale; False if it was deleted or taken over"""
+        conn = self._connection()
+        with conn:
+            return conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ? AND owner = ?",
+                (time.time(), job_id, JOB_RUNNING, owner)
+            ).rowcount > 0
+
+    def pending_items(self, job_id: str, after: int, limit: int) -> List[Tuple[int, str]]:
+        """Return up to limit unscored (index, text) pairs after the given index"""
+        return self._connection().execute(
+            "SELECT idx, text FROM job_items WHERE job_id = ? AND idx > ? AND text IS NOT NULL "
+            "ORDER BY idx LIMIT ?", (job_id, after, limit)
+        ).fetchall()
+
+    def save_results(self, job_id: str, batch: List[Dict[str, Any]], owner: Optional[str] = None) -> bool:
+        """
+        Store a scored batch, drop its texts and advance the job's progress
+
+        With an owner token nothing is written unless that claim still holds
+        the job; the progress update doubles as the claim's heartbeat.
+
+        Returns:
+            True if the batch was stored
+        """
+        errors = sum(1 for record in batch if "error" in record)
+        conn = self._connection()
+        with conn:
+            query = "UPDATE jobs SET processed = processed + ?, errors = errors + ?, updated_at = ? WHERE id = ?"
+            params = (len(batch), errors, time.time(), job_id)
+            if owner is not None:
+                query += " AND status = ? AND owner = ?"
+                params += (JOB_RUNNING, owner)
+            if conn.execute(query, params).rowcount == 0:
+                return False
+            conn.executemany(
+                "UPDATE job_items SET result = ?, error = ?, text = NULL WHERE job_id = ? AND idx = ?",
+                [(_compact(record["emotions"]) if "emotions" in record else None,
+                  record.get("error"), job_id, record["index"]) for record in batch]
+            )
+        return True
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None, owner: Optional[str] = None) -> bool:
+        """
+        Move a job to a new status, stamping finished_at for final ones
+
+        The job is released from its claim. With an owner token the change
+        only applies while that claim still holds the job.
+
+        Returns:
+            True if the job's status was changed
+        """
+        now = time.time()
+        finished_at = now if status not in ACTIVE_STATUSES else None
+        query = "UPDATE jobs SET status = ?, error = ?, owner = NULL, updated_at = ?, finished_at = ? WHERE id = ?"
+        params = (status, error, now, finished_at, job_id)
+        if owner is not None:
+            query += " AND status = ? AND owner = ?"
+            params += (JOB_RUNNING, owner)
+        conn = self._connection()
+        with conn:
+            return conn.execute(query, params).rowcount > 0
+
+    def get_results(self, job_id: str, cursor: int = -1,
+                    limit: int = BATCH_JOB_RESULTS_PAGE_SIZE) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Return one page of finished results in input order
+
+        While the job is queued or running, a page stops before the first
+        unscored item, so results finished out of order (invalid records are
+        finished on arrival) are never skipped by a cursor that moved past
+        them. Once the job is over, items a failed job never scored are left out.
+
+        Args:
+            job_id: Job ID
+            cursor: Index after which the page starts; pass the previous
+                page's next_cursor
+            limit: Maximum results per page
+
+        Returns:
+            Tuple of (results, next_cursor); next_cursor is None once every
+            result has been returned, and repeats the cursor while the next
+            item is still pending
+        """
+        conn = self._connection()
+        pending = None
+        status = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if status is not None and status[0] in ACTIVE_STATUSES:
+            pending = conn.execute(
+                "SELECT MIN(idx) FROM job_items WHERE job_id = ? AND idx > ? AND text IS NOT NULL",
+                (job_id, cursor)
+            ).fetchone()[0]
+        if pending is None:
+            rows = conn.execute(
+                "SELECT idx, item_id, result, error FROM job_items "
+                "WHERE job_id = ? AND idx > ? AND text IS NULL ORDER BY idx LIMIT ?",
+                (job_id, cursor, limit + 1)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT idx, item_id, result, error FROM job_items "
+                "WHERE job_id = ? AND idx > ? AND idx < ? ORDER BY idx LIMIT ?",
+                (job_id, cursor, pending, limit + 1)
+            ).fetchall()
+        results = []
+        for idx, item_id, result, error in rows[:limit]:
+            entry: Dict[str, Any] = {"index": idx}
+            if item_id is not None:
+                entry["id"] = json.loads(item_id)
+            if error is not None:
+                entry["error"] = error
+            else:
+                entry["emotions"] = json.loads(result)
+            results.append(entry)
+        if len(rows) > limit or pending is not None:
+            next_cursor = results[-1]["index"] if results else cursor
+        else:
+            next_cursor = None
+        return results, next_cursor
+
+    def delete_job(self, job_id: str) -> bool:
+        """Delete a job and its results; a running job stops at its next batch"""
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+            return conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount > 0
+
+    def purge_finished(self, max_age_seconds: float) -> int:
+        """Delete finished jobs older than max_age_seconds; returns the number removed"""
+        cutoff = time.time() - max_age_seconds
+        conn = self._connection()
+        job_ids = [row[0] for row in conn.execute(
+            "SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,)
+        ).fetchall()]
+        for job_id in job_ids:
+            self.delete_job(job_id)
+        return len(job_ids)
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of jobs per status"""
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+
+def interactive_busy() -> bool:
+    """
+    True while interactive texts are queued or running in the micro-batcher
+
+    Only the interactive lane counts, so jobs do not also wait behind bulk
+    batch and stream requests. Without micro-batching there are no lanes to
+    tell interactive work apart, and jobs do not yield.
+    """
+    return ENABLE_MICRO_BATCHING and get_scheduler().lane_busy(INTERACTIVE_LANE)
+
+
+class JobRunner:
+    """
+    Worker threads that take queued jobs from a JobStore and score them.
+
+    Batches run on the scheduler's bulk lane, and a worker also waits (up to
+    max_yield_ms) for interactive requests to clear before every batch, so
+    jobs mostly use idle capacity.
+    """
+
+    def __init__(self, store: JobStore, batch_fn: Callable[[List[str], int], List[Dict[str, float]]] = predict_bulk,
+                 workers: int = BATCH_JOB_WORKERS, batch_size: int = BATCH_JOB_BATCH_SIZE,
+                 max_yield_ms: float = BATCH_JOB_MAX_YIELD_MS,
+                 is_busy: Callable[[], bool] = interactive_busy):
+        self.store = store
+        self.batch_fn = batch_fn
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_yield = max(0.0, max_yield_ms) / 1000.0
+        self.is_busy = is_busy
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._last_purge = 0.0
+
+    def start(self):
+        """Start the worker threads if they are not already running"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._threads = [
+                threading.Thread(target=self._run, name=f"batch-job-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+        logger.info(f"Batch job runner started ({self.workers} workers, batch_size={self.batch_size})")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the workers; a job in progress is picked up again after a restart"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        logger.info("Batch job runner stopped")
+
+    def notify(self):
+        """Wake an idle worker after a job was submitted"""
+        self._wakeup.set()
+
+    def _run(self):
+        while self._running:
+            try:
+                claim = self.store.claim_next_job()
+            except sqlite3.Error as e:
+                logger.error(f"Could not claim a batch job: {str(e)}")
+                claim = None
+            if claim is None:
+                self._purge_expired()
+                self._wakeup.wait(BATCH_JOB_POLL_SECONDS)
+                self._wakeup.clear()
+                continue
+            self._process_claimed(*claim)
+
+    def _process_claimed(self, job_id: str, owner: str):
+        """Process a claimed job, marking it failed if processing raises"""
+        try:
+            self._process(job_id, owner)
+        except Exception as e:
+            logger.error(f"Batch job {job_id} failed: {str(e)}", exc_info=True)
+            try:
+                self.store.set_status(job_id, JOB_FAILED, str(e), owner=owner)
+            except sqlite3.Error:
+                pass
+
+    def _process(self, job_id: str, owner: str):
+        """Score a claimed job batch by batch until it is done, lost or the runner stops"""
+        job = self.store.get_job(job_id)
+        started = time.perf_counter()
+        last_index = -1
+        while True:
+            if not self._running:
+                self.store.set_status(job_id, JOB_QUEUED, owner=owner)
+                return
+            items = self.store.pending_items(job_id, last_index, self.batch_size)
+            if not items:
+                break
+            self._yield_to_interactive()
+            if not self.store.heartbeat(job_id, owner):
+                logger.info(f"Batch job {job_id} was deleted or taken over, stopping")
+                return
+
+            # Invalid records were finished on arrival, so a batch only fails for
+            # reasons outside the input (model down, out of memory); the exception
+            # ends the job as failed instead of filling it with per-item errors
+            emotions = self.batch_fn([text for _, text in items], top_n=job["top_n"])
+            batch = [{"index": index, "emotions": result} for (index, _), result in zip(items, emotions)]
+            if not self.store.save_results(job_id, batch, owner=owner):
+                logger.info(f"Batch job {job_id} was deleted or taken over, dropping a scored batch")
+                return
+            BATCH_JOB_TEXTS_TOTAL.inc(len(batch))
+            last_index = items[-1][0]
+
+        if not self.store.set_status(job_id, JOB_COMPLETED, owner=owner):
+            logger.info(f"Batch job {job_id} was deleted or taken over before it completed")
+            return
+        logger.info(f"Batch job {job_id} completed ({job['total']} texts in {time.perf_counter() - started:.1f}s)")
+
+    def _yield_to_interactive(self):
+        """Wait a bounded time for interactive requests to clear before the next batch"""
+        deadline = time.monotonic() + self.max_yield
+        while self.is_busy() and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    def _purge_expired(self):
+        if BATCH_JOB_RETENTION_HOURS <= 0 or time.monotonic() - self._last_purge < 3600:
+            return
+        self._last_purge = time.monotonic()
+        try:
+            removed = self.store.purge_finished(BATCH_JOB_RETENTION_HOURS * 3600)
+            if removed:
+                logger.info(f"Purged {removed} finished batch jobs")
+        except sqlite3.Error as e:
+            logger.warning(f"Could not purge finished batch jobs: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return worker settings and the number of jobs per status"""
+        return {
+            "running": self._running,
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "jobs": self.store.counts(),
+        }
+
+
+# Shared job runner
+_job_runner = None
+_job_runner_lock = threading.Lock()
+
+def get_job_runner() -> JobRunner:
+    """Return the process-wide job runner, opening the store on first use"""
+    global _job_runner
+    if _job_runner is None:
+        with _job_runner_lock:
+            if _job_runner is None:
+                _job_runner = JobRunner(JobStore(BATCH_JOBS_DB_PATH))
+    return _job_runner
+
+def current_job_runner() -> Optional[JobRunner]:
+    """Return the job runner if something already used it, without opening the store"""
+    return _job_runner
+
+def resume_jobs():
+    """
+    Start the workers if a previous process left a job store behind
+
+    Without one there is nothing to resume, so the store is neither created
+    nor opened until the first job is submitted.
+    """
+    if not os.path.exists(BATCH_JOBS_DB_PATH):
+        return
+    try:
+        get_job_runner().start()
+    except Exception as e:
+        logger.error(f"Could not start the batch job runner: {str(e)}")
+
+def submit_job(records: Iterable[Dict[str, Any]], top_n: int = TOP_N) -> Dict[str, Any]:
+    """Store a job, make sure the workers run, and return the queued job"""
+    runner = get_job_runner()
+    job = runner.store.create_job(records, top_n)
+    runner.start()
+    runner.notify()
+    return job
@@ -0,0 +1,252 @@
+"""
+Prometheus metrics for the Emotion Analyzer app.
+Histograms and counters are striped over a fixed set of shards, each with
+its own lock, so threads recording samples rarely contend; shards are only
+summed when /metrics is scraped. The shard count is fixed, so servers that
+start a thread per request do not grow memory with every new thread.
+"""
+import bisect
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+# Lock stripes per counter or histogram
+METRIC_SHARDS = 16
+
+_registry: List["_Metric"] = []
+_collectors: List[Callable[[], Iterable[str]]] = []
+_registry_lock = threading.Lock()
+_thread_slot = threading.local()
+_slot_counter = itertools.count()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+def _slot() -> int:
+    """Shard index for the calling thread, handed out round-robin on first use"""
+    slot = getattr(_thread_slot, "index", None)
+    if slot is None:
+        slot = _thread_slot.index = next(_slot_counter) % METRIC_SHARDS
+    return slot
+
+
+class _Metric:
+    """Base class holding a fixed set of locked shards"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._shards = [(threading.Lock(), self._new_shard()) for _ in range(METRIC_SHARDS)]
+        with _registry_lock:
+            _registry.append(self)
+
+    def _new_shard(self):
+        return {}
+
+    def _shard(self):
+        """Return the (lock, shard) pair for the calling thread"""
+        return self._shards[_slot()]
+
+    def _snapshot(self) -> List[list]:
+        """Copy every shard's series, each under its own lock"""
+        snapshots = []
+        for lock, shard in self._shards:
+            with lock:
+                snapshots.append(self._copy_shard(shard))
+        return snapshots
+
+    def _copy_shard(self, shard) -> list:
+        return list(shard.items())
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def _new_shard(self):
+        return {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        lock, shard = self._shard()
+        with lock:
+            shard[key] = shard.get(key, 0.0) + amount
+
+    def values(self) -> Dict[tuple, float]:
+        totals: Dict[tuple, float] = {}
+        for items in self._snapshot():
+            for key, value in items:
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in sorted(self.values().items())]
+
+
+class Gauge(_Metric):
+    """Last-value gauge with optional labels"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        # A single dict assignment is atomic under the GIL
+        self._values[tuple(sorted(labels.items()))] = value
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets and optional labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text)
+
+    def _new_shard(self):
+        # Label key -> [bucket counts followed by an overflow slot, [sum]]
+        return {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items())) if labels else ()
+        bucket = bisect.bisect_left(self.buckets, value)
+        lock, shard = self._shard()
+        with lock:
+            series = shard.get(key)
+            if series is None:
+                series = shard[key] = [[0] * (len(self.buckets) + 1), [0.0]]
+            series[0][bucket] += 1
+            series[1][0] += value
+
+    def _copy_shard(self, shard) -> list:
+        return [(key, (list(counts), [total[0]])) for key, (counts, total) in shard.items()]
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        totals: Dict[tuple, list] = {}
+        for items in self._snapshot():
+            for key, (shard_counts, shard_total) in items:
+                counts, total = totals.setdefault(key, [[0] * (len(self.buckets) + 1), [0.0]])
+                for i, count in enumerate(shard_counts):
+                    counts[i] += count
+                total[0] += shard_total[0]
+
+        lines = []
+        for key, (counts, total) in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total[0]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+def register_collector(collector: Callable[[], Iterable[str]]):
+    """Register a callable producing extra exposition lines at scrape time"""
+    with _registry_lock:
+        _collectors.append(collector)
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text format"""
+    with _registry_lock:
+        metrics = list(_registry)
+        collectors = list(_collectors)
+
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    for collector in collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+def gauge_lines(name: str, help_text: str, value: Optional[float], kind: str = "gauge") -> List[str]:
+    """Exposition lines for a single value computed at scrape time"""
+    if value is None:
+        return []
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+
+
+# Hot-path metrics
+TOKENIZE_SECONDS = Histogram("emotion_tokenize_seconds", "Time spent tokenizing inputs")
+FORWARD_SECONDS = Histogram("emotion_forward_seconds", "Time spent in the model forward pass")
+POSTPROCESS_SECONDS = Histogram("emotion_postprocess_seconds", "Time spent turning probabilities into top emotions")
+DB_WRITE_SECONDS = Histogram("emotion_db_write_seconds", "Latency of prediction writes to MongoDB")
+RUN_ASYNC_WAIT_SECONDS = Histogram("emotion_run_async_wait_seconds", "Time request threads wait on the database event loop")
+REQUEST_TEXT_CHARS = Histogram("emotion_request_text_chars", "Characters of text per analyzed input", SIZE_BUCKETS)
+BATCH_SIZE = Histogram("emotion_batch_size", "Rows per model forward pass", SIZE_BUCKETS)
+LANE_QUEUE_SECONDS = Histogram("emotion_lane_queue_seconds", "Time texts wait in the scheduler before their batch runs, by lane")
+LANE_LATENCY_SECONDS = Histogram("emotion_lane_latency_seconds", "Time from scheduler submit to result, by lane")
+MODEL_LOAD_SECONDS = Gauge("emotion_model_load_seconds", "Seconds taken by the last model load")
+REQUESTS_TOTAL = Counter("emotion_requests_total", "HTTP requests by endpoint and status")
+ERRORS_TOTAL = Counter("emotion_errors_total", "Failed HTTP requests by endpoint")
+
+
+def collect_runtime_metrics() -> List[str]:
+    """Scrape-time values read from the cache, scheduler and admission stats"""
+    # Imported here because those modules record into the metrics above
+    from app.predict import get_token_cache_stats, is_model_ready
+    from app.cache import get_prediction_cache, ENABLE_PREDICTION_CACHE
+    from app.scheduler import get_scheduler, ENABLE_MICRO_BATCHING
+    from app.admission import get_admission_controller, ENABLE_ADMISSION_CONTROL
+
+    lines = []
+    if ENABLE_PREDICTION_CACHE:
+        cache_stats = get_prediction_cache().stats()
+        lines += gauge_lines("emotion_cache_hits_total", "Prediction cache hits", cache_stats.get("hits"), "counter")
+        lines += gauge_lines("emotion_cache_misses_total", "Prediction cache misses", cache_stats.get("misses"), "counter")
+        lines += gauge_lines("emotion_cache_disk_hits_total", "Prediction cache hits served from disk", cache_stats.get("disk_hits"), "counter")
+        lines += gauge_lines("emotion_cache_entries", "Entries in the in-memory prediction cache", cache_stats.get("size"))
+    token_stats = get_token_cache_stats()
+    lines += gauge_lines("emotion_token_cache_hits_total", "Token cache hits", token_stats.get("hits"), "counter")
+    lines += gauge_lines("emotion_token_cache_misses_total", "Token cache misses", token_stats.get("misses"), "counter")
+    if ENABLE_MICRO_BATCHING:
+        scheduler_stats = get_scheduler().stats()
+        lines += gauge_lines("emotion_scheduler_queue_depth", "Requests waiting for the micro-batcher", scheduler_stats.get("queue_depth"))
+        lines += ["# HELP emotion_lane_queue_depth Texts waiting in each scheduler lane",
+                  "# TYPE emotion_lane_queue_depth gauge"]
+        lines += [f'emotion_lane_queue_depth{{lane="{name}"}} {lane["queue_depth"]}'
+                  for name, lane in scheduler_stats["lanes"].items()]
+    if ENABLE_ADMISSION_CONTROL:
+        admission_stats = get_admission_controller().stats()
+        lines += gauge_lines("emotion_admission_active", "Requests holding an inference slot", admission_stats.get("active"))
+        lines += gauge_lines("emotion_admission_queued", "Requests waiting for an inference slot", admission_stats.get("queued"))
+    lines += gauge_lines("emotion_model_ready", "1 once the model is loaded and warmed up", int(is_model_ready()))
+    return lines
+
+register_collector(collect_runtime_metrics)
@@ -0,0 +1,142 @@
+"""
+ONNX Runtime inference backend for the Emotion Analyzer app.
+Exports BertForSequenceClassification to ONNX once, caches the file on disk,
+and serves it through an onnxruntime CPU session.
+"""
+import os
+import logging
+import torch
+from transformers.modeling_outputs import SequenceClassifierOutput
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# ONNX settings
+ONNX_MODEL_DIR = os.environ.get("ONNX_MODEL_DIR", os.path.join(os.path.dirname(__file__), "model_onnx"))
+ONNX_OPSET_VERSION = int(os.environ.get("ONNX_OPSET_VERSION", "14"))
+ORT_INTRA_OP_THREADS = int(os.environ.get("ORT_INTRA_OP_THREADS", str(os.cpu_count() or 1)))
+ORT_INTER_OP_THREADS = int(os.environ.get("ORT_INTER_OP_THREADS", "1"))
+
+# Input names in BertForSequenceClassification.forward order
+INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+
+class OnnxEmotionModel:
+    """
+    Wraps an onnxruntime session with the calling convention of the torch model,
+    so predict.py can use either backend interchangeably.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.input_names = [i.name for i in session.get_inputs()]
+
+    def eval(self):
+        """No-op, kept for parity with torch modules"""
+        return self
+
+    def __call__(self, **inputs):
+        feeds = {
+            name: inputs[name].cpu().numpy().astype("int64")
+            for name in self.input_names if name in inputs
+        }
+        logits = self.session.run(["logits"], feeds)[0]
+        return SequenceClassifierOutput(logits=torch.from_numpy(logits))
+
+
+def get_onnx_path(model_identity: str) -> str:
+    """Return the cached ONNX file path for a model identity"""
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in model_identity)
+    return os.path.join(ONNX_MODEL_DIR, f"{safe_name}.onnx")
+
+def export_onnx(model, tokenizer, path: str):
+    """
+    Export a torch model to ONNX with dynamic batch and sequence axes
+
+    Args:
+        model: Loaded BertForSequenceClassification
+        tokenizer: Matching tokenizer, used to build example inputs
+        path: Destination file
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    model.eval()
+    sample = tokenizer(["export sample", "a second export sample"], return_tensors="pt", padding=True)
+    args = tuple(sample[name] for name in INPUT_NAMES)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in INPUT_NAMES}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    # Write to a temporary file so other processes never see a partial export
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            args,
+            tmp_path,
+            input_names=INPUT_NAMES,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET_VERSION,
+            do_constant_folding=True,
+        )
+    os.replace(tmp_path, path)
+    logger.info(f"Exported ONNX model to {path}")
+
+def quantize_onnx(path: str, quantized_path: str):
+    """Write a dynamically int8-quantized copy of an ONNX model"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp_path = f"{quantized_path}.{os.getpid()}.tmp"
+    quantize_dynamic(path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, quantized_path)
+    logger.info(f"Quantized ONNX model to int8 at {quantized_path}")
+
+def load_onnx_model(model_loader, tokenizer, model_identity: str, precision: str = "fp32") -> OnnxEmotionModel:
+    """
+    Load the cached ONNX model, exporting it first if needed
+
+    Args:
+        model_loader: Callable returning the torch model, only used for export
+        tokenizer: Loaded tokenizer
+        model_identity: Identity string used to name the cached file
+        precision: "fp32" or "int8"
+
+    Returns:
+        OnnxEmotionModel ready for inference
+
+    Raises:
+        ImportError: If the optional onnxruntime package is not installed
+    """
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        raise ImportError(
+            "INFERENCE_BACKEND=onnx requires the onnxruntime package; "
+            "install it with `pip install -r requirements-onnx.txt`"
+        ) from e
+
+    path = get_onnx_path(model_identity)
+    if not os.path.exists(path):
+        logger.info(f"No cached ONNX model at {path}, exporting")
+        export_onnx(model_loader(), tokenizer, path)
+
+    if precision == "int8":
+        quantized_path = path[:-len(".onnx")] + ".int8.onnx"
+        if not os.path.exists(quantized_path):
+            quantize_onnx(path, quantized_path)
+        path = quantized_path
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = ORT_INTRA_OP_THREADS
+    options.inter_op_num_threads = ORT_INTER_OP_THREADS
+
+    session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+    logger.info(f"ONNX Runtime session ready (intra_op={ORT_INTRA_OP_THREADS}, inter_op={ORT_INTER_OP_THREADS})")
+    return OnnxEmotionModel(session)
@@ -1,13 +1,16 @@
 """
 Modified predict.py to properly load model from Hugging Face
+torch, transformers and huggingface_hub are imported inside the functions
+that use them, so importing this module stays cheap until a model is needed
 """
-from transformers import BertTokenizer, BertForSequenceClassification
-import torch
 import os
-import numpy as np
-from huggingface_hub import login
+import time
+import threading
+from collections import OrderedDict
 import logging
 from dotenv import load_dotenv
+from app.artifacts import find_artifact, read_manifest, resolve_artifact, load_model_mmap, materialize_buffers, MODEL_OFFLINE
+from app.metrics import TOKENIZE_SECONDS, FORWARD_SECONDS, POSTPROCESS_SECONDS, BATCH_SIZE, MODEL_LOAD_SECONDS
 load_dotenv()
 
 
@@ -27,47 +30,187 @@ EMOTION_LABELS = [
 
 # Model settings
 MODEL_HF_PATH = os.environ.get("MODEL_HF_PATH", "NNKalyan/emotion-analyzer-model")
+MODEL_REVISION = os.environ.get("MODEL_REVISION", "main")
 USE_LOCAL_MODEL = os.environ.get("USE_LOCAL_MODEL", "False").lower() == "true"
 HF_TOKEN = os.environ.get("HF_TOKEN", None)
+# Load Hub models through the local artifact store (see app/artifacts.py)
+USE_ARTIFACT_STORE = os.environ.get("USE_ARTIFACT_STORE", "True").lower() == "true"
 LOCAL_MODEL_DIR = os.path.join(os.path.dirname(__file__), "model")
+# Inference backend: "torch" (default) or "onnx"
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch").lower()
+# Model precision: "fp32" (default) or "int8" (dynamic quantization of Linear layers)
+MODEL_PRECISION = os.environ.get("MODEL_PRECISION", "fp32").lower()
+QUANTIZED_MODEL_DIR = os.environ.get("QUANTIZED_MODEL_DIR", os.path.join(os.path.dirname(__file__), "model_int8"))
+
+# Number of top emotions returned per prediction
+TOP_N = 5
+# Maximum rows per forward pass in batch prediction
+INFERENCE_CHUNK_SIZE = int(os.environ.get("INFERENCE_CHUNK_SIZE", "32"))
+# Maximum tokens per text passed to the model
+MAX_SEQ_LENGTH = 128
+# Fixed padded sequence lengths; every batch is padded up to the smallest one that fits
+PADDING_BUCKETS = sorted({
+    min(int(size), MAX_SEQ_LENGTH)
+    for size in os.environ.get("PADDING_BUCKETS", "16,32,64,128").split(",") if size.strip()
+} | {MAX_SEQ_LENGTH})
+# Long-document mode: overlapping windows of MAX_SEQ_LENGTH tokens
+LONG_TEXT_STRIDE = int(os.environ.get("LONG_TEXT_STRIDE", "32"))
+LONG_TEXT_MAX_TOKENS = int(os.environ.get("LONG_TEXT_MAX_TOKENS", "4096"))
+# Seconds before a failed background load may be retried
+MODEL_LOAD_RETRY_SECONDS = float(os.environ.get("MODEL_LOAD_RETRY_SECONDS", "30"))
+# Number of tokenized texts kept for repeated inputs (0 disables the cache)
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "4096"))
 
 # Model tracking
 MODEL_LOADED = False
+# Set once the model is loaded and warm-up passes have run
+MODEL_READY = False
+MODEL_LOAD_ERROR = None
+# Commit the artifact store resolved MODEL_REVISION to
+ARTIFACT_COMMIT = None
+
+def _quantized_model_path():
+    """Return the cached int8 state dict path for the current model"""
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in get_model_source_id())
+    return os.path.join(QUANTIZED_MODEL_DIR, f"{safe_name}.int8.pt")
+
+def _quantize(model):
+    """Apply dynamic int8 quantization to every Linear layer"""
+    import torch
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _quantized_skeleton(config):
+    """
+    Build the module tree quantize_dynamic produces, without fp32 weights
+
+    Everything is created on the meta device except the Linear layers, which
+    are swapped for empty dynamic int8 Linears, so nothing is allocated at
+    fp32 size or randomly initialized.
+    """
+    import torch
+    from transformers import BertForSequenceClassification
+    with torch.device("meta"):
+        model = BertForSequenceClassification(config)
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if type(child) is torch.nn.Linear:
+                setattr(parent, name, torch.ao.nn.quantized.dynamic.Linear(
+                    child.in_features, child.out_features, bias_=child.bias is not None, dtype=torch.qint8
+                ))
+    return model.eval()
+
+def load_quantized_model(model_source, revision_kwargs, load_fp32_model):
+    """
+    Load the int8 model, quantizing and caching it on first use
+    
+    A cached state dict is assigned into a quantized skeleton built from the
+    config alone, so later boots never materialize the fp32 weights. If the
+    cached file does not fit the skeleton, the model is quantized again.
+    """
+    import torch
+    from transformers import BertConfig
+    path = _quantized_model_path()
+    if os.path.exists(path):
+        config = BertConfig.from_pretrained(
+            model_source,
+            **revision_kwargs,
+            problem_type="multi_label_classification",
+            num_labels=len(EMOTION_LABELS)
+        )
+        try:
+            quantized = _quantized_skeleton(config)
+            quantized.load_state_dict(torch.load(path, map_location="cpu", weights_only=True), assign=True)
+            if not materialize_buffers(quantized, config):
+                raise ValueError("model has buffers that cannot be rebuilt")
+            logger.info(f"Loaded cached int8 model from {path}")
+            return quantized
+        except Exception as e:
+            logger.warning(f"Could not load cached int8 model from {path} ({str(e)}); quantizing again")
+    
+    quantized = _quantize(load_fp32_model())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    torch.save(quantized.state_dict(), tmp_path)
+    os.replace(tmp_path, path)
+    logger.info(f"Quantized model to int8 and cached it at {path}")
+    return quantized
 
 # Load model and tokenizer
-def load_model():
+def load_model(precision=None):
     global MODEL_LOADED
+    precision = (precision or MODEL_PRECISION).lower()
+    load_started = time.perf_counter()
+    if MODEL_OFFLINE:
+        # Must be set before the Hub libraries are imported
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    from transformers import BertTokenizerFast, BertForSequenceClassification
+    logger.info(f"Imported model libraries in {time.perf_counter() - load_started:.2f}s")
     try:
-        # Authenticate with Hugging Face if token is provided
-        if HF_TOKEN and not USE_LOCAL_MODEL:
-            login(token=HF_TOKEN)
-            logger.info("Logged in to Hugging Face Hub")
-        
         # Determine model source
+        artifact_path = None
         if USE_LOCAL_MODEL:
             model_source = LOCAL_MODEL_DIR
             logger.info(f"Loading model from local path: {model_source}")
+        elif USE_ARTIFACT_STORE:
+            # Fetched once (pinned and checksummed), then always a local read
+            artifact_path = resolve_artifact(MODEL_HF_PATH, MODEL_REVISION, token=HF_TOKEN)
+            model_source = artifact_path
+            logger.info(f"Loading model from artifact store: {model_source}")
+        elif MODEL_OFFLINE:
+            raise RuntimeError("MODEL_OFFLINE requires USE_LOCAL_MODEL or USE_ARTIFACT_STORE")
         else:
+            # Authenticate with Hugging Face if token is provided
+            if HF_TOKEN:
+                from huggingface_hub import login
+                login(token=HF_TOKEN)
+                logger.info("Logged in to Hugging Face Hub")
             model_source = MODEL_HF_PATH
-            logger.info(f"Loading model from Hugging Face Hub: {model_source}")
+            logger.info(f"Loading model from Hugging Face Hub: {model_source} (revision {MODEL_REVISION})")
+        # Hub revisions do not apply to a local directory
+        revision_kwargs = {"revision": MODEL_REVISION} if model_source == MODEL_HF_PATH else {}
         
-        # Load tokenizer with fallback mechanism
+        # Load the fast (Rust) tokenizer with fallback mechanism
         try:
-            tokenizer = BertTokenizer.from_pretrained(model_source)
+            tokenizer = BertTokenizerFast.from_pretrained(model_source, **revision_kwargs)
             logger.info("Tokenizer loaded successfully")
         except Exception as e:
+            if MODEL_OFFLINE:
+                raise
             logger.warning(f"Error loading tokenizer from {model_source}: {str(e)}")
             # Fallback to default BERT tokenizer if custom one fails
-            tokenizer = BertTokenizer.from_pretrained("bert-base-uncased")
+            tokenizer = BertTokenizerFast.from_pretrained("bert-base-uncased")
             logger.info("Loaded fallback tokenizer (bert-base-uncased)")
+        _token_cache.clear()
         
         # Load model
-        model = BertForSequenceClassification.from_pretrained(
-            model_source,
-            problem_type="multi_label_classification",
-            num_labels=len(EMOTION_LABELS)
-        )
-        logger.info("Model loaded successfully")
+        def load_torch_model():
+            if artifact_path:
+                # Weights stay in the shared page cache instead of the heap
+                return load_model_mmap(
+                    artifact_path,
+                    problem_type="multi_label_classification",
+                    num_labels=len(EMOTION_LABELS)
+                )
+            return BertForSequenceClassification.from_pretrained(
+                model_source,
+                **revision_kwargs,
+                problem_type="multi_label_classification",
+                num_labels=len(EMOTION_LABELS)
+            )
+        
+        if INFERENCE_BACKEND == "onnx":
+            from app.onnx_backend import load_onnx_model
+            model = load_onnx_model(load_torch_model, tokenizer, get_model_source_id(), precision)
+        elif precision == "int8":
+            model = load_quantized_model(model_source, revision_kwargs, load_torch_model)
+        else:
+            model = load_torch_model()
+        model.eval()
+        load_seconds = time.perf_counter() - load_started
+        MODEL_LOAD_SECONDS.set(round(load_seconds, 3))
+        logger.info(f"Model loaded successfully in {load_seconds:.2f}s ({INFERENCE_BACKEND} backend, {precision})")
         
         MODEL_LOADED = True
         return model, tokenizer
@@ -78,18 +221,229 @@ def load_model():
 
 # Initialize model and tokenizer
 model, tokenizer = None, None
+_model_lock = threading.Lock()
+_loading_thread = None
+_loading_lock = threading.Lock()
+_load_failed_at = None
 
 def get_model_and_tokenizer():
     global model, tokenizer
     if model is None or tokenizer is None:
-        logger.info("First-time model loading")
-        model, tokenizer = load_model()
+        # Only one thread loads; concurrent callers wait for it
+        with _model_lock:
+            if model is None or tokenizer is None:
+                logger.info("First-time model loading")
+                model, tokenizer = load_model()
     return model, tokenizer
 
+def warm_up_model():
+    """
+    Run one forward pass at every padded shape
+    
+    Covers single-text and full-chunk batches for each padding bucket so the
+    first real requests don't pay for lazy allocation or kernel selection.
+    """
+    import torch
+    model, tokenizer = get_model_and_tokenizer()
+    token_id = tokenizer.unk_token_id if tokenizer.unk_token_id is not None else 0
+    started = time.perf_counter()
+    
+    with torch.no_grad():
+        for bucket in PADDING_BUCKETS:
+            for batch_size in sorted({1, INFERENCE_CHUNK_SIZE}):
+                model(
+                    input_ids=torch.full((batch_size, bucket), token_id, dtype=torch.long),
+                    attention_mask=torch.ones((batch_size, bucket), dtype=torch.long),
+                    token_type_ids=torch.zeros((batch_size, bucket), dtype=torch.long)
+                )
+    
+    logger.info(f"Model warm-up finished in {time.perf_counter() - started:.2f}s "
+                f"(buckets {PADDING_BUCKETS})")
+
+def _load_and_warm_up():
+    global MODEL_READY, MODEL_LOAD_ERROR, _loading_thread, _load_failed_at
+    try:
+        get_model_and_tokenizer()
+        warm_up_model()
+        MODEL_READY = True
+        MODEL_LOAD_ERROR = None
+    except Exception as e:
+        logger.error(f"Background model loading failed: {str(e)}", exc_info=True)
+        MODEL_LOAD_ERROR = str(e)
+        # Let a later start_model_loading() call try again
+        with _loading_lock:
+            _load_failed_at = time.monotonic()
+            _loading_thread = None
+
+def start_model_loading():
+    """
+    Load and warm up the model in a background thread
+
+    After a failed load, calling this again (readiness probes do) retries
+    once MODEL_LOAD_RETRY_SECONDS have passed.
+
+    Returns:
+        The loader thread, or None while waiting to retry a failed load
+    """
+    global _loading_thread
+    with _loading_lock:
+        if _loading_thread is None:
+            if _load_failed_at is not None and time.monotonic() - _load_failed_at < MODEL_LOAD_RETRY_SECONDS:
+                return None
+            if _load_failed_at is not None:
+                logger.info("Retrying model loading")
+            _loading_thread = threading.Thread(target=_load_and_warm_up, name="model-loader", daemon=True)
+            _loading_thread.start()
+        return _loading_thread
+
+class TokenCache:
+    """Small thread-safe LRU of token ids for repeated input texts"""
+    
+    def __init__(self, max_size=TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, text):
+        with self._lock:
+            encoding = self._entries.get(text)
+            if encoding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(text)
+            self.hits += 1
+            return encoding
+    
+    def set(self, text, encoding):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[text] = encoding
+            self._entries.move_to_end(text)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size,
+                    "hits": self.hits, "misses": self.misses}
+
+_token_cache = TokenCache()
+
+def tokenize_texts(texts):
+    """
+    Tokenize a list of texts without padding
+    
+    Cached texts are served from the token cache; the rest are encoded in a
+    single call, which the fast tokenizer runs in Rust with the GIL released.
+    
+    Args:
+        texts (list): Input texts to tokenize
+        
+    Returns:
+        dict: Lists of input_ids, token_type_ids and attention_mask, one row per text
+    """
+    _, tokenizer = get_model_and_tokenizer()
+    if not texts:
+        return {key: [] for key in tokenizer.model_input_names}
+    
+    rows = [_token_cache.get(text) for text in texts]
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        encodings = tokenizer(
+            [texts[i] for i in missing], 
+            truncation=True, 
+            max_length=MAX_SEQ_LENGTH
+        )
+        keys = list(encodings.keys())
+        for position, i in enumerate(missing):
+            row = {key: encodings[key][position] for key in keys}
+            rows[i] = row
+            _token_cache.set(texts[i], row)
+    
+    keys = rows[0].keys()
+    return {key: [row[key] for row in rows] for key in keys}
+
+def get_bucket_length(length):
+    """Return the smallest padding bucket that fits a sequence length"""
+    for bucket in PADDING_BUCKETS:
+        if length <= bucket:
+            return bucket
+    return PADDING_BUCKETS[-1]
+
+def pad_to_bucket(tokenizer, encodings):
+    """Pad unpadded encodings to the bucket shape of their longest row"""
+    longest = max(len(ids) for ids in encodings["input_ids"])
+    return tokenizer.pad(
+        encodings, 
+        padding="max_length", 
+        max_length=get_bucket_length(longest), 
+        return_tensors="pt"
+    )
+
+def get_token_cache_stats():
+    """Return hit/miss counters for the token id cache"""
+    return _token_cache.stats()
+
+def _artifact_commit():
+    """Return the commit MODEL_REVISION is pinned to in the artifact store, looked up once"""
+    global ARTIFACT_COMMIT
+    if ARTIFACT_COMMIT is None:
+        path = find_artifact(MODEL_HF_PATH, MODEL_REVISION)
+        if path is not None:
+            try:
+                ARTIFACT_COMMIT = read_manifest(path).get("commit")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read artifact manifest in {path}: {str(e)}")
+    return ARTIFACT_COMMIT
+
+def get_model_source_id():
+    """Return a string identifying the model weights and revision"""
+    if USE_LOCAL_MODEL:
+        return "local-model"
+    if USE_ARTIFACT_STORE:
+        # A branch or tag pin moves when fetch_model.py is run again, so the
+        # resolved commit keeps caches from serving results of older weights
+        commit = _artifact_commit()
+        if commit:
+            return f"{MODEL_HF_PATH}@{commit}"
+    return f"{MODEL_HF_PATH}@{MODEL_REVISION}"
+
+def get_model_identity():
+    """Return a string identifying the model that produces predictions"""
+    return f"{get_model_source_id()}:{MODEL_PRECISION}:top{TOP_N}"
+
 def is_model_loaded():
     """Check if the model has been loaded successfully"""
     return MODEL_LOADED
 
+def is_model_ready():
+    """Check if the model has been loaded and warmed up"""
+    return MODEL_READY
+
+def get_model_load_error():
+    """Return the background loading error, if any"""
+    return MODEL_LOAD_ERROR
+
+def _format_top_emotions(probs_list, top_n=TOP_N):
+    """Map a row of probabilities to the top N emotion labels"""
+    # Create dictionary mapping emotions to probabilities
+    emotions_dict = {
+        EMOTION_LABELS[i]: round(float(prob), 4) 
+        for i, prob in enumerate(probs_list)
+    }
+    
+    # Sort by probability (descending) and take top N
+    return dict(
+        sorted(emotions_dict.items(), key=lambda x: x[1], reverse=True)[:top_n]
+    )
+
 def predict_emotions(text):
     """
     Predict emotions from text input
@@ -100,43 +454,182 @@ def predict_emotions(text):
     Returns:
         dict: Dictionary mapping emotion labels to probabilities
     """
-    logger.info(f"Predicting emotions for text: {text[:50]}..." if len(text) > 50 else f"Predicting emotions for text: {text}")
+    import torch
+    logger.debug(f"Predicting emotions for text: {text[:50]}..." if len(text) > 50 else f"Predicting emotions for text: {text}")
     
     model, tokenizer = get_model_and_tokenizer()
     
     # Set model to evaluation mode
     model.eval()
     
-    # Tokenize input text
-    inputs = tokenizer(
-        text, 
-        return_tensors="pt", 
-        padding=True, 
-        truncation=True, 
-        max_length=128
-    )
+    # Tokenize input text, padded to a fixed bucket shape
+    with TOKENIZE_SECONDS.time():
+        inputs = pad_to_bucket(tokenizer, tokenize_texts([text]))
     
     # Make prediction
-    with torch.no_grad():
+    BATCH_SIZE.observe(1)
+    with FORWARD_SECONDS.time(), torch.no_grad():
         outputs = model(**inputs)
         logits = outputs.logits
         # Apply sigmoid to get probabilities for multi-label classification
         probs = torch.sigmoid(logits)
     
     # Convert to list and map to emotion labels
-    probs_list = probs[0].tolist()
+    with POSTPROCESS_SECONDS.time():
+        probs_list = probs[0].tolist()
+        sorted_emotions = _format_top_emotions(probs_list)
     
-    # Create dictionary mapping emotions to probabilities
-    emotions_dict = {
-        EMOTION_LABELS[i]: round(float(prob), 4) 
-        for i, prob in enumerate(probs_list)
-    }
+    logger.debug(f"Prediction complete. Top emotions: {sorted_emotions}")
+    return sorted_emotions
+
+def predict_probabilities(texts, model=None, tokenizer=None):
+    """
+    Compute sigmoid probabilities for every emotion label
     
-    # Sort by probability (descending) and take top N
-    TOP_N = 5
-    sorted_emotions = dict(
-        sorted(emotions_dict.items(), key=lambda x: x[1], reverse=True)[:TOP_N]
+    The whole list is tokenized in one call and grouped by padding bucket, so
+    short texts are never padded up to a long one. Each bucket is run through
+    the model in chunks of INFERENCE_CHUNK_SIZE rows at a fixed sequence
+    length, and rows are returned in their original order.
+    
+    Args:
+        texts (list): Input texts to analyze
+        model: Optional model to use instead of the shared one
+        tokenizer: Optional tokenizer to use instead of the shared one
+        
+    Returns:
+        torch.Tensor: Probabilities of shape (len(texts), len(EMOTION_LABELS))
+    """
+    import torch
+    shared = model is None or tokenizer is None
+    if shared:
+        model, tokenizer = get_model_and_tokenizer()
+    model.eval()
+    
+    # Tokenize everything at once; padding happens per chunk below
+    tokenize_started = time.perf_counter()
+    if shared:
+        encodings = tokenize_texts(list(texts))
+    else:
+        encodings = tokenizer(list(texts), truncation=True, max_length=MAX_SEQ_LENGTH)
+    tokenize_seconds = time.perf_counter() - tokenize_started
+    
+    # Sort rows by token length and group them by bucket
+    buckets = {}
+    for index in sorted(range(len(texts)), key=lambda i: len(encodings["input_ids"][i])):
+        length = len(encodings["input_ids"][index])
+        buckets.setdefault(get_bucket_length(length), []).append(index)
+    
+    probs = torch.empty((len(texts), len(EMOTION_LABELS)))
+    for bucket, indices in buckets.items():
+        for start in range(0, len(indices), INFERENCE_CHUNK_SIZE):
+            chunk_indices = indices[start:start + INFERENCE_CHUNK_SIZE]
+            pad_started = time.perf_counter()
+            chunk = {key: [values[i] for i in chunk_indices] for key, values in encodings.items()}
+            inputs = tokenizer.pad(chunk, padding="max_length", max_length=bucket, return_tensors="pt")
+            tokenize_seconds += time.perf_counter() - pad_started
+            
+            BATCH_SIZE.observe(len(chunk_indices))
+            with FORWARD_SECONDS.time(), torch.no_grad():
+                # Scatter rows back to their original positions
+                probs[chunk_indices] = torch.sigmoid(model(**inputs).logits).float()
+    
+    TOKENIZE_SECONDS.observe(tokenize_seconds)
+    return probs
+
+def top_emotions_from_probs(probs, top_n=TOP_N):
+    """
+    Convert a (rows, labels) probability tensor into top emotion dictionaries
+    
+    Uses torch.topk for all rows at once instead of sorting a dict per row.
+    """
+    import torch
+    top_n = max(1, min(top_n, len(EMOTION_LABELS)))
+    top_values, top_indices = torch.topk(probs, k=top_n, dim=1)
+    return [
+        {
+            EMOTION_LABELS[index]: round(float(value), 4)
+            for value, index in zip(values, indices)
+        }
+        for values, indices in zip(top_values.tolist(), top_indices.tolist())
+    ]
+
+def predict_emotions_batch(texts, top_n=TOP_N):
+    """
+    Predict emotions for a list of texts
+    
+    Args:
+        texts (list): Input texts to analyze
+        top_n (int): Number of top emotions to return per text
+        
+    Returns:
+        list: One dictionary of top emotions per input text, in input order
+    """
+    if not texts:
+        return []
+    
+    probs = predict_probabilities(texts)
+    with POSTPROCESS_SECONDS.time():
+        results = top_emotions_from_probs(probs, top_n)
+    
+    logger.info(f"Batch prediction complete for {len(texts)} texts")
+    return results
+
+def predict_emotions_long(text, aggregation="max", top_n=TOP_N, max_tokens=LONG_TEXT_MAX_TOKENS):
+    """
+    Predict emotions for a text longer than the model's window
+    
+    The text is split into overlapping MAX_SEQ_LENGTH-token windows (sharing
+    LONG_TEXT_STRIDE tokens), all windows run as one batch, and per-label
+    probabilities are aggregated across windows.
+    
+    Args:
+        text (str): Input text to analyze
+        aggregation (str): "max" or "mean" across windows
+        top_n (int): Number of top emotions to return
+        max_tokens (int): Token budget for the whole text
+        
+    Returns:
+        dict: "emotions" (top emotions), "windows" and "tokens" counts
+        
+    Raises:
+        ValueError: If the aggregation is unknown or the text exceeds the token budget
+    """
+    import torch
+    if aggregation not in ("max", "mean"):
+        raise ValueError(f"Unknown aggregation '{aggregation}', expected 'max' or 'mean'")
+    
+    model, tokenizer = get_model_and_tokenizer()
+    model.eval()
+    
+    tokenize_started = time.perf_counter()
+    token_count = len(tokenizer(text, add_special_tokens=False)["input_ids"])
+    if token_count > max_tokens:
+        raise ValueError(f"Input text too long: {token_count} tokens, max {max_tokens} allowed")
+    
+    # The fast tokenizer emits every overlapping window in one call
+    windows = tokenizer(
+        text, 
+        truncation=True, 
+        max_length=MAX_SEQ_LENGTH, 
+        stride=min(LONG_TEXT_STRIDE, MAX_SEQ_LENGTH // 2), 
+        return_overflowing_tokens=True
     )
+    encodings = {
+        key: values for key, values in windows.items()
+        if key in ("input_ids", "token_type_ids", "attention_mask")
+    }
+    inputs = pad_to_bucket(tokenizer, encodings)
+    TOKENIZE_SECONDS.observe(time.perf_counter() - tokenize_started)
     
-    logger.info(f"Prediction complete. Top emotions: {sorted_emotions}")
-    return sorted_emotions
\ No newline at end of file
+    BATCH_SIZE.observe(inputs["input_ids"].shape[0])
+    with FORWARD_SECONDS.time(), torch.no_grad():
+        probs = torch.sigmoid(model(**inputs).logits)
+    
+    with POSTPROCESS_SECONDS.time():
+        aggregated = probs.max(dim=0).values if aggregation == "max" else probs.mean(dim=0)
+        emotions = _format_top_emotions(aggregated.tolist(), top_n)
+    return {
+        "emotions": emotions,
+        "windows": probs.shape[0],
+        "tokens": token_count
+    }
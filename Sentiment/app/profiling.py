@@ -0,0 +1,240 @@
+"""
+On-demand profiling for the Emotion Analyzer app.
+Wraps a single prediction in cProfile and the torch profiler when an admin
+asks for it (or a sampled request is picked), stores the resulting files for
+download, and exposes tracemalloc snapshots for chasing memory growth.
+"""
+import io
+import os
+import re
+import time
+import uuid
+import hmac
+import random
+import logging
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Profiling settings; the admin endpoints are disabled while no token is set
+PROFILE_ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+PROFILE_MAX_RUNS = int(os.environ.get("PROFILE_MAX_RUNS", "20"))
+PROFILE_TORCH = os.environ.get("PROFILE_TORCH", "true").lower() == "true"
+TRACEMALLOC_FRAMES = int(os.environ.get("TRACEMALLOC_FRAMES", "10"))
+
+PROFILE_HEADER = "X-Profile"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+_PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+# Only one cProfile/torch profiler session can be active per process
+_profile_lock = threading.Lock()
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Check a token against PROFILE_ADMIN_TOKEN in constant time"""
+    if not PROFILE_ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), PROFILE_ADMIN_TOKEN.encode())
+
+def should_profile(header_value: Optional[str]) -> bool:
+    """Profile when the admin header carries the admin token, or when sampled"""
+    if header_value and is_admin_token(header_value):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+# Profile runs
+
+def _run_dir(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, profile_id)
+
+def _prune_runs():
+    """Keep only the newest PROFILE_MAX_RUNS runs on disk"""
+    runs = list_profiles()
+    for run in runs[PROFILE_MAX_RUNS:]:
+        run_dir = _run_dir(run["id"])
+        for name in os.listdir(run_dir):
+            os.remove(os.path.join(run_dir, name))
+        os.rmdir(run_dir)
+
+def profile_call(fn: Callable[[], Any], label: str = "predict") -> Tuple[Any, Optional[str]]:
+    """
+    Run fn under cProfile and, when available, the torch profiler
+
+    Writes cprofile.prof (pstats; open with snakeviz or flameprof),
+    cprofile.txt (top functions by cumulative time) and torch_trace.json
+    (Chrome trace; open in Perfetto or chrome://tracing) into a new run
+    directory under PROFILE_DIR.
+
+    Args:
+        fn: Zero-argument callable to profile; it runs on the calling thread
+        label: Short description stored with the run
+
+    Returns:
+        Tuple of (fn result, profile id). The id is None when another
+        profile was already running and fn ran unprofiled.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        logger.info("Profiler busy, running request unprofiled")
+        return fn(), None
+
+    try:
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+        run_dir = _run_dir(profile_id)
+        os.makedirs(run_dir, exist_ok=True)
+
+        torch_profiler = None
+        if PROFILE_TORCH:
+            try:
+                from torch.profiler import profile, ProfilerActivity
+                torch_profiler = profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+            except Exception as e:
+                logger.warning(f"Torch profiler unavailable: {str(e)}")
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        if torch_profiler is not None:
+            torch_profiler.__enter__()
+        profiler.enable()
+        try:
+            result = fn()
+        finally:
+            profiler.disable()
+            if torch_profiler is not None:
+                torch_profiler.__exit__(None, None, None)
+        elapsed = time.perf_counter() - started
+
+        try:
+            _write_run(run_dir, profiler, torch_profiler, label, elapsed)
+            _prune_runs()
+        except Exception as e:
+            # A failed write must never fail the request being profiled
+            logger.error(f"Error saving profile {profile_id}: {str(e)}")
+            return result, None
+
+        logger.info(f"Saved profile {profile_id} ({label}, {elapsed * 1000:.1f} ms)")
+        return result, profile_id
+    finally:
+        _profile_lock.release()
+
+def _write_run(run_dir, profiler, torch_profiler, label, elapsed):
+    profiler.dump_stats(os.path.join(run_dir, "cprofile.prof"))
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(40)
+    with open(os.path.join(run_dir, "cprofile.txt"), "w") as f:
+        f.write(f"{label}: {elapsed * 1000:.3f} ms\n\n")
+        f.write(summary.getvalue())
+
+    if torch_profiler is not None:
+        torch_profiler.export_chrome_trace(os.path.join(run_dir, "torch_trace.json"))
+        with open(os.path.join(run_dir, "torch_ops.txt"), "w") as f:
+            f.write(torch_profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=40))
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Return stored profile runs, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    runs = []
+    for profile_id in os.listdir(PROFILE_DIR):
+        run_dir = _run_dir(profile_id)
+        if not _PROFILE_ID_PATTERN.match(profile_id) or not os.path.isdir(run_dir):
+            continue
+        runs.append({
+            "id": profile_id,
+            "files": sorted(os.listdir(run_dir)),
+            "created": os.path.getmtime(run_dir)
+        })
+    runs.sort(key=lambda run: (run["created"], run["id"]), reverse=True)
+    return runs
+
+def get_profile_file(profile_id: str, filename: str) -> Optional[str]:
+    """Return the path of a stored profile file, or None if it does not exist"""
+    if not _PROFILE_ID_PATTERN.match(profile_id) or os.path.basename(filename) != filename:
+        return None
+    path = os.path.join(_run_dir(profile_id), filename)
+    return path if os.path.isfile(path) else None
+
+
+# Memory snapshots
+
+_snapshot_lock = threading.Lock()
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+def _format_stat(stat) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    entry = {
+        "location": f"{frame.filename}:{frame.lineno}",
+        "size_kb": round(stat.size / 1024, 1),
+        "count": stat.count
+    }
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+def memory_snapshot(limit: int = 25, group_by: str = "lineno") -> Dict[str, Any]:
+    """
+    Take a tracemalloc snapshot and diff it against the previous one
+
+    The first call starts tracing and returns no allocations; each later call
+    returns the top allocation sites and the growth since the last call.
+
+    Args:
+        limit: Number of allocation sites to return
+        group_by: "lineno", "filename" or "traceback"
+
+    Returns:
+        Dictionary with traced memory totals, "top" sites and "diff" sites
+    """
+    global _last_snapshot
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise ValueError("group_by must be 'lineno', 'filename' or 'traceback'")
+
+    with _snapshot_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            _last_snapshot = None
+            logger.info(f"Started tracemalloc with {TRACEMALLOC_FRAMES} frames")
+            return {"tracing": True, "started": True, "top": [], "diff": []}
+
+        # Ignore allocations made by tracemalloc itself
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        result = {
+            "tracing": True,
+            "started": False,
+            "traced_current_mb": round(current / 1024 / 1024, 2),
+            "traced_peak_mb": round(peak / 1024 / 1024, 2),
+            "top": [_format_stat(stat) for stat in snapshot.statistics(group_by)[:limit]],
+            "diff": []
+        }
+        if _last_snapshot is not None:
+            result["diff"] = [_format_stat(stat) for stat in snapshot.compare_to(_last_snapshot, group_by)[:limit]]
+        _last_snapshot = snapshot
+        return result
+
+def stop_memory_tracing():
+    """Stop tracemalloc and drop the stored snapshot"""
+    global _last_snapshot
+    with _snapshot_lock:
+        _last_snapshot = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("Stopped tracemalloc")
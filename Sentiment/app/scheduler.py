@@ -0,0 +1,365 @@
+"""
+Micro-batching inference scheduler for the Emotion Analyzer app.
+Queues incoming texts in priority lanes and runs them through the model as
+padded batches, flushing when either the lane's max batch size or max wait
+time is reached. Interactive requests and bulk scoring share one worker with
+weighted scheduling, so a backfill cannot starve the web UI.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from dotenv import load_dotenv
+
+from app.predict import predict_emotions_batch, TOP_N
+from app.admission import DeadlineExceeded, ADMISSION_REJECTED_TOTAL, check_deadline, remaining_seconds
+from app.metrics import LANE_QUEUE_SECONDS, LANE_LATENCY_SECONDS
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Scheduler settings; BATCH_MAX_SIZE and BATCH_MAX_WAIT_MS apply to the interactive lane
+ENABLE_MICRO_BATCHING = os.environ.get("ENABLE_MICRO_BATCHING", "True").lower() == "true"
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "5"))
+BATCH_RESULT_TIMEOUT = float(os.environ.get("BATCH_RESULT_TIMEOUT", "30"))
+BULK_BATCH_MAX_SIZE = int(os.environ.get("BULK_BATCH_MAX_SIZE", "32"))
+BULK_BATCH_MAX_WAIT_MS = float(os.environ.get("BULK_BATCH_MAX_WAIT_MS", "20"))
+# Batches each lane gets per round while both have work queued
+INTERACTIVE_LANE_WEIGHT = int(os.environ.get("INTERACTIVE_LANE_WEIGHT", "4"))
+BULK_LANE_WEIGHT = int(os.environ.get("BULK_LANE_WEIGHT", "1"))
+
+INTERACTIVE_LANE = "interactive"
+BULK_LANE = "bulk"
+
+
+class Lane:
+    """One priority class with its own queue, batch limits and scheduling weight"""
+
+    def __init__(self, name: str, weight: int, max_batch_size: int, max_wait_ms: float):
+        self.name = name
+        self.weight = max(1, weight)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.queue: deque = deque()
+        # Texts submitted and not yet resolved, queued or in a running batch
+        self.in_flight = 0
+        # Smooth weighted round-robin credit
+        self.credit = 0
+        # Set when an interactive arrival cut this lane's fill wait short
+        self.preempted = False
+
+        # Batch statistics
+        self.batches = 0
+        self.items = 0
+        self.preemptions = 0
+        self.max_batch_seen = 0
+        self.last_batch_size = 0
+        self.batch_size_counts: Dict[int, int] = {}
+        self.total_batch_seconds = 0.0
+
+    def take(self, limit: int) -> List[Any]:
+        return [self.queue.popleft() for _ in range(min(limit, len(self.queue)))]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "weight": self.weight,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "queue_depth": len(self.queue),
+            "in_flight": self.in_flight,
+            "batches": self.batches,
+            "items": self.items,
+            "preemptions": self.preemptions,
+            "avg_batch_size": round(self.items / self.batches, 3) if self.batches else 0.0,
+            "max_batch_size_seen": self.max_batch_seen,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_ms": round(self.total_batch_seconds * 1000 / self.batches, 3) if self.batches else 0.0,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self.batch_size_counts.items())},
+        }
+
+
+class InferenceScheduler:
+    """
+    Collects texts from many request threads and runs them as one batch.
+
+    A single worker thread owns the model, so Flask request threads never
+    compete with each other for torch's intra-op threads. Lanes are served
+    by smooth weighted round-robin between batches; a batch is never split,
+    but the first (interactive) lane preempts another lane that is still
+    waiting to fill its batch.
+    """
+
+    def __init__(self, batch_fn: Callable[..., List[Dict[str, float]]],
+                 max_batch_size: int = BATCH_MAX_SIZE,
+                 max_wait_ms: float = BATCH_MAX_WAIT_MS,
+                 lanes: Optional[List[Lane]] = None):
+        self.batch_fn = batch_fn
+        if lanes is None:
+            lanes = [
+                Lane(INTERACTIVE_LANE, INTERACTIVE_LANE_WEIGHT, max_batch_size, max_wait_ms),
+                Lane(BULK_LANE, BULK_LANE_WEIGHT, BULK_BATCH_MAX_SIZE, BULK_BATCH_MAX_WAIT_MS),
+            ]
+        self.lanes: Dict[str, Lane] = {lane.name: lane for lane in lanes}
+        self._priority_lane = lanes[0]
+
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """Start the worker thread if it is not already running"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+            self._thread.start()
+        lanes = ", ".join(f"{lane.name}: weight={lane.weight} max_batch_size={lane.max_batch_size} "
+                          f"max_wait_ms={lane.max_wait * 1000:.1f}" for lane in self.lanes.values())
+        logger.info(f"Inference scheduler started ({lanes})")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the worker thread once the queued work has been processed"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        logger.info("Inference scheduler stopped")
+
+    def submit(self, text: str, deadline: Optional[float] = None, lane: str = INTERACTIVE_LANE,
+               top_n: Optional[int] = None) -> Future:
+        """
+        Queue a text for the next batch of a lane
+
+        Args:
+            text: Input text to analyze
+            deadline: Optional time.monotonic() deadline; the text is dropped
+                with DeadlineExceeded if it has passed when its batch runs
+            lane: Priority lane, INTERACTIVE_LANE or BULK_LANE
+            top_n: Number of top emotions to return (default TOP_N)
+
+        Returns:
+            A future resolving to the top emotions dictionary for the text
+        """
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown scheduler lane: {lane}")
+        if not self._running:
+            self.start()
+        future = Future()
+        target = self.lanes[lane]
+        with self._cond:
+            target.queue.append((text, future, deadline, top_n, time.monotonic()))
+            target.in_flight += 1
+            self._cond.notify()
+        future.add_done_callback(lambda _: self._resolved(target))
+        return future
+
+    def _resolved(self, lane: Lane):
+        with self._cond:
+            lane.in_flight -= 1
+
+    def lane_busy(self, lane: str) -> bool:
+        """True while a lane has texts queued or in a running batch"""
+        return self.lanes[lane].in_flight > 0
+
+    def predict(self, text: str, timeout: Optional[float] = BATCH_RESULT_TIMEOUT,
+                deadline: Optional[float] = None, lane: str = INTERACTIVE_LANE) -> Dict[str, float]:
+        """Queue a text and block until its prediction is ready or the deadline passes"""
+        remaining = remaining_seconds(deadline)
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        future = self.submit(text, deadline, lane)
+        try:
+            return future.result(timeout=max(0.0, timeout) if timeout is not None else None)
+        except FutureTimeoutError:
+            # Cancelled futures are skipped by the worker, so no forward pass is wasted
+            future.cancel()
+            if deadline is not None and remaining_seconds(deadline) <= 0:
+                raise DeadlineExceeded("Request deadline expired waiting for the model")
+            raise
+
+    def predict_many(self, texts: List[str], lane: str = BULK_LANE, top_n: Optional[int] = None,
+                     deadline: Optional[float] = None) -> List[Dict[str, float]]:
+        """
+        Queue a list of texts on one lane and wait for all of them
+
+        The lane cuts the list into its own batch size, so interactive
+        batches can run between the chunks of a large request.
+        """
+        futures = [self.submit(text, deadline, lane, top_n) for text in texts]
+        try:
+            results = []
+            for future in futures:
+                remaining = remaining_seconds(deadline)
+                try:
+                    results.append(future.result(timeout=max(0.0, remaining) if remaining is not None else None))
+                except FutureTimeoutError:
+                    raise DeadlineExceeded("Request deadline expired waiting for the model")
+            return results
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def _pick_lane(self, ready: List[Lane]) -> Lane:
+        """Smooth weighted round-robin over the lanes with queued work"""
+        total = sum(lane.weight for lane in ready)
+        for lane in ready:
+            lane.credit += lane.weight
+        # Ties go to the earlier (higher priority) lane
+        chosen = max(ready, key=lambda lane: lane.credit)
+        chosen.credit -= total
+        return chosen
+
+    def _next_batch(self) -> Tuple[Optional[Lane], List[Any]]:
+        """Wait for work, pick a lane and gather its batch until full or its wait expires"""
+        with self._cond:
+            while True:
+                ready = [lane for lane in self.lanes.values() if lane.queue]
+                if ready:
+                    break
+                if not self._running:
+                    return None, []
+                self._cond.wait()
+
+            lane = self._pick_lane(ready)
+            batch = lane.take(lane.max_batch_size)
+            fill_deadline = time.monotonic() + lane.max_wait
+            while len(batch) < lane.max_batch_size and self._running:
+                if lane is not self._priority_lane and self._priority_lane.queue and not lane.preempted:
+                    # Interactive work arrived while this batch was filling: put it
+                    # back and run interactive first; this lane skips the wait next time
+                    lane.queue.extendleft(reversed(batch))
+                    lane.credit += sum(l.weight for l in ready)
+                    lane.preempted = True
+                    lane.preemptions += 1
+                    lane = self._priority_lane
+                    batch = lane.take(lane.max_batch_size)
+                    fill_deadline = time.monotonic() + lane.max_wait
+                    continue
+                if lane.preempted:
+                    break
+                remaining = fill_deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+                batch += lane.take(lane.max_batch_size - len(batch))
+            if lane is not self._priority_lane:
+                lane.preempted = False
+            return lane, batch
+
+    def _run(self):
+        """Worker loop: collect a batch, run one forward pass, resolve each caller's future"""
+        while True:
+            lane, batch = self._next_batch()
+            if lane is None:
+                break
+
+            # Skip callers that gave up before the batch ran, and drop work
+            # whose deadline passed while it was queued
+            now = time.monotonic()
+            runnable = []
+            for text, future, deadline, top_n, enqueued_at in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if deadline is not None and now >= deadline:
+                    ADMISSION_REJECTED_TOTAL.inc(reason=DeadlineExceeded.reason, stage="batch")
+                    future.set_exception(DeadlineExceeded("Request deadline expired before the forward pass"))
+                    continue
+                LANE_QUEUE_SECONDS.observe(now - enqueued_at, lane=lane.name)
+                runnable.append((text, future, top_n or TOP_N, enqueued_at))
+            if not runnable:
+                continue
+
+            texts = [text for text, _, _, _ in runnable]
+            # One forward pass serves every top_n in the batch; smaller ones are trimmed
+            batch_top_n = max(top_n for _, _, top_n, _ in runnable)
+            started = time.perf_counter()
+            try:
+                if batch_top_n == TOP_N:
+                    results = self.batch_fn(texts)
+                else:
+                    results = self.batch_fn(texts, top_n=batch_top_n)
+            except Exception as e:
+                logger.error(f"Batch prediction failed for {len(texts)} {lane.name} texts: {str(e)}", exc_info=True)
+                for _, future, _, _ in runnable:
+                    future.set_exception(e)
+                continue
+            finally:
+                self._record_batch(lane, len(texts), time.perf_counter() - started)
+
+            finished = time.monotonic()
+            for (_, future, top_n, enqueued_at), result in zip(runnable, results):
+                if top_n < batch_top_n:
+                    # Results are ordered by probability, highest first
+                    result = dict(list(result.items())[:top_n])
+                future.set_result(result)
+                LANE_LATENCY_SECONDS.observe(finished - enqueued_at, lane=lane.name)
+
+    def _record_batch(self, lane: Lane, size: int, seconds: float):
+        """Update batch-size statistics"""
+        with self._cond:
+            lane.batches += 1
+            lane.items += size
+            lane.last_batch_size = size
+            lane.max_batch_seen = max(lane.max_batch_seen, size)
+            lane.batch_size_counts[size] = lane.batch_size_counts.get(size, 0) + 1
+            lane.total_batch_seconds += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and batch-size statistics for tuning, overall and per lane"""
+        with self._cond:
+            lanes = {name: lane.stats() for name, lane in self.lanes.items()}
+            running = self._running
+        batches = sum(lane["batches"] for lane in lanes.values())
+        items = sum(lane["items"] for lane in lanes.values())
+        priority = lanes[self._priority_lane.name]
+        return {
+            "running": running,
+            "max_batch_size": priority["max_batch_size"],
+            "max_wait_ms": priority["max_wait_ms"],
+            "queue_depth": sum(lane["queue_depth"] for lane in lanes.values()),
+            "batches": batches,
+            "items": items,
+            "avg_batch_size": round(items / batches, 3) if batches else 0.0,
+            "lanes": lanes,
+        }
+
+
+# Shared scheduler instance
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> InferenceScheduler:
+    """Return the process-wide scheduler, creating it on first use"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = InferenceScheduler(predict_emotions_batch)
+    return _scheduler
+
+def predict_bulk(texts: List[str], top_n: int = TOP_N, deadline: Optional[float] = None) -> List[Dict[str, float]]:
+    """
+    Score a list of texts on the bulk lane
+
+    Used by batch, streaming and background job scoring so interactive
+    requests keep priority on the shared model. Falls back to a direct batch
+    call when micro-batching is disabled.
+    """
+    if not ENABLE_MICRO_BATCHING:
+        check_deadline(deadline)
+        return predict_emotions_batch(texts, top_n=top_n)
+    return get_scheduler().predict_many(texts, lane=BULK_LANE, top_n=top_n, deadline=deadline)
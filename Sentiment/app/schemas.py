@@ -21,6 +21,25 @@ class EmotionResponse(BaseModel):
     """Schema for emotion analysis response"""
     emotions: Dict[str, float]
 
+class BatchEmotionRequest(BaseModel):
+    """Schema for batch emotion analysis request"""
+    texts: List[str] = Field(..., example=["I am really happy!", "This is so frustrating."])
+    top_n: int = Field(5, ge=1, le=28)
+    
+    @validator('texts')
+    def texts_must_not_be_empty(cls, v):
+        if not v:
+            raise ValueError('Texts cannot be empty')
+        if any(not text.strip() for text in v):
+            raise ValueError('Text cannot be empty')
+        return v
+
+class BatchEmotionResponse(BaseModel):
+    """Schema for batch emotion analysis response"""
+    results: List[EmotionResponse]
+    ids: List[str] = []
+    count: int
+
 class PredictionInDB(BaseModel):
     """Schema for a prediction stored in the database"""
     id: str = Field(alias="_id")
@@ -75,6 +94,7 @@ class PredictionList(BaseModel):
     total: int
     page: int
     limit: int
+    next_cursor: Optional[str] = None
     
     class Config:
         schema_extra = {
@@ -93,7 +113,8 @@ class PredictionList(BaseModel):
                 ],
                 "total": 42,
                 "page": 1,
-                "limit": 10
+                "limit": 10,
+                "next_cursor": "eyJ0IjogIjIwMjMtMDQtMTVUMTA6MzA6MDAiLCAiaWQiOiAiNTA3ZjFmNzdiY2Y4NmNkNzk5NDM5MDExIn0="
             }
         }
 
@@ -0,0 +1,256 @@
+"""
+Streaming bulk analysis helpers for the Emotion Analyzer app.
+Parses newline-delimited JSON texts from a file-like stream and yields
+NDJSON results batch by batch, so memory stays bounded by one batch.
+"""
+import os
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+from dotenv import load_dotenv
+
+from app.predict import predict_emotions_batch
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Streaming settings
+STREAM_BATCH_SIZE = int(os.environ.get("STREAM_BATCH_SIZE", "64"))
+STREAM_MAX_LINE_BYTES = int(os.environ.get("STREAM_MAX_LINE_BYTES", str(64 * 1024)))
+STREAM_MAX_TEXT_LENGTH = int(os.environ.get("STREAM_MAX_TEXT_LENGTH", "512"))
+
+
+def iter_ndjson_records(stream, max_line_bytes: int = STREAM_MAX_LINE_BYTES) -> Iterator[Dict[str, Any]]:
+    """
+    Read NDJSON input one line at a time
+
+    Each line is either a JSON string or an object with a "text" field and an
+    optional "id". Blank lines are skipped. Invalid lines are yielded as
+    records with an "error" so the caller can report them in order.
+
+    Args:
+        stream: Binary file-like object supporting readline(limit)
+        max_line_bytes: Longest line accepted; longer lines are skipped
+
+    Yields:
+        Dictionaries with "index" and either "text" (plus optional "id") or "error"
+    """
+    index = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+
+        if len(line) > max_line_bytes and not line.endswith(b"\n"):
+            # Discard the rest of an oversized line without buffering it
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(max_line_bytes)
+            yield {"index": index, "error": f"Line longer than {max_line_bytes} bytes"}
+            index += 1
+            continue
+
+        record = parse_ndjson_line(line, index)
+        if record is not None:
+            index += 1
+            yield record
+
+async def aiter_ndjson_records(chunks: AsyncIterator[bytes],
+                               max_line_bytes: int = STREAM_MAX_LINE_BYTES) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async counterpart of iter_ndjson_records for an ASGI request body
+
+    Args:
+        chunks: Async iterator of raw body chunks, split anywhere
+        max_line_bytes: Longest line accepted; longer lines are skipped
+
+    Yields:
+        The same records as iter_ndjson_records
+    """
+    index = 0
+    buffer = b""
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line, buffer = buffer[:newline + 1], buffer[newline + 1:]
+            if skipping:
+                # Tail of an oversized line already reported
+                skipping = False
+                continue
+            if len(line) > max_line_bytes + 1:
+                yield {"index": index, "error": f"Line longer than {max_line_bytes} bytes"}
+                index += 1
+                continue
+            record = parse_ndjson_line(line, index)
+            if record is not None:
+                index += 1
+                yield record
+
+        if len(buffer) > max_line_bytes:
+            # Drop the oversized line as it arrives instead of buffering it
+            if not skipping:
+                yield {"index": index, "error": f"Line longer than {max_line_bytes} bytes"}
+                index += 1
+                skipping = True
+            buffer = b""
+
+    if buffer and not skipping:
+        record = parse_ndjson_line(buffer, index)
+        if record is not None:
+            yield record
+
+def parse_ndjson_line(line: bytes, index: int) -> Optional[Dict[str, Any]]:
+    """
+    Parse and validate one NDJSON input line
+
+    Returns:
+        A record with "index" and either "text" (plus optional "id") or
+        "error", or None for a blank line
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    try:
+        value = json.loads(line)
+    except ValueError:
+        return {"index": index, "error": "Invalid JSON"}
+    return make_record(value, index)
+
+def make_record(value: Any, index: int) -> Dict[str, Any]:
+    """
+    Validate one decoded input: a text string or an object with "text" and
+    an optional "id"
+
+    Returns:
+        A record with "index" and either "text" (plus optional "id") or "error"
+    """
+    record = {"index": index}
+    if isinstance(value, dict):
+        if "id" in value:
+            record["id"] = value["id"]
+        value = value.get("text")
+
+    if not isinstance(value, str) or not value.strip():
+        record["error"] = "Input text cannot be empty"
+    elif len(value.strip()) > STREAM_MAX_TEXT_LENGTH:
+        record["error"] = f"Input text too long. Max {STREAM_MAX_TEXT_LENGTH} characters allowed"
+    else:
+        record["text"] = value.strip()
+    return record
+
+def iter_prediction_batches(records: Iterator[Dict[str, Any]], batch_size: int = STREAM_BATCH_SIZE,
+                            predict_fn: Callable[[List[str]], List[Dict[str, float]]] = predict_emotions_batch
+                            ) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Group records into batches, run inference, and yield results per batch
+
+    Error records pass through unchanged, in input order.
+    """
+    batch: List[Dict[str, Any]] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield predict_batch_records(batch, predict_fn)
+            batch = []
+    if batch:
+        yield predict_batch_records(batch, predict_fn)
+
+def predict_batch_records(batch: List[Dict[str, Any]],
+                          predict_fn: Callable[[List[str]], List[Dict[str, float]]] = predict_emotions_batch
+                          ) -> List[Dict[str, Any]]:
+    """Add "emotions" to every valid record in a batch, or an "error" if inference fails"""
+    valid = [record for record in batch if "text" in record]
+    if valid:
+        try:
+            for record, emotions in zip(valid, predict_fn([record["text"] for record in valid])):
+                record["emotions"] = emotions
+        except Exception as e:
+            logger.error(f"Streaming batch prediction failed: {str(e)}", exc_info=True)
+            for record in valid:
+                record["error"] = f"Prediction error: {str(e)}"
+    return batch
+
+def format_result_lines(batch: List[Dict[str, Any]], include_text: bool = False) -> str:
+    """Serialize a finished batch as newline-terminated JSON result lines"""
+    lines = []
+    for record in batch:
+        result: Dict[str, Any] = {"index": record["index"]}
+        if "id" in record:
+            result["id"] = record["id"]
+        if include_text and "text" in record:
+            result["text"] = record["text"]
+        if "error" in record:
+            result["error"] = record["error"]
+        else:
+            result["emotions"] = record["emotions"]
+        lines.append(json.dumps(result))
+    return "\n".join(lines) + "\n"
+
+def stream_ndjson_predictions(stream, batch_size: int = STREAM_BATCH_SIZE, include_text: bool = False,
+                              predict_fn: Callable[[List[str]], List[Dict[str, float]]] = predict_emotions_batch
+                              ) -> Iterator[str]:
+    """
+    Yield NDJSON result lines for an NDJSON input stream
+
+    Args:
+        stream: Binary file-like request body
+        batch_size: Texts per forward batch
+        include_text: Echo each input text in its result line
+        predict_fn: Batch predictor, e.g. the scheduler's bulk lane
+
+    Yields:
+        One chunk of newline-terminated JSON lines per finished batch
+    """
+    processed = 0
+    errors = 0
+    for batch in iter_prediction_batches(iter_ndjson_records(stream), batch_size, predict_fn):
+        processed += len(batch)
+        errors += sum(1 for record in batch if "error" in record)
+        yield format_result_lines(batch, include_text)
+    logger.info(f"Streaming analysis finished: {processed} lines, {errors} errors")
+
+async def astream_ndjson_predictions(chunks: AsyncIterator[bytes],
+                                     run_batch: Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]],
+                                     batch_size: int = STREAM_BATCH_SIZE,
+                                     include_text: bool = False) -> AsyncIterator[str]:
+    """
+    Async counterpart of stream_ndjson_predictions for ASGI servers
+
+    Args:
+        chunks: Async iterator of raw request body chunks
+        run_batch: Coroutine function applying predict_batch_records to a
+            batch off the event loop
+        batch_size: Texts per forward batch
+        include_text: Echo each input text in its result line
+
+    Yields:
+        One chunk of newline-terminated JSON lines per finished batch
+    """
+    processed = 0
+    errors = 0
+    batch: List[Dict[str, Any]] = []
+
+    async def finish(batch):
+        nonlocal processed, errors
+        batch = await run_batch(batch)
+        processed += len(batch)
+        errors += sum(1 for record in batch if "error" in record)
+        return format_result_lines(batch, include_text)
+
+    async for record in aiter_ndjson_records(chunks):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield await finish(batch)
+            batch = []
+    if batch:
+        yield await finish(batch)
+    logger.info(f"Streaming analysis finished: {processed} lines, {errors} errors")
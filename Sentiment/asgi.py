@@ -0,0 +1,823 @@
+"""
+ASGI Application for Emotion Analyzer
+Serves the same routes and templates as main.py on FastAPI. Motor calls are
+awaited directly on the server's event loop, and inference runs on a bounded
+thread pool so slow forward passes never block it.
+
+Usage:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from jinja2 import pass_context
+from pydantic import ValidationError
+from app.predict import (
+    predict_emotions, predict_emotions_long, is_model_loaded, is_model_ready,
+    get_model_load_error, get_token_cache_stats, start_model_loading, TOP_N
+)
+from app.scheduler import get_scheduler, predict_bulk, ENABLE_MICRO_BATCHING
+from app.streaming import astream_ndjson_predictions, predict_batch_records, iter_ndjson_records, make_record, STREAM_BATCH_SIZE
+from app.jobs import get_job_runner, current_job_runner, resume_jobs, submit_job, ENABLE_BATCH_JOBS, BATCH_JOB_RESULTS_PAGE_SIZE, JOB_COMPLETED, JOB_FAILED
+from app.cache import (
+    get_prediction_cache, warm_up_disk_store,
+    ENABLE_PREDICTION_CACHE, PREDICTION_DISK_CACHE_PATH, PREDICTION_CACHE_WARMUP_SIZE
+)
+from app.database import (
+    connect_to_mongodb, close_mongodb_connection,
+    save_prediction, save_predictions, get_predictions, get_predictions_page, count_predictions, get_prediction_by_id,
+    delete_prediction, get_stats, get_frequent_texts,
+    enqueue_prediction, write_buffer, WRITE_BUFFER_ENABLED
+)
+from app.metrics import render_metrics, REQUEST_TEXT_CHARS, REQUESTS_TOTAL, ERRORS_TOTAL
+from app.admission import (
+    AdmissionError, DEADLINE_HEADER, ENABLE_ADMISSION_CONTROL,
+    get_admission_controller, get_rate_limiter, parse_deadline, run_admitted
+)
+from app.profiling import (
+    should_profile, profile_call, is_admin_token, list_profiles, get_profile_file,
+    memory_snapshot, stop_memory_tracing, PROFILE_ADMIN_TOKEN, PROFILE_HEADER, ADMIN_TOKEN_HEADER
+)
+from app.schemas import EmotionRequest, EmotionResponse, BatchEmotionRequest, BatchEmotionResponse, PredictionList, PredictionResponse
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import json
+import logging
+import asyncio
+import tempfile
+import threading
+import time
+import os
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Database connection status
+DB_CONNECTED = False
+
+# Same limits as main.py
+BATCH_MAX_TEXTS = int(os.environ.get('BATCH_MAX_TEXTS', 1000))
+LONG_TEXT_MAX_CHARS = int(os.environ.get('LONG_TEXT_MAX_CHARS', 50000))
+EAGER_MODEL_LOADING = os.environ.get('EAGER_MODEL_LOADING', 'True').lower() == 'true'
+
+# Threads available to inference; requests beyond this wait on the event loop, not in a thread
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', min(32, (os.cpu_count() or 1) * 2)))
+
+_inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+async def run_inference(fn, *args, **kwargs):
+    """Run a blocking inference call on the bounded inference pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_inference_executor, partial(fn, *args, **kwargs))
+
+async def run_admitted_inference(fn, *args, deadline=None, **kwargs):
+    """
+    Run an inference call in an admission slot
+    The place is reserved on the loop, so a full queue is refused without
+    touching the pool; work whose deadline passes while queued is dropped
+    """
+    if not ENABLE_ADMISSION_CONTROL:
+        return await run_inference(run_admitted, fn, *args, deadline=deadline, **kwargs)
+    reservation = get_admission_controller().reservation(deadline)
+    try:
+        return await run_inference(reservation.run, fn, *args, **kwargs)
+    finally:
+        # Returns the place if the request went away before a worker started it
+        reservation.abandon()
+
+async def warm_prediction_store():
+    """Fill the disk prediction store with the most frequent past texts"""
+    try:
+        texts = await get_frequent_texts(limit=PREDICTION_CACHE_WARMUP_SIZE)
+        await run_inference(warm_up_disk_store, texts)
+    except Exception as e:
+        logger.error(f"Prediction store warm-up failed: {str(e)}")
+
+async def init_db():
+    """Initialize database connection"""
+    global DB_CONNECTED
+    started = time.perf_counter()
+    try:
+        await connect_to_mongodb()
+        DB_CONNECTED = True
+        logger.info(f"Database connected successfully in {time.perf_counter() - started:.2f}s")
+        if WRITE_BUFFER_ENABLED:
+            await write_buffer.start_async()
+    except Exception as e:
+        logger.error(f"Database connection failed: {str(e)}")
+        DB_CONNECTED = False
+        return
+
+    if ENABLE_PREDICTION_CACHE and PREDICTION_DISK_CACHE_PATH and PREDICTION_CACHE_WARMUP_SIZE > 0:
+        await warm_prediction_store()
+
+@asynccontextmanager
+async def lifespan(app):
+    """Start connecting to the database in the background and flush everything on shutdown"""
+    if EAGER_MODEL_LOADING:
+        start_model_loading()
+
+    # Resume background batch jobs left queued or running by a previous process,
+    # off the startup path; otherwise the runner starts with the first job
+    if ENABLE_BATCH_JOBS:
+        threading.Thread(target=resume_jobs, name="batch-job-resume", daemon=True).start()
+
+    # Not awaited, so the server accepts requests during server selection
+    db_task = asyncio.create_task(init_db())
+
+    yield
+
+    db_task.cancel()
+    if ENABLE_MICRO_BATCHING:
+        get_scheduler().stop()
+    try:
+        if current_job_runner() is not None:
+            await run_in_threadpool(current_job_runner().stop)
+        if DB_CONNECTED and WRITE_BUFFER_ENABLED:
+            await asyncio.wait_for(write_buffer.drain(), timeout=30)
+        await close_mongodb_connection()
+    except Exception as e:
+        logger.error(f"Error during cleanup: {e}")
+    _inference_executor.shutdown(wait=False)
+
+# Initialize FastAPI app
+app = FastAPI(title="Emotion Analyzer", lifespan=lifespan)
+
+# CORS configuration
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[
+        "http://localhost:3000",
+        "http://127.0.0.1:3000",
+        "http://localhost:5000",
+        "http://127.0.0.1:5000",
+    ],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+app.mount("/static", StaticFiles(directory=os.path.join(BASE_DIR, "static")), name="static")
+templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
+
+@pass_context
+def url_for(context, name, **params):
+    """Flask-style url_for so the templates work unchanged"""
+    if "filename" in params:
+        params["path"] = params.pop("filename")
+    return str(context["request"].url_for(name, **params))
+
+templates.env.globals["url_for"] = url_for
+
+# Helper functions
+def is_json(request: Request) -> bool:
+    return request.headers.get("content-type", "").startswith("application/json")
+
+def error_response(message: str, status_code: int) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status_code)
+
+def validation_message(error: ValidationError) -> str:
+    return error.errors()[0]["msg"]
+
+def get_request_info(request: Request):
+    """Extract useful information from the request"""
+    return {
+        "ip_address": request.client.host if request.client else None,
+        "user_agent": request.headers.get("User-Agent"),
+        "referer": request.headers.get("Referer")
+    }
+
+def request_deadline(request: Request):
+    """Rate-limit the client and return the request deadline"""
+    get_rate_limiter().check(get_request_info(request)["ip_address"])
+    return parse_deadline(request.headers.get(DEADLINE_HEADER))
+
+def analyze_text(text, deadline=None):
+    """
+    Predict emotions for a single text
+    Same cache and micro-batching path as main.py; call through
+    run_admitted_inference
+    """
+    if ENABLE_MICRO_BATCHING:
+        compute = lambda: get_scheduler().predict(text, deadline=deadline)
+    else:
+        compute = lambda: predict_emotions(text)
+
+    if ENABLE_PREDICTION_CACHE:
+        return get_prediction_cache().get_or_compute(text, compute, deadline=deadline)
+    return compute()
+
+async def store_prediction(request: Request, text, emotions):
+    """Store a prediction in the database if connected, without failing the request"""
+    if not DB_CONNECTED:
+        return
+    try:
+        request_info = get_request_info(request)
+        if WRITE_BUFFER_ENABLED:
+            # The flusher runs on this loop, so waiting for room can never succeed
+            enqueue_prediction(text, emotions, request_info, timeout=0)
+        else:
+            prediction_id = await save_prediction(text, emotions, request_info)
+            logger.info(f"Saved prediction with ID: {prediction_id}")
+    except Exception as e:
+        logger.error(f"Error saving prediction: {str(e)}")
+
+def format_prediction(prediction):
+    return PredictionResponse(
+        id=prediction["_id"],
+        text=prediction["text"],
+        emotions=prediction["emotions"],
+        timestamp=prediction["timestamp"]
+    )
+
+# Middleware
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count every response by endpoint and status for /metrics"""
+    response = await call_next(request)
+    route = request.scope.get("route")
+    endpoint = getattr(route, "name", None) or "unmatched"
+    REQUESTS_TOTAL.inc(endpoint=endpoint, status=response.status_code)
+    if response.status_code >= 400:
+        ERRORS_TOTAL.inc(endpoint=endpoint, status=response.status_code)
+    profile_id = getattr(request.state, "profile_id", None)
+    if profile_id:
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+# Routes
+
+@app.get('/', response_class=HTMLResponse, name="index")
+async def index(request: Request):
+    """Main page - render the emotion analyzer interface"""
+    return templates.TemplateResponse('index.html', {"request": request})
+
+@app.post('/predict', name="predict_emotion")
+async def predict_emotion(request: Request):
+    """
+    API endpoint to predict emotions from text input
+    Accepts both JSON API calls and form submissions
+    """
+    deadline = request_deadline(request)
+    json_request = is_json(request)
+    if json_request:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or 'text' not in data:
+            return error_response("Please provide 'text' field in JSON body", 400)
+        try:
+            text = EmotionRequest(**data).text.strip()
+        except ValidationError as e:
+            return error_response(validation_message(e), 400)
+    else:
+        form = await request.form()
+        text = (form.get('text') or '').strip()
+        if not text:
+            return RedirectResponse(request.url_for('index'), status_code=303)
+
+    if len(text) > 512:
+        error_msg = "Input text too long. Max 512 characters allowed"
+        if json_request:
+            return error_response(error_msg, 400)
+        return RedirectResponse(request.url_for('index'), status_code=303)
+
+    REQUEST_TEXT_CHARS.observe(len(text))
+
+    try:
+        if should_profile(request.headers.get(PROFILE_HEADER)):
+            # Profiled requests take the same admitted, cached path as the rest,
+            # so they keep their deadline and slot; a cache hit or a micro-batched
+            # forward pass shows up as waiting rather than model time
+            emotions, request.state.profile_id = await run_admitted_inference(
+                profile_call, lambda: analyze_text(text, deadline), "predict", deadline=deadline)
+        else:
+            emotions = await run_admitted_inference(analyze_text, text, deadline, deadline=deadline)
+    except AdmissionError:
+        raise
+    except Exception as e:
+        error_msg = f"Prediction error: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        if json_request:
+            return error_response(error_msg, 500)
+        return RedirectResponse(request.url_for('index'), status_code=303)
+
+    await store_prediction(request, text, emotions)
+
+    if json_request:
+        return EmotionResponse(emotions=emotions).dict()
+    return templates.TemplateResponse('index.html', {
+        "request": request,
+        "text": text,
+        "emotions": emotions,
+        "success": True
+    })
+
+@app.post('/api/predict/batch', name="predict_emotion_batch")
+async def predict_emotion_batch(request: Request):
+    """
+    API endpoint to predict emotions for a list of texts in one request
+    Expects a JSON body of the form {"texts": [...], "top_n": 5}
+    """
+    deadline = request_deadline(request)
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or not isinstance(data.get('texts'), list):
+        return error_response("Please provide a 'texts' list in JSON body", 400)
+    if len(data['texts']) > BATCH_MAX_TEXTS:
+        return error_response(f"Too many texts. Max {BATCH_MAX_TEXTS} texts allowed per request", 400)
+    try:
+        batch_request = BatchEmotionRequest(**data)
+    except ValidationError as e:
+        return error_response(validation_message(e), 400)
+
+    cleaned_texts = []
+    for index, text in enumerate(batch_request.texts):
+        text = text.strip()
+        if len(text) > 512:
+            return error_response(f"Text at index {index} too long. Max 512 characters allowed", 400)
+        cleaned_texts.append(text)
+        REQUEST_TEXT_CHARS.observe(len(text))
+
+    logger.info(f"Processing batch of {len(cleaned_texts)} texts")
+
+    try:
+        # Bulk lane, so interactive /predict requests run between its chunks
+        results = await run_admitted_inference(partial(predict_bulk, deadline=deadline), cleaned_texts,
+                                               top_n=batch_request.top_n, deadline=deadline)
+    except AdmissionError:
+        raise
+    except Exception as e:
+        error_msg = f"Prediction error: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return error_response(error_msg, 500)
+
+    # Store all predictions with one bulk insert if connected
+    prediction_ids = []
+    if DB_CONNECTED:
+        try:
+            prediction_ids = await save_predictions(cleaned_texts, results, get_request_info(request))
+        except Exception as e:
+            logger.error(f"Error saving batch predictions: {str(e)}")
+
+    return BatchEmotionResponse(
+        results=[EmotionResponse(emotions=emotions) for emotions in results],
+        ids=prediction_ids,
+        count=len(results)
+    ).dict()
+
+@app.post('/api/predict/long', name="predict_emotion_long")
+async def predict_emotion_long(request: Request):
+    """
+    API endpoint to analyze long documents (emails, transcripts)
+    Expects {"text": "...", "aggregation": "max" | "mean"}
+    """
+    deadline = request_deadline(request)
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or not isinstance(data.get('text'), str):
+        return error_response("Please provide 'text' field in JSON body", 400)
+
+    text = data['text'].strip()
+    if not text:
+        return error_response("Input text cannot be empty", 400)
+    if len(text) > LONG_TEXT_MAX_CHARS:
+        return error_response(f"Input text too long. Max {LONG_TEXT_MAX_CHARS} characters allowed", 400)
+
+    aggregation = data.get('aggregation', 'max')
+    REQUEST_TEXT_CHARS.observe(len(text))
+
+    try:
+        result = await run_admitted_inference(predict_emotions_long, text, aggregation=aggregation, deadline=deadline)
+    except AdmissionError:
+        raise
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        error_msg = f"Prediction error: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return error_response(error_msg, 500)
+
+    logger.info(f"Long text analyzed: {result['tokens']} tokens in {result['windows']} windows")
+    await store_prediction(request, text, result["emotions"])
+
+    return {
+        "emotions": result["emotions"],
+        "windows": result["windows"],
+        "tokens": result["tokens"],
+        "aggregation": aggregation
+    }
+
+@app.post('/api/predict/stream', name="predict_emotion_stream")
+async def predict_emotion_stream(request: Request):
+    """
+    Streaming bulk analysis endpoint
+    Reads newline-delimited JSON texts from the request body incrementally
+    and streams one NDJSON result per input line as each batch finishes;
+    each batch takes an admission slot, and a refused batch gets per-line errors
+    """
+    request_deadline(request)
+    try:
+        batch_size = max(1, min(int(request.query_params.get('batch_size', STREAM_BATCH_SIZE)), 256))
+    except ValueError:
+        return error_response("'batch_size' must be an integer", 400)
+    include_text = request.query_params.get('include_text', 'false').lower() == 'true'
+
+    async def run_batch(batch):
+        try:
+            return await run_admitted_inference(predict_batch_records, batch, predict_bulk)
+        except AdmissionError as e:
+            for record in batch:
+                if "text" in record:
+                    record["error"] = str(e)
+            return batch
+
+    logger.info(f"Starting streaming analysis (batch_size={batch_size})")
+    return StreamingResponse(
+        astream_ndjson_predictions(request.stream(), run_batch, batch_size, include_text),
+        media_type='application/x-ndjson'
+    )
+
+# Background batch jobs
+
+def job_response(request: Request, job):
+    """Job status plus the URLs to poll and fetch results"""
+    return dict(job,
+                status_url=str(request.url_for('get_batch_job', job_id=job["id"])),
+                results_url=str(request.url_for('get_batch_job_results', job_id=job["id"])),
+                events_url=str(request.url_for('batch_job_events', job_id=job["id"])))
+
+async def spool_body(request: Request):
+    """Copy the request body to a temporary file so it can be parsed off the loop"""
+    body = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    async for chunk in request.stream():
+        body.write(chunk)
+    body.seek(0)
+    return body
+
+@app.post('/api/jobs', name="create_batch_job")
+async def create_batch_job(request: Request):
+    """
+    Submit texts for background scoring and return a job ID right away
+    Accepts {"texts": [...], "top_n": 5} with strings or {"id", "text"}
+    objects, an NDJSON request body, or an NDJSON file uploaded as 'file'
+    """
+    request_deadline(request)
+    if not ENABLE_BATCH_JOBS:
+        return error_response("Batch jobs are disabled", 404)
+
+    content_type = request.headers.get("content-type", "")
+    body = None
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get('file')
+            if upload is None or isinstance(upload, str):
+                return error_response("Please upload an NDJSON file as 'file'", 400)
+            records = iter_ndjson_records(upload.file)
+            top_n = int(form.get('top_n', TOP_N))
+        elif is_json(request):
+            try:
+                data = await request.json()
+            except ValueError:
+                data = None
+            if not isinstance(data, dict) or not isinstance(data.get('texts'), list):
+                return error_response("Please provide a 'texts' list in JSON body", 400)
+            records = (make_record(value, index) for index, value in enumerate(data['texts']))
+            top_n = int(data.get('top_n', TOP_N))
+        else:
+            top_n = int(request.query_params.get('top_n', TOP_N))
+            body = await spool_body(request)
+            records = iter_ndjson_records(body)
+    except (TypeError, ValueError):
+        return error_response("'top_n' must be an integer", 400)
+
+    try:
+        job = await run_in_threadpool(submit_job, records, top_n)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        logger.error(f"Error creating batch job: {str(e)}")
+        return error_response(f"Job store error: {str(e)}", 500)
+    finally:
+        if body is not None:
+            body.close()
+
+    return JSONResponse(job_response(request, job), status_code=202)
+
+@app.get('/api/jobs/{job_id}', name="get_batch_job")
+async def get_batch_job(request: Request, job_id: str):
+    """API endpoint to poll a batch job's status and progress"""
+    job = await run_in_threadpool(get_job_runner().store.get_job, job_id) if ENABLE_BATCH_JOBS else None
+    if not job:
+        return error_response(f"Job {job_id} not found", 404)
+    return job_response(request, job)
+
+@app.get('/api/jobs/{job_id}/results', name="get_batch_job_results")
+async def get_batch_job_results(request: Request, job_id: str):
+    """
+    API endpoint to fetch a batch job's finished results page by page
+    Pass the returned 'next_cursor' as 'cursor' to fetch the following page;
+    results can be read while the job is still running
+    """
+    job = await run_in_threadpool(get_job_runner().store.get_job, job_id) if ENABLE_BATCH_JOBS else None
+    if not job:
+        return error_response(f"Job {job_id} not found", 404)
+    try:
+        cursor = int(request.query_params.get('cursor', -1))
+        limit = max(1, min(int(request.query_params.get('limit', BATCH_JOB_RESULTS_PAGE_SIZE)), 5000))
+    except ValueError:
+        return error_response("'cursor' and 'limit' must be integers", 400)
+
+    results, next_cursor = await run_in_threadpool(get_job_runner().store.get_results, job_id, cursor, limit)
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "results": results,
+        "next_cursor": next_cursor
+    }
+
+@app.get('/api/jobs/{job_id}/events', name="batch_job_events")
+async def batch_job_events(job_id: str):
+    """Stream the job's status as NDJSON, one line per change, until it finishes"""
+    store = get_job_runner().store if ENABLE_BATCH_JOBS else None
+    if not store or not await run_in_threadpool(store.get_job, job_id):
+        return error_response(f"Job {job_id} not found", 404)
+
+    async def generate():
+        last = None
+        while True:
+            job = await run_in_threadpool(store.get_job, job_id)
+            if job is None:
+                yield json.dumps({"id": job_id, "status": "deleted"}) + "\n"
+                return
+            state = (job["status"], job["processed"])
+            if state != last:
+                last = state
+                yield json.dumps(job) + "\n"
+            if job["status"] in (JOB_COMPLETED, JOB_FAILED):
+                return
+            await asyncio.sleep(1.0)
+
+    return StreamingResponse(generate(), media_type='application/x-ndjson')
+
+@app.delete('/api/jobs/{job_id}', name="delete_batch_job")
+async def delete_batch_job(job_id: str):
+    """API endpoint to cancel a batch job and delete its results"""
+    if not ENABLE_BATCH_JOBS or not await run_in_threadpool(get_job_runner().store.delete_job, job_id):
+        return error_response(f"Job {job_id} not found", 404)
+    return {"message": f"Job {job_id} deleted successfully"}
+
+@app.get('/api/predictions', name="list_predictions")
+async def list_predictions(request: Request):
+    """
+    API endpoint to get list of predictions with pagination
+    Pass the returned 'next_cursor' as 'cursor' to fetch the following page;
+    the legacy 'page' parameter is still accepted but skips documents, and
+    its 'next_cursor' continues from that page with keyset paging
+    """
+    cursor = request.query_params.get('cursor')
+    try:
+        page = int(request.query_params.get('page', 1))
+        limit = min(int(request.query_params.get('limit', 10)), 100)
+    except ValueError:
+        return error_response("'page' and 'limit' must be integers", 400)
+    if limit < 1:
+        return error_response("'limit' must be at least 1", 400)
+
+    if not DB_CONNECTED:
+        return error_response("Database not connected", 503)
+
+    try:
+        skip = 0 if cursor else max(page - 1, 0) * limit
+        predictions, next_cursor = await get_predictions_page(limit=limit, cursor=cursor, skip=skip)
+        total = await count_predictions()
+
+        return jsonable_encoder(PredictionList(
+            predictions=[format_prediction(p) for p in predictions],
+            total=total,
+            page=page,
+            limit=limit,
+            next_cursor=next_cursor
+        ))
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        logger.error(f"Error retrieving predictions: {str(e)}")
+        return error_response(f"Database error: {str(e)}", 500)
+
+@app.get('/api/predictions/{prediction_id}', name="get_prediction")
+async def get_prediction(prediction_id: str):
+    """API endpoint to get a specific prediction by ID"""
+    if not DB_CONNECTED:
+        return error_response("Database not connected", 503)
+
+    try:
+        prediction = await get_prediction_by_id(prediction_id)
+        if not prediction:
+            return error_response(f"Prediction with ID {prediction_id} not found", 404)
+        return jsonable_encoder(format_prediction(prediction))
+    except Exception as e:
+        logger.error(f"Error retrieving prediction {prediction_id}: {str(e)}")
+        return error_response(f"Database error: {str(e)}", 500)
+
+@app.delete('/api/predictions/{prediction_id}', name="remove_prediction")
+async def remove_prediction(prediction_id: str):
+    """API endpoint to delete a prediction by ID"""
+    if not DB_CONNECTED:
+        return error_response("Database not connected", 503)
+
+    try:
+        success = await delete_prediction(prediction_id)
+        if not success:
+            return error_response(f"Prediction with ID {prediction_id} not found", 404)
+        return {"message": f"Prediction {prediction_id} deleted successfully"}
+    except Exception as e:
+        logger.error(f"Error deleting prediction {prediction_id}: {str(e)}")
+        return error_response(f"Database error: {str(e)}", 500)
+
+@app.get('/api/stats', name="get_statistics")
+async def get_statistics():
+    """API endpoint to get statistics about predictions"""
+    if not DB_CONNECTED:
+        return error_response("Database not connected", 503)
+
+    try:
+        return jsonable_encoder(await get_stats())
+    except Exception as e:
+        logger.error(f"Error retrieving stats: {str(e)}")
+        return error_response(f"Database error: {str(e)}", 500)
+
+@app.get('/dashboard', response_class=HTMLResponse, name="dashboard")
+async def dashboard(request: Request):
+    """Dashboard page to view predictions and statistics"""
+    predictions, stats = [], {}
+    if DB_CONNECTED:
+        try:
+            predictions = await get_predictions(limit=20)
+            stats = await get_stats()
+        except Exception as e:
+            logger.error(f"Error loading dashboard: {str(e)}")
+    return templates.TemplateResponse('dashboard.html', {
+        "request": request,
+        "predictions": predictions,
+        "stats": stats
+    })
+
+@app.get('/metrics', name="metrics")
+async def metrics():
+    """Prometheus metrics in the text exposition format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Admin endpoints for profiling, enabled by setting PROFILE_ADMIN_TOKEN
+def admin_error(request: Request):
+    """Return an error response unless the request carries the admin token"""
+    if not PROFILE_ADMIN_TOKEN:
+        return error_response("Endpoint not found", 404)
+    if not is_admin_token(request.headers.get(ADMIN_TOKEN_HEADER)):
+        return error_response("Unauthorized", 401)
+    return None
+
+@app.get('/admin/profiles', name="admin_list_profiles")
+async def admin_list_profiles(request: Request):
+    """List stored profile runs, newest first"""
+    return admin_error(request) or {"profiles": list_profiles()}
+
+@app.get('/admin/profiles/{profile_id}/{filename}', name="admin_download_profile")
+async def admin_download_profile(request: Request, profile_id: str, filename: str):
+    """Download one file of a stored profile run"""
+    denied = admin_error(request)
+    if denied:
+        return denied
+    path = get_profile_file(profile_id, filename)
+    if path is None:
+        return error_response("Profile file not found", 404)
+    return FileResponse(path, filename=f"{profile_id}-{filename}")
+
+@app.post('/admin/memory/snapshot', name="admin_memory_snapshot")
+async def admin_memory_snapshot(request: Request):
+    """Take a tracemalloc snapshot and diff it against the previous one (first call starts tracing)"""
+    denied = admin_error(request)
+    if denied:
+        return denied
+    try:
+        limit = min(int(request.query_params.get('limit', 25)), 200)
+    except ValueError:
+        return error_response("'limit' must be an integer", 400)
+    try:
+        # Snapshots walk every traced block; keep that off the event loop
+        return await run_inference(memory_snapshot, limit=limit, group_by=request.query_params.get('group_by', 'lineno'))
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+@app.delete('/admin/memory/snapshot', name="admin_stop_memory_tracing")
+async def admin_stop_memory_tracing(request: Request):
+    """Stop tracemalloc, which slows every allocation while it runs"""
+    denied = admin_error(request)
+    if denied:
+        return denied
+    stop_memory_tracing()
+    return {"tracing": False}
+
+@app.get('/health', name="health_check")
+async def health_check():
+    """Health check endpoint"""
+    health = {
+        "status": "healthy",
+        "model_status": "ready" if is_model_ready() else ("loaded" if is_model_loaded() else "not_loaded"),
+        "database": "connected" if DB_CONNECTED else "disconnected"
+    }
+    if ENABLE_MICRO_BATCHING:
+        health["scheduler"] = get_scheduler().stats()
+    if ENABLE_PREDICTION_CACHE:
+        health["cache"] = get_prediction_cache().stats()
+    health["token_cache"] = get_token_cache_stats()
+    if ENABLE_ADMISSION_CONTROL:
+        health["admission"] = get_admission_controller().stats()
+    if current_job_runner() is not None:
+        health["jobs"] = current_job_runner().stats()
+    if DB_CONNECTED and WRITE_BUFFER_ENABLED:
+        health["write_buffer"] = write_buffer.stats()
+    return health
+
+@app.get('/health/live', name="liveness_check")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get('/health/ready', name="readiness_check")
+async def readiness_check():
+    """Readiness probe: passes only once the model is loaded and warmed up"""
+    # Starts loading on the first probe when eager loading is disabled,
+    # and retries a failed load once its backoff has passed
+    start_model_loading()
+    if is_model_ready():
+        return {"status": "ready"}
+
+    response = {"status": "loading" if is_model_loaded() else "not_ready"}
+    load_error = get_model_load_error()
+    if load_error:
+        response["status"] = "failed"
+        response["error"] = load_error
+    return JSONResponse(response, status_code=503)
+
+@app.get('/api/model-test', name="test_model")
+async def test_model():
+    """Endpoint to test if the model is working"""
+    try:
+        test_result = await run_inference(analyze_text, "Test message")
+        return {
+            "status": "model working",
+            "results": test_result
+        }
+    except Exception as e:
+        logger.error(f"Model test failed: {str(e)}")
+        return error_response(f"Model test failed: {str(e)}", 503)
+
+@app.get('/favicon.ico', name="favicon")
+async def favicon():
+    """Handle favicon requests"""
+    return Response(status_code=204)
+
+# Error handlers
+@app.exception_handler(StarletteHTTPException)
+async def http_error(request: Request, exc: StarletteHTTPException):
+    if exc.status_code == 404:
+        if is_json(request):
+            return error_response("Endpoint not found", 404)
+        return HTMLResponse("<h1>404 - Page Not Found</h1><p>The requested page could not be found.</p>", status_code=404)
+    return error_response(str(exc.detail), exc.status_code)
+
+@app.exception_handler(AdmissionError)
+async def admission_error(request: Request, exc: AdmissionError):
+    """Shed load with a fast 429/503 and a Retry-After hint"""
+    return JSONResponse({"error": str(exc), "reason": exc.reason}, status_code=exc.status_code,
+                        headers={"Retry-After": exc.retry_after_header})
+
+@app.exception_handler(Exception)
+async def internal_error(request: Request, exc: Exception):
+    logger.error(f"Unhandled error: {str(exc)}", exc_info=exc)
+    if is_json(request):
+        return error_response("Internal server error", 500)
+    return HTMLResponse("<h1>500 - Internal Server Error</h1><p>Something went wrong on our end.</p>", status_code=500)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,27 @@
+"""
+One-shot backfill of the incrementally maintained prediction statistics.
+Rebuilds the prediction_stats collection from the full predictions history.
+Run this once after deploying counters, or whenever they drift.
+"""
+import asyncio
+import logging
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.database import connect_to_mongodb, close_mongodb_connection, rebuild_stats
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("backfill_stats")
+
+async def backfill():
+    await connect_to_mongodb()
+    try:
+        total = await rebuild_stats()
+        logger.info(f"Backfill complete: {total} predictions counted")
+    finally:
+        await close_mongodb_connection()
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
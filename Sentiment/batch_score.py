@@ -0,0 +1,274 @@
+"""
+Offline batch scorer for the Emotion Analyzer model.
+Reads CSV, JSONL or Parquet input in chunks, scores the chunks across a pool
+of worker processes (each loading the model once) and writes one JSONL or
+Parquet part file per chunk. A checkpoint file records finished chunks, so
+re-running the same command after a crash resumes where it stopped.
+
+Usage:
+    python batch_score.py messages.csv out_dir --text-column body --id-column message_id
+    python batch_score.py messages.parquet out_dir --format parquet --workers 4
+    python batch_score.py messages.jsonl out_dir --merge scored.jsonl
+"""
+import os
+import csv
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from collections import deque
+from dotenv import load_dotenv
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("batch_score")
+
+CHECKPOINT_FILE = "_checkpoint.json"
+
+
+# Input readers: each yields lists of (row, id, text, error) tuples, where
+# error is None unless the row itself could not be read
+
+def read_csv_chunks(path, chunk_size, text_column, id_column):
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        if text_column not in (reader.fieldnames or []):
+            raise ValueError(f"Column '{text_column}' not found in {path}")
+        chunk = []
+        for row, record in enumerate(reader):
+            chunk.append((row, record.get(id_column) if id_column else None, record.get(text_column) or "", None))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def read_jsonl_chunks(path, chunk_size, text_column, id_column):
+    with open(path, encoding="utf-8") as f:
+        chunk = []
+        row = 0
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            # A bad line becomes an error record instead of ending the run
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                chunk.append((row, None, None, f"Invalid JSON at column {e.colno}: {e.msg}"))
+            else:
+                if isinstance(record, str):
+                    chunk.append((row, None, record, None))
+                elif isinstance(record, dict):
+                    chunk.append((row, record.get(id_column) if id_column else None, record.get(text_column) or "", None))
+                else:
+                    chunk.append((row, None, None, f"Expected a JSON object or string, got {type(record).__name__}"))
+            row += 1
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def read_parquet_chunks(path, chunk_size, text_column, id_column):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet input requires the pyarrow package")
+    columns = [text_column] + ([id_column] if id_column else [])
+    row = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+        data = batch.to_pydict()
+        texts = data[text_column]
+        ids = data[id_column] if id_column else [None] * len(texts)
+        yield [(row + i, ids[i], texts[i] or "", None) for i in range(len(texts))]
+        row += len(texts)
+
+READERS = {
+    ".csv": read_csv_chunks,
+    ".jsonl": read_jsonl_chunks,
+    ".ndjson": read_jsonl_chunks,
+    ".parquet": read_parquet_chunks,
+}
+
+
+# Checkpointing
+
+def load_checkpoint(out_dir, settings):
+    """Return the set of finished chunk ids, refusing to mix different runs"""
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("settings") != settings:
+        raise SystemExit(f"{path} was written with different settings {checkpoint.get('settings')}; "
+                         f"use a new output directory or delete the checkpoint")
+    return set(checkpoint.get("completed", []))
+
+def save_checkpoint(out_dir, settings, completed):
+    """Atomically record the finished chunk ids"""
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"settings": settings, "completed": sorted(completed)}, f)
+    os.replace(tmp_path, path)
+
+
+# Worker side
+
+def init_worker(torch_threads):
+    """Load the model once per worker process"""
+    import torch
+    from app.predict import get_model_and_tokenizer
+    torch.set_num_threads(torch_threads)
+    get_model_and_tokenizer()
+    logger.info(f"Worker {os.getpid()} ready with {torch_threads} torch threads")
+
+def part_path(out_dir, chunk_id, fmt):
+    return os.path.join(out_dir, f"part-{chunk_id:06d}.{fmt}")
+
+def score_chunk(chunk_id, rows, out_dir, fmt, top_n):
+    """Score one chunk and write its part file atomically"""
+    from app.predict import predict_emotions_batch
+
+    valid = [(row, text.strip()) for row, _, text, error in rows
+             if error is None and isinstance(text, str) and text.strip()]
+    emotions_list = predict_emotions_batch([text for _, text in valid], top_n=top_n)
+    scored = {row: emotions for (row, _), emotions in zip(valid, emotions_list)}
+
+    records = []
+    for row, row_id, _, error in rows:
+        record = {"row": row, "id": row_id}
+        if row in scored:
+            record["emotions"] = scored[row]
+        else:
+            record["error"] = error or "Input text cannot be empty"
+        records.append(record)
+
+    path = part_path(out_dir, chunk_id, fmt)
+    tmp_path = f"{path}.tmp"
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.table({
+            "row": [r["row"] for r in records],
+            "id": [None if r["id"] is None else str(r["id"]) for r in records],
+            "emotions": [list(r["emotions"].items()) if "emotions" in r else None for r in records],
+            "error": [r.get("error") for r in records],
+        }, schema=pa.schema([
+            ("row", pa.int64()),
+            ("id", pa.string()),
+            ("emotions", pa.map_(pa.string(), pa.float64())),
+            ("error", pa.string()),
+        ]))
+        pq.write_table(table, tmp_path)
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    os.replace(tmp_path, path)
+    return chunk_id, len(rows)
+
+
+# Driver
+
+def merge_parts(out_dir, fmt, merged_path):
+    """Concatenate part files in chunk order into a single output file"""
+    parts = sorted(name for name in os.listdir(out_dir) if name.startswith("part-") and name.endswith(f".{fmt}"))
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = None
+        for name in parts:
+            table = pq.read_table(os.path.join(out_dir, name))
+            if writer is None:
+                writer = pq.ParquetWriter(merged_path, table.schema)
+            writer.write_table(table)
+        if writer:
+            writer.close()
+    else:
+        with open(merged_path, "w", encoding="utf-8") as out:
+            for name in parts:
+                with open(os.path.join(out_dir, name), encoding="utf-8") as f:
+                    for line in f:
+                        out.write(line)
+    logger.info(f"Merged {len(parts)} parts into {merged_path}")
+
+def run(args):
+    extension = os.path.splitext(args.input)[1].lower()
+    reader = READERS.get(extension)
+    if reader is None:
+        raise SystemExit(f"Unsupported input type '{extension}', expected one of {sorted(READERS)}")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    settings = {
+        "input": os.path.abspath(args.input),
+        "chunk_size": args.chunk_size,
+        "text_column": args.text_column,
+        "id_column": args.id_column,
+        "format": args.format,
+        "top_n": args.top_n,
+    }
+    completed = load_checkpoint(args.output_dir, settings)
+    if completed:
+        logger.info(f"Resuming: {len(completed)} chunks already done")
+
+    workers = max(1, args.workers)
+    torch_threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    # Bound the chunks held in memory to a couple per worker
+    max_inflight = workers * 2
+
+    started = time.perf_counter()
+    rows_done = 0
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=workers, initializer=init_worker, initargs=(torch_threads,)) as pool:
+        inflight = deque()
+
+        def collect_oldest():
+            nonlocal rows_done
+            chunk_id, count = inflight.popleft().get()
+            completed.add(chunk_id)
+            save_checkpoint(args.output_dir, settings, completed)
+            rows_done += count
+            elapsed = time.perf_counter() - started
+            logger.info(f"Chunk {chunk_id} done; {rows_done} rows this run ({rows_done / elapsed:.1f} rows/s)")
+
+        for chunk_id, rows in enumerate(reader(args.input, args.chunk_size, args.text_column, args.id_column)):
+            if chunk_id in completed:
+                continue
+            if len(inflight) >= max_inflight:
+                collect_oldest()
+            inflight.append(pool.apply_async(score_chunk, (chunk_id, rows, args.output_dir, args.format, args.top_n)))
+
+        while inflight:
+            collect_oldest()
+
+    logger.info(f"Scored {rows_done} rows in {time.perf_counter() - started:.1f}s; "
+                f"{len(completed)} chunks complete in {args.output_dir}")
+    if args.merge:
+        merge_parts(args.output_dir, args.format, args.merge)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Input file (.csv, .jsonl/.ndjson or .parquet)")
+    parser.add_argument("output_dir", help="Directory for part files and the checkpoint")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl", help="Output format")
+    parser.add_argument("--text-column", default="text", help="Column or field holding the text")
+    parser.add_argument("--id-column", default=None, help="Optional column or field carried through as the id")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="Rows per chunk and checkpoint unit")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--threads-per-worker", type=int, default=0,
+                        help="Torch threads per worker (default: CPU count / workers)")
+    parser.add_argument("--top-n", type=int, default=5, help="Top emotions kept per text")
+    parser.add_argument("--merge", default=None, help="Also concatenate all parts into this file when done")
+    args = parser.parse_args()
+
+    try:
+        run(args)
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; re-run the same command to resume")
+        sys.exit(130)
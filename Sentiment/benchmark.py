@@ -0,0 +1,272 @@
+"""
+Inference micro-benchmarks for the predict module.
+Times tokenization, forward pass and post-processing separately across batch
+sizes, sequence lengths, thread counts and model load paths, and reports
+p50/p95/p99 latency, texts per second and RSS for each configuration (the
+peak RSS is reset before each one on Linux, so it is that configuration's own).
+
+Runs fully offline: "--model random" builds a randomly initialized model of
+the same architecture with a synthetic vocabulary, "--model local" loads the
+saved model from app/model.
+
+Usage:
+    python benchmark.py --output results.json
+    python benchmark.py --baseline baseline.json --tolerance 0.15
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+import torch
+from transformers import BertConfig, BertTokenizerFast, BertForSequenceClassification
+from app.predict import EMOTION_LABELS, TOP_N, MAX_SEQ_LENGTH, pad_to_bucket, top_emotions_from_probs
+
+SYNTHETIC_WORDS = [
+    "happy", "sad", "angry", "love", "hate", "great", "terrible", "today", "work", "friend",
+    "family", "news", "really", "very", "feel", "think", "never", "always", "again", "thanks",
+    "worried", "excited", "tired", "bored", "proud", "sorry", "hope", "fear", "joy", "trust",
+]
+
+
+# Model construction
+
+def build_random_model():
+    """Randomly initialized BertForSequenceClassification with a synthetic vocab"""
+    vocab_dir = tempfile.mkdtemp(prefix="bench-vocab-")
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + SYNTHETIC_WORDS
+    vocab_path = os.path.join(vocab_dir, "vocab.txt")
+    with open(vocab_path, "w") as f:
+        f.write("\n".join(vocab) + "\n")
+    tokenizer = BertTokenizerFast(vocab_file=vocab_path)
+
+    # bert-base dimensions; only the vocabulary is shrunk
+    config = BertConfig(
+        vocab_size=len(vocab),
+        problem_type="multi_label_classification",
+        num_labels=len(EMOTION_LABELS)
+    )
+    torch.manual_seed(0)
+    model = BertForSequenceClassification(config)
+    return model.eval(), tokenizer
+
+def build_model(source, backend, precision):
+    """Return (model, tokenizer, load_seconds) for one load path"""
+    started = time.perf_counter()
+    if source == "local":
+        import app.predict as predict
+        predict.USE_LOCAL_MODEL = True
+        predict.INFERENCE_BACKEND = backend
+        model, tokenizer = predict.load_model(precision=precision)
+        return model, tokenizer, time.perf_counter() - started
+
+    torch_model, tokenizer = build_random_model()
+    if backend == "onnx":
+        import app.onnx_backend as onnx_backend
+        # Export into a scratch directory so runs never reuse a stale file
+        onnx_backend.ONNX_MODEL_DIR = tempfile.mkdtemp(prefix="bench-onnx-")
+        model = onnx_backend.load_onnx_model(lambda: torch_model, tokenizer, "random", precision)
+    elif precision == "int8":
+        model = torch.quantization.quantize_dynamic(torch_model, {torch.nn.Linear}, dtype=torch.qint8)
+    else:
+        model = torch_model
+    return model, tokenizer, time.perf_counter() - started
+
+
+# Measurement
+
+def make_texts(count, tokens, seed=0):
+    """Texts of roughly the given token length"""
+    rng = random.Random(seed)
+    # Leave room for [CLS] and [SEP]
+    words = max(1, tokens - 2)
+    return [" ".join(rng.choice(SYNTHETIC_WORDS) for _ in range(words)) for _ in range(count)]
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+    except (OSError, ValueError):
+        return None
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS mark so the next reading covers one configuration"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    """Peak RSS since the last reset_peak_rss(), from VmHWM in /proc/self/status"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError):
+        pass
+    return None
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+def bench_config(model, tokenizer, batch_size, seq_length, iterations, warmup):
+    """Time each stage of the predict path for one configuration"""
+    texts = make_texts(batch_size, seq_length)
+    stages = {"tokenize": [], "forward": [], "postprocess": [], "total": []}
+    # ru_maxrss never goes down, so measure this configuration on its own
+    peak_reset = reset_peak_rss()
+    rss_before = current_rss_mb()
+
+    for i in range(warmup + iterations):
+        t0 = time.perf_counter()
+        encodings = tokenizer(texts, truncation=True, max_length=MAX_SEQ_LENGTH)
+        inputs = pad_to_bucket(tokenizer, dict(encodings))
+        t1 = time.perf_counter()
+        with torch.no_grad():
+            logits = model(**inputs).logits
+        t2 = time.perf_counter()
+        top_emotions_from_probs(torch.sigmoid(logits), TOP_N)
+        t3 = time.perf_counter()
+
+        if i >= warmup:
+            stages["tokenize"].append(t1 - t0)
+            stages["forward"].append(t2 - t1)
+            stages["postprocess"].append(t3 - t2)
+            stages["total"].append(t3 - t0)
+
+    total_seconds = sum(stages["total"])
+    rss_after = current_rss_mb()
+    return {
+        "stages": {name: percentiles(samples) for name, samples in stages.items()},
+        "texts_per_second": round(batch_size * iterations / total_seconds, 2) if total_seconds else None,
+        "padded_length": int(inputs["input_ids"].shape[1]),
+        "rss_mb": rss_after,
+        "rss_delta_mb": round(rss_after - rss_before, 1) if rss_after is not None and rss_before is not None else None,
+        "peak_rss_mb": peak_rss_mb() if peak_reset else None,
+    }
+
+def config_key(result):
+    return f"{result['backend']}/{result['precision']}/b{result['batch_size']}/s{result['seq_length']}/t{result['threads']}"
+
+
+# Baseline comparison
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return regressions where p50 total latency grew beyond the tolerance"""
+    baseline_by_key = {config_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        key = config_key(result)
+        previous = baseline_by_key.get(key)
+        if previous is None:
+            continue
+        old = previous["stages"]["total"]["p50_ms"]
+        new = result["stages"]["total"]["p50_ms"]
+        change = (new - old) / old if old else 0.0
+        status = "REGRESSION" if change > tolerance else "ok"
+        print(f"  {key:<32} p50 {old:>9.3f} -> {new:>9.3f} ms ({change:+.1%}) {status}")
+        if change > tolerance:
+            regressions.append({"config": key, "baseline_p50_ms": old, "p50_ms": new, "change": round(change, 4)})
+    return regressions
+
+
+def parse_list(value, cast=int):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+def run(args):
+    thread_counts = parse_list(args.threads) if args.threads else sorted({1, os.cpu_count() or 1})
+    results = []
+    load_times = {}
+
+    for load_path in parse_list(args.load_paths, str):
+        backend, _, precision = load_path.partition(":")
+        precision = precision or "fp32"
+        try:
+            model, tokenizer, load_seconds = build_model(args.model, backend, precision)
+        except Exception as e:
+            print(f"Skipping {load_path}: {str(e)}")
+            continue
+        load_times[load_path] = round(load_seconds, 3)
+        print(f"\n{load_path}: loaded in {load_seconds:.2f}s")
+
+        for threads in thread_counts:
+            torch.set_num_threads(threads)
+            for seq_length in parse_list(args.seq_lengths):
+                for batch_size in parse_list(args.batch_sizes):
+                    result = {
+                        "backend": backend,
+                        "precision": precision,
+                        "batch_size": batch_size,
+                        "seq_length": seq_length,
+                        "threads": threads,
+                    }
+                    result.update(bench_config(model, tokenizer, batch_size, seq_length, args.iterations, args.warmup))
+                    results.append(result)
+                    total = result["stages"]["total"]
+                    print(f"  {config_key(result):<32} p50 {total['p50_ms']:>9.3f} ms  "
+                          f"p99 {total['p99_ms']:>9.3f} ms  {result['texts_per_second']:>9.1f} texts/s")
+        del model
+
+    report = {
+        "meta": {
+            "model": args.model,
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "iterations": args.iterations,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "load_seconds": load_times,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nComparing to {args.baseline} (tolerance {args.tolerance:.0%}):")
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} configuration(s) regressed")
+            return 1
+        print("\nNo regressions")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["random", "local"], default="random",
+                        help="Randomly initialized model (offline) or the saved model in app/model")
+    parser.add_argument("--load-paths", default="torch:fp32,torch:int8",
+                        help="Comma-separated backend:precision pairs, e.g. torch:fp32,torch:int8,onnx:fp32")
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    parser.add_argument("--seq-lengths", default="16,64,128")
+    parser.add_argument("--threads", default=None, help="Comma-separated torch thread counts (default: 1 and all cores)")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--output", default=None, help="Write machine-readable results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Compare against a previous results file")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Allowed p50 slowdown before a configuration counts as a regression")
+    args = parser.parse_args()
+    sys.exit(run(args))
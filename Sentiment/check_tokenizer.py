@@ -0,0 +1,63 @@
+"""
+Check that the fast (Rust) tokenizer produces the same ids as the slow
+Python WordPiece tokenizer for our vocabulary.
+Exits with a non-zero status if any input encodes differently.
+"""
+import sys
+from transformers import BertTokenizer, BertTokenizerFast
+from app.predict import LOCAL_MODEL_DIR, MODEL_HF_PATH, MODEL_REVISION, USE_LOCAL_MODEL, MAX_SEQ_LENGTH
+
+SAMPLES = [
+    "I am really happy and excited about this new project!",
+    "I'm feeling sad and disappointed after receiving the news.",
+    "The loud noise scared me, but I'm feeling better now.",
+    "Test message",
+    "Ugh... why does this ALWAYS happen to me?!?! 😡",
+    "Café crème, naïve résumé — déjà vu.",
+    "   leading and trailing whitespace   ",
+    "Thanks!!! <3 :) #blessed @friend https://example.com/path?q=1",
+]
+
+def load_tokenizers():
+    if USE_LOCAL_MODEL:
+        source, kwargs = LOCAL_MODEL_DIR, {}
+    else:
+        source, kwargs = MODEL_HF_PATH, {"revision": MODEL_REVISION}
+    try:
+        slow = BertTokenizer.from_pretrained(source, **kwargs)
+        fast = BertTokenizerFast.from_pretrained(source, **kwargs)
+    except Exception as e:
+        print(f"Could not load tokenizer from {source} ({str(e)}), using bert-base-uncased")
+        slow = BertTokenizer.from_pretrained("bert-base-uncased")
+        fast = BertTokenizerFast.from_pretrained("bert-base-uncased")
+    return slow, fast
+
+def vocab_samples(tokenizer, words_per_sample=32):
+    """Join every whole-word vocabulary entry into short texts"""
+    words = [token for token in tokenizer.get_vocab() if not token.startswith("##") and not token.startswith("[")]
+    return [" ".join(words[i:i + words_per_sample]) for i in range(0, len(words), words_per_sample)]
+
+def check_tokenizers():
+    slow, fast = load_tokenizers()
+    texts = SAMPLES + vocab_samples(slow)
+    print(f"Comparing slow and fast tokenizers on {len(texts)} texts...")
+
+    mismatches = 0
+    for text in texts:
+        slow_ids = slow(text, truncation=True, max_length=MAX_SEQ_LENGTH)["input_ids"]
+        fast_ids = fast(text, truncation=True, max_length=MAX_SEQ_LENGTH)["input_ids"]
+        if slow_ids != fast_ids:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"\nMismatch for: {text[:80]}")
+                print(f"  slow: {slow_ids[:20]}")
+                print(f"  fast: {fast_ids[:20]}")
+
+    if mismatches:
+        print(f"\n{mismatches} of {len(texts)} texts encoded differently")
+        return False
+    print("All texts encoded identically")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if check_tokenizers() else 1)
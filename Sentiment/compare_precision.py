@@ -0,0 +1,98 @@
+"""
+Compare fp32 and dynamically quantized int8 models on a sample corpus.
+Reports the maximum probability delta per emotion label, top-5 agreement and
+timing, so the int8 speed/accuracy trade-off can be judged before enabling
+MODEL_PRECISION=int8.
+
+Usage:
+    python compare_precision.py [corpus.txt] [--json report.json]
+The corpus file holds one text per line; built-in samples are used otherwise.
+"""
+import sys
+import json
+import time
+import argparse
+import torch
+from app.predict import EMOTION_LABELS, TOP_N, load_model, predict_probabilities
+
+SAMPLES = [
+    "I am really happy and excited about this new project!",
+    "I'm feeling sad and disappointed after receiving the news.",
+    "The loud noise scared me, but I'm feeling better now.",
+    "Thank you so much for your help, I really appreciate it.",
+    "I can't believe they lied to me again, this is infuriating.",
+    "Not sure what to make of this, it's all very confusing.",
+    "I miss you every day and can't wait to see you again.",
+    "Ugh, another meeting that could have been an email.",
+    "We finally won the championship after all these years!",
+    "I'm worried the results won't come back in time.",
+    "That joke was hilarious, I couldn't stop laughing.",
+    "I feel so relieved that the surgery went well.",
+]
+
+def load_corpus(path):
+    if not path:
+        return SAMPLES
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def timed_probabilities(texts, model, tokenizer):
+    started = time.perf_counter()
+    probs = predict_probabilities(texts, model=model, tokenizer=tokenizer)
+    return probs, time.perf_counter() - started
+
+def compare_precision(texts):
+    print("Loading fp32 and int8 models...")
+    fp32_model, tokenizer = load_model(precision="fp32")
+    int8_model, _ = load_model(precision="int8")
+
+    # Warm both models once so timing excludes first-call overhead
+    predict_probabilities(texts[:1], model=fp32_model, tokenizer=tokenizer)
+    predict_probabilities(texts[:1], model=int8_model, tokenizer=tokenizer)
+
+    fp32_probs, fp32_seconds = timed_probabilities(texts, fp32_model, tokenizer)
+    int8_probs, int8_seconds = timed_probabilities(texts, int8_model, tokenizer)
+
+    deltas = (fp32_probs - int8_probs).abs().max(dim=0).values.tolist()
+    fp32_top = torch.topk(fp32_probs, k=TOP_N, dim=1).indices.tolist()
+    int8_top = torch.topk(int8_probs, k=TOP_N, dim=1).indices.tolist()
+    top_n_agreement = sum(set(a) == set(b) for a, b in zip(fp32_top, int8_top)) / len(texts)
+    top_1_agreement = sum(a[0] == b[0] for a, b in zip(fp32_top, int8_top)) / len(texts)
+
+    return {
+        "texts": len(texts),
+        "max_delta_per_label": {label: round(delta, 6) for label, delta in zip(EMOTION_LABELS, deltas)},
+        "max_delta": round(max(deltas), 6),
+        f"top_{TOP_N}_agreement": round(top_n_agreement, 4),
+        "top_1_agreement": round(top_1_agreement, 4),
+        "fp32_seconds": round(fp32_seconds, 4),
+        "int8_seconds": round(int8_seconds, 4),
+        "speedup": round(fp32_seconds / int8_seconds, 3) if int8_seconds else None,
+    }
+
+def print_report(report):
+    print(f"\nCompared {report['texts']} texts")
+    print("\nMax probability delta per label:")
+    for label, delta in sorted(report["max_delta_per_label"].items(), key=lambda x: x[1], reverse=True):
+        print(f"  {label:<15} {delta:.6f}")
+    print(f"\nTop-{TOP_N} set agreement: {report[f'top_{TOP_N}_agreement']:.2%}")
+    print(f"Top-1 agreement: {report['top_1_agreement']:.2%}")
+    print(f"fp32: {report['fp32_seconds']:.3f}s  int8: {report['int8_seconds']:.3f}s  speedup: {report['speedup']}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="?", help="Text file with one sample per line")
+    parser.add_argument("--json", dest="json_path", help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus)
+    if not texts:
+        print("Corpus is empty")
+        sys.exit(1)
+
+    report = compare_precision(texts)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote report to {args.json_path}")
@@ -0,0 +1,44 @@
+"""
+Fetch the pinned model revision into the local artifact store.
+Run this once at build or deploy time (it needs network access and HF_TOKEN
+for private repos); servers started with MODEL_OFFLINE=True then load the
+weights from disk only and fail fast if the artifact is missing.
+
+Usage:
+    python fetch_model.py
+    python fetch_model.py --revision v1.2 --force
+    python fetch_model.py --verify
+"""
+import sys
+import argparse
+from app.artifacts import ArtifactError, MODEL_ARTIFACT_DIR, WEIGHTS_FILE, fetch_artifact, find_artifact, verify_artifact
+from app.predict import MODEL_HF_PATH, MODEL_REVISION, HF_TOKEN
+
+def main(args):
+    try:
+        if args.verify:
+            path = find_artifact(args.repo, args.revision)
+            if path is None:
+                print(f"No artifact for {args.repo}@{args.revision} in {MODEL_ARTIFACT_DIR}")
+                return 1
+        else:
+            path = fetch_artifact(args.repo, args.revision, token=HF_TOKEN, force=args.force)
+        manifest = verify_artifact(path, mode="sha256")
+    except ArtifactError as e:
+        print(f"Artifact check failed: {str(e)}")
+        return 1
+
+    print(f"Artifact: {path}")
+    print(f"Commit:   {manifest['commit']}")
+    print(f"Weights:  sha256 {manifest['files'][WEIGHTS_FILE]['sha256']}")
+    print(f"Pin it with MODEL_REVISION={manifest['commit']} MODEL_ARTIFACT_SHA256={manifest['files'][WEIGHTS_FILE]['sha256']}")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repo", default=MODEL_HF_PATH, help="Hub model id (default: MODEL_HF_PATH)")
+    parser.add_argument("--revision", default=MODEL_REVISION, help="Branch, tag or commit (default: MODEL_REVISION)")
+    parser.add_argument("--force", action="store_true", help="Download again even if the artifact exists")
+    parser.add_argument("--verify", action="store_true", help="Only check the existing artifact's checksums")
+    args = parser.parse_args()
+    sys.exit(main(args))
@@ -5,14 +5,37 @@ Full-stack Flask application with templates and static files
 from dotenv import load_dotenv
 load_dotenv()
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, flash, stream_with_context, send_file, g
 from flask_cors import CORS
-from app.predict import predict_emotions, is_model_loaded
+from app.predict import (
+    predict_emotions, predict_emotions_long, is_model_loaded, is_model_ready,
+    get_model_load_error, get_token_cache_stats, start_model_loading, TOP_N
+)
+from app.scheduler import get_scheduler, predict_bulk, ENABLE_MICRO_BATCHING
+from app.streaming import stream_ndjson_predictions, iter_ndjson_records, make_record, STREAM_BATCH_SIZE
+from app.jobs import get_job_runner, current_job_runner, resume_jobs, submit_job, ENABLE_BATCH_JOBS, BATCH_JOB_RESULTS_PAGE_SIZE, JOB_COMPLETED, JOB_FAILED
+from app.cache import (
+    get_prediction_cache, warm_up_disk_store,
+    ENABLE_PREDICTION_CACHE, PREDICTION_DISK_CACHE_PATH, PREDICTION_CACHE_WARMUP_SIZE
+)
 from app.database import (
     connect_to_mongodb, close_mongodb_connection, 
-    save_prediction, get_predictions, get_prediction_by_id, 
-    delete_prediction, get_stats
+    save_prediction, save_predictions, get_predictions, get_predictions_page, count_predictions, get_prediction_by_id, 
+    delete_prediction, get_stats, get_frequent_texts,
+    enqueue_prediction, write_buffer, WRITE_BUFFER_ENABLED
+)
+from app.metrics import (
+    render_metrics, RUN_ASYNC_WAIT_SECONDS, REQUEST_TEXT_CHARS, REQUESTS_TOTAL, ERRORS_TOTAL
+)
+from app.admission import (
+    AdmissionError, DEADLINE_HEADER, ENABLE_ADMISSION_CONTROL,
+    get_admission_controller, get_rate_limiter, parse_deadline, run_admitted
 )
+from app.profiling import (
+    should_profile, profile_call, is_admin_token, list_profiles, get_profile_file,
+    memory_snapshot, stop_memory_tracing, PROFILE_ADMIN_TOKEN, PROFILE_HEADER, ADMIN_TOKEN_HEADER
+)
+from functools import partial, wraps
 import logging
 import json
 import asyncio
@@ -20,6 +43,7 @@ import threading
 from typing import Optional, List
 from datetime import datetime
 import os
+import time
 import concurrent.futures
 
 # Configure logging
@@ -42,6 +66,22 @@ CORS(app, origins=[
 # Database connection status
 DB_CONNECTED = False
 
+# Maximum number of texts accepted by the batch endpoint
+BATCH_MAX_TEXTS = int(os.environ.get('BATCH_MAX_TEXTS', 1000))
+
+# Maximum characters accepted by the long-document endpoint
+LONG_TEXT_MAX_CHARS = int(os.environ.get('LONG_TEXT_MAX_CHARS', 50000))
+
+# Load and warm up the model at startup instead of on the first request
+EAGER_MODEL_LOADING = os.environ.get('EAGER_MODEL_LOADING', 'True').lower() == 'true'
+if EAGER_MODEL_LOADING:
+    start_model_loading()
+
+# Resume background batch jobs left queued or running by a previous process,
+# off the import path; otherwise the runner starts with the first job
+if ENABLE_BATCH_JOBS:
+    threading.Thread(target=resume_jobs, name="batch-job-resume", daemon=True).start()
+
 # Global event loop for async operations
 _event_loop = None
 _loop_thread = None
@@ -50,18 +90,15 @@ def init_event_loop():
     """Initialize a dedicated event loop in a separate thread"""
     global _event_loop, _loop_thread
     
+    # Create the loop here so it exists before run_async can be called
+    _event_loop = asyncio.new_event_loop()
+    
     def run_loop():
-        global _event_loop
-        _event_loop = asyncio.new_event_loop()
         asyncio.set_event_loop(_event_loop)
         _event_loop.run_forever()
     
-    _loop_thread = threading.Thread(target=run_loop, daemon=True)
+    _loop_thread = threading.Thread(target=run_loop, name="db-event-loop", daemon=True)
     _loop_thread.start()
-    
-    # Wait a bit for the loop to be ready
-    import time
-    time.sleep(0.1)
 
 def run_async(coro):
     """
@@ -76,8 +113,9 @@ def run_async(coro):
     
     try:
         # Schedule the coroutine in the dedicated event loop
-        future = asyncio.run_coroutine_threadsafe(coro, _event_loop)
-        return future.result(timeout=30)  # 30 second timeout
+        with RUN_ASYNC_WAIT_SECONDS.time():
+            future = asyncio.run_coroutine_threadsafe(coro, _event_loop)
+            return future.result(timeout=30)  # 30 second timeout
     except concurrent.futures.TimeoutError:
         logger.error("Async operation timed out")
         raise Exception("Database operation timed out")
@@ -88,20 +126,37 @@ def run_async(coro):
 # Initialize event loop
 init_event_loop()
 
+def warm_prediction_store():
+    """Fill the disk prediction store with the most frequent past texts"""
+    try:
+        texts = run_async(get_frequent_texts(limit=PREDICTION_CACHE_WARMUP_SIZE))
+        warm_up_disk_store(texts)
+    except Exception as e:
+        logger.error(f"Prediction store warm-up failed: {str(e)}")
+
 # Initialize database connection
 def init_db():
     """Initialize database connection"""
     global DB_CONNECTED
+    started = time.perf_counter()
     try:
         run_async(connect_to_mongodb())
         DB_CONNECTED = True
-        logger.info("Database connected successfully")
+        logger.info(f"Database connected successfully in {time.perf_counter() - started:.2f}s")
+        if WRITE_BUFFER_ENABLED:
+            write_buffer.start(_event_loop)
     except Exception as e:
         logger.error(f"Database connection failed: {str(e)}")
         DB_CONNECTED = False
+        return
+    
+    # Warm the disk prediction store in the background
+    if ENABLE_PREDICTION_CACHE and PREDICTION_DISK_CACHE_PATH and PREDICTION_CACHE_WARMUP_SIZE > 0:
+        warm_prediction_store()
 
-# Initialize database on startup
-init_db()
+# Connect in the background so the app serves requests (and health checks)
+# while server selection is still in progress; DB routes return 503 until then
+threading.Thread(target=init_db, name="db-connect", daemon=True).start()
 
 # Helper function to get request info
 def get_request_info():
@@ -112,6 +167,47 @@ def get_request_info():
         "referer": request.headers.get("Referer")
     }
 
+def admission_controlled(view):
+    """Rate-limit the client and attach the request deadline as g.deadline"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        get_rate_limiter().check(get_request_info()["ip_address"])
+        g.deadline = parse_deadline(request.headers.get(DEADLINE_HEADER))
+        return view(*args, **kwargs)
+    return wrapper
+
+def analyze_text(text, deadline=None):
+    """
+    Predict emotions for a single text
+    Serves repeats from the prediction cache and batches misses with
+    concurrent requests when micro-batching is enabled; misses wait for an
+    admission slot and are dropped if the deadline passes first
+    """
+    if ENABLE_MICRO_BATCHING:
+        compute = lambda: run_admitted(lambda: get_scheduler().predict(text, deadline=deadline), deadline=deadline)
+    else:
+        compute = lambda: run_admitted(predict_emotions, text, deadline=deadline)
+    
+    if ENABLE_PREDICTION_CACHE:
+        return get_prediction_cache().get_or_compute(text, compute, deadline=deadline)
+    return compute()
+
+def store_prediction(text, emotions):
+    """Store a prediction in the database if connected, without failing the request"""
+    if not DB_CONNECTED:
+        return
+    try:
+        request_info = get_request_info()
+        if WRITE_BUFFER_ENABLED:
+            # Written in the background by the write-behind buffer
+            enqueue_prediction(text, emotions, request_info)
+        else:
+            prediction_id = run_async(save_prediction(text, emotions, request_info))
+            logger.info(f"Saved prediction with ID: {prediction_id}")
+    except Exception as e:
+        logger.error(f"Error saving prediction: {str(e)}")
+        # Don't fail the entire request if database save fails
+
 # Routes
 
 @app.route('/')
@@ -120,6 +216,7 @@ def index():
     return render_template('index.html')
 
 @app.route('/predict', methods=['POST'])
+@admission_controlled
 def predict_emotion():
     """
     API endpoint to predict emotions from text input
@@ -155,22 +252,22 @@ def predict_emotion():
             flash(error_msg, 'error')
             return redirect(url_for('index'))
 
-    logger.info(f"Processing text: {text[:50]}..." if len(text) > 50 else f"Processing text: {text}")
+    logger.debug(f"Processing text: {text[:50]}..." if len(text) > 50 else f"Processing text: {text}")
+    REQUEST_TEXT_CHARS.observe(len(text))
 
     try:
         # Get emotion predictions
-        emotions = predict_emotions(text)
-        logger.info(f"Prediction successful: {json.dumps(dict(list(emotions.items())[:3]))}")
+        if should_profile(request.headers.get(PROFILE_HEADER)):
+            # Profiled requests take the same admitted, cached path as the rest,
+            # so they keep their deadline and slot; a cache hit or a micro-batched
+            # forward pass shows up as waiting rather than model time
+            emotions, g.profile_id = profile_call(lambda: analyze_text(text, g.deadline), "predict")
+        else:
+            emotions = analyze_text(text, g.deadline)
+        logger.debug(f"Prediction successful: {json.dumps(dict(list(emotions.items())[:3]))}")
         
         # Store prediction in database if connected
-        if DB_CONNECTED:
-            try:
-                request_info = get_request_info()
-                prediction_id = run_async(save_prediction(text, emotions, request_info))
-                logger.info(f"Saved prediction with ID: {prediction_id}")
-            except Exception as e:
-                logger.error(f"Error saving prediction: {str(e)}")
-                # Don't fail the entire request if database save fails
+        store_prediction(text, emotions)
         
         # Return response based on request type
         if request.is_json:
@@ -182,6 +279,8 @@ def predict_emotion():
                                  emotions=emotions,
                                  success=True)
             
+    except AdmissionError:
+        raise
     except Exception as e:
         error_msg = f"Prediction error: {str(e)}"
         logger.error(error_msg, exc_info=True)
@@ -192,18 +291,269 @@ def predict_emotion():
             flash(error_msg, 'error')
             return redirect(url_for('index'))
 
+@app.route('/api/predict/batch', methods=['POST'])
+@admission_controlled
+def predict_emotion_batch():
+    """
+    API endpoint to predict emotions for a list of texts in one request
+    Expects a JSON body of the form {"texts": [...], "top_n": 5}
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('texts'), list):
+        return jsonify({"error": "Please provide a 'texts' list in JSON body"}), 400
+    
+    texts = data['texts']
+    if not texts:
+        return jsonify({"error": "Input texts cannot be empty"}), 400
+    if len(texts) > BATCH_MAX_TEXTS:
+        return jsonify({"error": f"Too many texts. Max {BATCH_MAX_TEXTS} texts allowed per request"}), 400
+    
+    try:
+        top_n = int(data.get('top_n', 5))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'top_n' must be an integer"}), 400
+    
+    # Validate every text the same way as the single-text endpoint
+    cleaned_texts = []
+    for index, text in enumerate(texts):
+        if not isinstance(text, str) or not text.strip():
+            return jsonify({"error": f"Text at index {index} cannot be empty"}), 400
+        text = text.strip()
+        if len(text) > 512:
+            return jsonify({"error": f"Text at index {index} too long. Max 512 characters allowed"}), 400
+        cleaned_texts.append(text)
+        REQUEST_TEXT_CHARS.observe(len(text))
+    
+    logger.info(f"Processing batch of {len(cleaned_texts)} texts")
+    
+    try:
+        # Bulk lane, so interactive /predict requests run between its chunks
+        deadline = g.deadline
+        results = run_admitted(lambda: predict_bulk(cleaned_texts, top_n=top_n, deadline=deadline), deadline=deadline)
+    except AdmissionError:
+        raise
+    except Exception as e:
+        error_msg = f"Prediction error: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return jsonify({"error": error_msg}), 500
+    
+    # Store all predictions with one bulk insert if connected
+    prediction_ids = []
+    if DB_CONNECTED:
+        try:
+            request_info = get_request_info()
+            prediction_ids = run_async(save_predictions(cleaned_texts, results, request_info))
+        except Exception as e:
+            logger.error(f"Error saving batch predictions: {str(e)}")
+            # Don't fail the entire request if database save fails
+    
+    return jsonify({
+        "results": [{"emotions": emotions} for emotions in results],
+        "ids": prediction_ids,
+        "count": len(results)
+    })
+
+@app.route('/api/predict/long', methods=['POST'])
+@admission_controlled
+def predict_emotion_long():
+    """
+    API endpoint to analyze long documents (emails, transcripts)
+    Expects {"text": "...", "aggregation": "max" | "mean"}; the text is
+    scored in overlapping token windows instead of being truncated
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('text'), str):
+        return jsonify({"error": "Please provide 'text' field in JSON body"}), 400
+    
+    text = data['text'].strip()
+    if not text:
+        return jsonify({"error": "Input text cannot be empty"}), 400
+    if len(text) > LONG_TEXT_MAX_CHARS:
+        return jsonify({"error": f"Input text too long. Max {LONG_TEXT_MAX_CHARS} characters allowed"}), 400
+    
+    aggregation = data.get('aggregation', 'max')
+    REQUEST_TEXT_CHARS.observe(len(text))
+    
+    try:
+        result = run_admitted(predict_emotions_long, text, aggregation=aggregation, deadline=g.deadline)
+    except AdmissionError:
+        raise
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        error_msg = f"Prediction error: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return jsonify({"error": error_msg}), 500
+    
+    logger.info(f"Long text analyzed: {result['tokens']} tokens in {result['windows']} windows")
+    store_prediction(text, result["emotions"])
+    
+    return jsonify({
+        "emotions": result["emotions"],
+        "windows": result["windows"],
+        "tokens": result["tokens"],
+        "aggregation": aggregation
+    })
+
+@app.route('/api/predict/stream', methods=['POST'])
+@admission_controlled
+def predict_emotion_stream():
+    """
+    Streaming bulk analysis endpoint
+    Reads newline-delimited JSON texts (strings or {"id", "text"} objects)
+    from the request body incrementally and streams one NDJSON result per
+    input line back as each batch finishes; each batch takes an admission
+    slot, and a batch refused by admission control gets per-line errors
+    """
+    try:
+        batch_size = max(1, min(int(request.args.get('batch_size', STREAM_BATCH_SIZE)), 256))
+    except ValueError:
+        return jsonify({"error": "'batch_size' must be an integer"}), 400
+    include_text = request.args.get('include_text', 'false').lower() == 'true'
+    
+    # Read the raw body stream so Flask never buffers the whole payload
+    stream = request.stream
+    logger.info(f"Starting streaming analysis (batch_size={batch_size})")
+    return Response(
+        stream_with_context(stream_ndjson_predictions(stream, batch_size, include_text, predict_fn=partial(run_admitted, predict_bulk))),
+        mimetype='application/x-ndjson'
+    )
+
+# Background batch jobs
+
+def job_response(job):
+    """Job status plus the URLs to poll and fetch results"""
+    return dict(job,
+                status_url=url_for('get_batch_job', job_id=job["id"]),
+                results_url=url_for('get_batch_job_results', job_id=job["id"]),
+                events_url=url_for('batch_job_events', job_id=job["id"]))
+
+@app.route('/api/jobs', methods=['POST'])
+@admission_controlled
+def create_batch_job():
+    """
+    Submit texts for background scoring and return a job ID right away
+    Accepts {"texts": [...], "top_n": 5} with strings or {"id", "text"}
+    objects, an NDJSON request body, or an NDJSON file uploaded as 'file'
+    """
+    if not ENABLE_BATCH_JOBS:
+        return jsonify({"error": "Batch jobs are disabled"}), 404
+    
+    upload = request.files.get('file')
+    try:
+        if upload:
+            records = iter_ndjson_records(upload.stream)
+            top_n = int(request.form.get('top_n', TOP_N))
+        elif request.is_json:
+            data = request.get_json(silent=True)
+            if not data or not isinstance(data.get('texts'), list):
+                return jsonify({"error": "Please provide a 'texts' list in JSON body"}), 400
+            records = (make_record(value, index) for index, value in enumerate(data['texts']))
+            top_n = int(data.get('top_n', TOP_N))
+        else:
+            # Read the raw NDJSON body line by line without buffering it
+            records = iter_ndjson_records(request.stream)
+            top_n = int(request.args.get('top_n', TOP_N))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'top_n' must be an integer"}), 400
+    
+    try:
+        job = submit_job(records, top_n=top_n)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error creating batch job: {str(e)}")
+        return jsonify({"error": f"Job store error: {str(e)}"}), 500
+    
+    return jsonify(job_response(job)), 202
+
+@app.route('/api/jobs/<job_id>')
+def get_batch_job(job_id):
+    """API endpoint to poll a batch job's status and progress"""
+    job = get_job_runner().store.get_job(job_id) if ENABLE_BATCH_JOBS else None
+    if not job:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job_response(job))
+
+@app.route('/api/jobs/<job_id>/results')
+def get_batch_job_results(job_id):
+    """
+    API endpoint to fetch a batch job's finished results page by page
+    Pass the returned 'next_cursor' as 'cursor' to fetch the following page;
+    results can be read while the job is still running
+    """
+    job = get_job_runner().store.get_job(job_id) if ENABLE_BATCH_JOBS else None
+    if not job:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    try:
+        cursor = int(request.args.get('cursor', -1))
+        limit = max(1, min(int(request.args.get('limit', BATCH_JOB_RESULTS_PAGE_SIZE)), 5000))
+    except ValueError:
+        return jsonify({"error": "'cursor' and 'limit' must be integers"}), 400
+    
+    results, next_cursor = get_job_runner().store.get_results(job_id, cursor, limit)
+    return jsonify({
+        "job_id": job_id,
+        "status": job["status"],
+        "results": results,
+        "next_cursor": next_cursor
+    })
+
+@app.route('/api/jobs/<job_id>/events')
+def batch_job_events(job_id):
+    """Stream the job's status as NDJSON, one line per change, until it finishes"""
+    store = get_job_runner().store if ENABLE_BATCH_JOBS else None
+    if not store or not store.get_job(job_id):
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    
+    def generate():
+        last = None
+        while True:
+            job = store.get_job(job_id)
+            if job is None:
+                yield json.dumps({"id": job_id, "status": "deleted"}) + "\n"
+                return
+            state = (job["status"], job["processed"])
+            if state != last:
+                last = state
+                yield json.dumps(job) + "\n"
+            if job["status"] in (JOB_COMPLETED, JOB_FAILED):
+                return
+            time.sleep(1.0)
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def delete_batch_job(job_id):
+    """API endpoint to cancel a batch job and delete its results"""
+    if not ENABLE_BATCH_JOBS or not get_job_runner().store.delete_job(job_id):
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify({"message": f"Job {job_id} deleted successfully"})
+
 @app.route('/api/predictions')
 def list_predictions():
-    """API endpoint to get list of predictions with pagination"""
-    page = int(request.args.get('page', 1))
-    limit = min(int(request.args.get('limit', 10)), 100)
+    """
+    API endpoint to get list of predictions with pagination
+    Pass the returned 'next_cursor' as 'cursor' to fetch the following page;
+    the legacy 'page' parameter is still accepted but skips documents, and
+    its 'next_cursor' continues from that page with keyset paging
+    """
+    cursor = request.args.get('cursor')
+    try:
+        page = int(request.args.get('page', 1))
+        limit = min(int(request.args.get('limit', 10)), 100)
+    except ValueError:
+        return jsonify({"error": "'page' and 'limit' must be integers"}), 400
+    if limit < 1:
+        return jsonify({"error": "'limit' must be at least 1"}), 400
     
     if not DB_CONNECTED:
         return jsonify({"error": "Database not connected"}), 503
     
     try:
-        skip = (page - 1) * limit
-        predictions = run_async(get_predictions(limit=limit, skip=skip))
+        skip = 0 if cursor else max(page - 1, 0) * limit
+        predictions, next_cursor = run_async(get_predictions_page(limit=limit, cursor=cursor, skip=skip))
+        total = run_async(count_predictions())
         
         # Format predictions for JSON response
         formatted_predictions = []
@@ -217,10 +567,13 @@ def list_predictions():
         
         return jsonify({
             "predictions": formatted_predictions,
-            "total": len(formatted_predictions) + skip,  # Simplified
+            "total": total,
             "page": page,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": next_cursor
         })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error retrieving predictions: {str(e)}")
         return jsonify({"error": f"Database error: {str(e)}"}), 500
@@ -296,20 +649,116 @@ def dashboard():
         flash(f'Error loading dashboard: {str(e)}', 'error')
         return render_template('dashboard.html', predictions=[], stats={})
 
+@app.after_request
+def record_request_metrics(response):
+    """Count every response by endpoint and status for /metrics"""
+    endpoint = request.endpoint or "unmatched"
+    REQUESTS_TOTAL.inc(endpoint=endpoint, status=response.status_code)
+    if response.status_code >= 400:
+        ERRORS_TOTAL.inc(endpoint=endpoint, status=response.status_code)
+    if g.get("profile_id"):
+        response.headers["X-Profile-Id"] = g.profile_id
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics in the text exposition format"""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+# Admin endpoints for profiling, enabled by setting PROFILE_ADMIN_TOKEN
+def require_admin(view):
+    """Reject requests without the admin token; hide the endpoint when no token is configured"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not PROFILE_ADMIN_TOKEN:
+            return jsonify({"error": "Endpoint not found"}), 404
+        if not is_admin_token(request.headers.get(ADMIN_TOKEN_HEADER)):
+            return jsonify({"error": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/admin/profiles')
+@require_admin
+def admin_list_profiles():
+    """List stored profile runs, newest first"""
+    return jsonify({"profiles": list_profiles()})
+
+@app.route('/admin/profiles/<profile_id>/<filename>')
+@require_admin
+def admin_download_profile(profile_id, filename):
+    """Download one file of a stored profile run"""
+    path = get_profile_file(profile_id, filename)
+    if path is None:
+        return jsonify({"error": "Profile file not found"}), 404
+    return send_file(path, as_attachment=True, download_name=f"{profile_id}-{filename}")
+
+@app.route('/admin/memory/snapshot', methods=['POST'])
+@require_admin
+def admin_memory_snapshot():
+    """Take a tracemalloc snapshot and diff it against the previous one (first call starts tracing)"""
+    try:
+        limit = min(int(request.args.get('limit', 25)), 200)
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
+    try:
+        return jsonify(memory_snapshot(limit=limit, group_by=request.args.get('group_by', 'lineno')))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/admin/memory/snapshot', methods=['DELETE'])
+@require_admin
+def admin_stop_memory_tracing():
+    """Stop tracemalloc, which slows every allocation while it runs"""
+    stop_memory_tracing()
+    return jsonify({"tracing": False})
+
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    health = {
         "status": "healthy",
-        "model_status": "loaded" if is_model_loaded() else "not_loaded",
+        "model_status": "ready" if is_model_ready() else ("loaded" if is_model_loaded() else "not_loaded"),
         "database": "connected" if DB_CONNECTED else "disconnected"
-    })
+    }
+    if ENABLE_MICRO_BATCHING:
+        health["scheduler"] = get_scheduler().stats()
+    if ENABLE_PREDICTION_CACHE:
+        health["cache"] = get_prediction_cache().stats()
+    health["token_cache"] = get_token_cache_stats()
+    if ENABLE_ADMISSION_CONTROL:
+        health["admission"] = get_admission_controller().stats()
+    if current_job_runner() is not None:
+        health["jobs"] = current_job_runner().stats()
+    if DB_CONNECTED and WRITE_BUFFER_ENABLED:
+        health["write_buffer"] = write_buffer.stats()
+    return jsonify(health)
+
+@app.route('/health/live')
+def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({"status": "alive"})
+
+@app.route('/health/ready')
+def readiness_check():
+    """Readiness probe: passes only once the model is loaded and warmed up"""
+    # Starts loading on the first probe when eager loading is disabled,
+    # and retries a failed load once its backoff has passed
+    start_model_loading()
+    if is_model_ready():
+        return jsonify({"status": "ready"})
+    
+    response = {"status": "loading" if is_model_loaded() else "not_ready"}
+    load_error = get_model_load_error()
+    if load_error:
+        response["status"] = "failed"
+        response["error"] = load_error
+    return jsonify(response), 503
 
 @app.route('/api/model-test')
 def test_model():
     """Endpoint to test if the model is working"""
     try:
-        test_result = predict_emotions("Test message")
+        test_result = analyze_text("Test message")
         return jsonify({
             "status": "model working",
             "results": test_result
@@ -326,6 +775,14 @@ def not_found(error):
     # Simple 404 response without template
     return "<h1>404 - Page Not Found</h1><p>The requested page could not be found.</p>", 404
 
+@app.errorhandler(AdmissionError)
+def admission_error(error):
+    """Shed load with a fast 429/503 and a Retry-After hint"""
+    response = jsonify({"error": str(error), "reason": error.reason})
+    response.status_code = error.status_code
+    response.headers["Retry-After"] = error.retry_after_header
+    return response
+
 @app.errorhandler(500)
 def internal_error(error):
     if request.is_json:
@@ -351,9 +808,17 @@ def cleanup():
     """Cleanup resources on app shutdown"""
     global _event_loop, _loop_thread
     
-    # Close database connections
+    # Finish any queued inference work; a running batch job is requeued
+    if current_job_runner() is not None:
+        current_job_runner().stop()
+    if ENABLE_MICRO_BATCHING:
+        get_scheduler().stop()
+    
+    # Write out buffered predictions, then close database connections
     try:
         if _event_loop and not _event_loop.is_closed():
+            if DB_CONNECTED and WRITE_BUFFER_ENABLED:
+                asyncio.run_coroutine_threadsafe(write_buffer.drain(), _event_loop).result(timeout=30)
             asyncio.run_coroutine_threadsafe(close_mongodb_connection(), _event_loop)
     except Exception as e:
         logger.error(f"Error during cleanup: {e}")
@@ -0,0 +1,213 @@
+"""
+Pre-fork production server for the Emotion Analyzer app.
+Loads and warms up the model once in the master process, then forks worker
+processes that share the weight pages copy-on-write. Each worker serves the
+Flask app on the shared listening socket with its own torch thread budget.
+
+Usage:
+    python serve.py [--workers N] [--threads-per-worker T] [--port PORT]
+"""
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import logging
+import argparse
+from dotenv import load_dotenv
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("serve")
+
+CPU_COUNT = os.cpu_count() or 1
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", CPU_COUNT))
+TORCH_THREADS_PER_WORKER = int(os.environ.get("TORCH_THREADS_PER_WORKER", "0"))
+MEMORY_REPORT_INTERVAL = float(os.environ.get("MEMORY_REPORT_INTERVAL", "300"))
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def get_memory_usage(pid):
+    """
+    Return resident, proportional and shared memory of a process in MB
+
+    Reads /proc/<pid>/smaps_rollup where available (PSS splits shared pages
+    between the processes mapping them), falling back to /proc/<pid>/statm.
+    """
+    usage = {"pid": pid}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+        usage["rss_mb"] = round(fields.get("Rss", 0) / 1024, 1)
+        usage["pss_mb"] = round(fields.get("Pss", 0) / 1024, 1)
+        usage["shared_mb"] = round((fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)) / 1024, 1)
+        usage["private_mb"] = round((fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024, 1)
+        return usage
+    except OSError:
+        pass
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            _, resident, shared = (int(x) for x in f.read().split()[:3])
+        usage["rss_mb"] = round(resident * PAGE_SIZE / 1024 / 1024, 1)
+        usage["shared_mb"] = round(shared * PAGE_SIZE / 1024 / 1024, 1)
+    except OSError as e:
+        usage["error"] = str(e)
+    return usage
+
+def log_memory_report(master_pid, worker_pids):
+    """Log resident and shared memory for the master and every worker"""
+    for label, pid in [("master", master_pid)] + [(f"worker {i}", pid) for i, pid in enumerate(worker_pids)]:
+        usage = get_memory_usage(pid)
+        details = ", ".join(f"{key}={value}" for key, value in usage.items() if key != "pid")
+        logger.info(f"Memory {label} (pid {pid}): {details}")
+
+
+def preload_model():
+    """Load and warm up the model once in the master process"""
+    import torch
+    # Keep the master single-threaded so no OpenMP pool exists at fork time;
+    # forked children would otherwise inherit a pool they cannot use
+    torch.set_num_threads(1)
+
+    from app.predict import start_model_loading, is_model_ready, get_model_load_error
+    started = time.perf_counter()
+    start_model_loading().join()
+    if not is_model_ready():
+        raise RuntimeError(f"Model failed to load: {get_model_load_error()}")
+
+    # Move everything allocated so far out of the collector's reach, so GC
+    # passes in the workers don't touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Model loaded and warmed up in master in {time.perf_counter() - started:.2f}s")
+
+def run_worker(index, listen_fd, host, port, torch_threads):
+    """Serve the Flask app on the inherited socket until terminated"""
+    import torch
+    torch.set_num_threads(torch_threads)
+
+    # Importing main here gives each worker its own event loop thread and DB client
+    from werkzeug.serving import make_server
+    from main import app
+
+    def handle_term(signum, frame):
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, handle_term)
+
+    server = make_server(host, port, app, threaded=True, fd=listen_fd)
+    logger.info(f"Worker {index} (pid {os.getpid()}) serving with {torch_threads} torch threads")
+    server.serve_forever()
+
+def shutdown_worker():
+    """
+    Run the app's shutdown path in a worker
+
+    Workers leave with os._exit, which skips atexit handlers, so main.cleanup
+    is called here to stop the scheduler, drain buffered predictions and
+    close the database client.
+    """
+    app_module = sys.modules.get("main")
+    if app_module is None:
+        return
+    try:
+        app_module.cleanup()
+    except Exception:
+        logger.exception("Worker cleanup failed")
+
+def spawn_worker(index, listen_fd, host, port, torch_threads):
+    pid = os.fork()
+    if pid == 0:
+        # Workers restarted after the master installed handle_stop inherit it;
+        # restore the defaults so Ctrl-C stops this worker, not its siblings
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            run_worker(index, listen_fd, host, port, torch_threads)
+        except SystemExit as e:
+            exit_code = e.code or 0
+        except Exception:
+            logger.exception(f"Worker {index} crashed")
+            exit_code = 1
+        finally:
+            shutdown_worker()
+            logging.shutdown()
+            os._exit(exit_code)
+    return pid
+
+def serve(host, port, workers, torch_threads):
+    preload_model()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+    logger.info(f"Listening on {host}:{port} with {workers} workers x {torch_threads} torch threads")
+
+    worker_pids = [spawn_worker(i, sock.fileno(), host, port, torch_threads) for i in range(workers)]
+    stopping = False
+
+    def handle_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    # Give workers a moment to start before the first memory report
+    time.sleep(2)
+    log_memory_report(os.getpid(), worker_pids)
+    next_report = time.monotonic() + MEMORY_REPORT_INTERVAL
+
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+
+        if pid:
+            if pid in worker_pids:
+                index = worker_pids.index(pid)
+                if stopping:
+                    worker_pids[index] = None
+                else:
+                    logger.warning(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+                    worker_pids[index] = spawn_worker(index, sock.fileno(), host, port, torch_threads)
+            if stopping and not any(worker_pids):
+                break
+            continue
+
+        if MEMORY_REPORT_INTERVAL > 0 and time.monotonic() >= next_report and not stopping:
+            log_memory_report(os.getpid(), [pid for pid in worker_pids if pid])
+            next_report = time.monotonic() + MEMORY_REPORT_INTERVAL
+        time.sleep(0.5)
+
+    sock.close()
+    logger.info("All workers stopped")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-fork server for the Emotion Analyzer app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5000)))
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--threads-per-worker", type=int, default=TORCH_THREADS_PER_WORKER,
+                        help="Torch intra-op threads per worker (default: CPU count / workers)")
+    args = parser.parse_args()
+
+    workers = max(1, args.workers)
+    # Split the cores between workers so the total never oversubscribes them
+    torch_threads = args.threads_per_worker or max(1, CPU_COUNT // workers)
+    serve(args.host, args.port, workers, torch_threads)
@@ -0,0 +1,175 @@
+"""
+Cold-start timing report for the Emotion Analyzer entry points.
+Times, each in a fresh interpreter, how long the heavy dependencies and each
+entry point take to import, then starts each server and times how long it
+takes to answer /health/live and /health/ready. Save the JSON output per
+release to track cold-start seconds over time.
+
+Usage:
+    python startup_report.py --output startup.json
+    python startup_report.py --servers api --ready-timeout 600
+    python startup_report.py --skip-servers
+"""
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import argparse
+import subprocess
+import urllib.error
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MODULES = [
+    "flask", "fastapi", "pymongo", "motor.motor_asyncio", "torch", "transformers",
+    "huggingface_hub", "app.predict", "app.database", "app.api", "main", "asgi",
+]
+
+SERVERS = {
+    "api": [sys.executable, "-m", "app.api"],
+    "main": [sys.executable, "main.py"],
+    "asgi": [sys.executable, "asgi.py"],
+}
+
+IMPORT_SNIPPET = (
+    "import time\n"
+    "started = time.perf_counter()\n"
+    "import {module}\n"
+    "print(time.perf_counter() - started)\n"
+)
+
+
+def parse_importtime(stderr, top):
+    """Return the slowest modules by cumulative time from -X importtime output"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = [field.strip() for field in line[len("import time:"):].split("|")]
+        if len(fields) != 3 or not fields[1].isdigit():
+            continue
+        entries.append((int(fields[1]), fields[2].strip()))
+    entries.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in entries[:top]]
+
+def time_import(module, top, env):
+    """Import one module in a fresh interpreter and report its wall time"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit {result.returncode}"
+        return {"error": error}
+    stdout = result.stdout.strip().splitlines()
+    return {
+        "seconds": round(float(stdout[-1]), 3),
+        "slowest": parse_importtime(result.stderr, top),
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for(url, started, timeout, process):
+    """Poll a URL until it returns 200; return seconds since started or None"""
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            return None
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return round(time.perf_counter() - started, 3)
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.05)
+    return None
+
+def time_server(name, live_timeout, ready_timeout, env):
+    """Start a server and time its first live and ready responses"""
+    port = free_port()
+    server_env = dict(env, PORT=str(port))
+    started = time.perf_counter()
+    process = subprocess.Popen(SERVERS[name], cwd=BASE_DIR, env=server_env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        live = wait_for(f"{base}/health/live", started, live_timeout, process)
+        ready = wait_for(f"{base}/health/ready", started, ready_timeout, process) if live is not None else None
+        result = {"live_seconds": live, "ready_seconds": ready}
+        if process.poll() is not None:
+            result["error"] = f"exited with status {process.returncode}"
+        return result
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def release_id():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    env = dict(os.environ)
+    report = {
+        "meta": {
+            "release": args.release or release_id(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "imports": {},
+        "servers": {},
+    }
+
+    # Measure imports alone, without the background model load they would start
+    import_env = dict(env, EAGER_MODEL_LOADING="False")
+    print("Import times (fresh interpreter each):")
+    for module in [m for m in args.modules.split(",") if m.strip()]:
+        result = time_import(module.strip(), args.top, import_env)
+        report["imports"][module] = result
+        if "error" in result:
+            print(f"  {module:<24} failed: {result['error']}")
+        else:
+            slowest = ", ".join(f"{entry['module']} {entry['cumulative_ms']:.0f}ms" for entry in result["slowest"][:3])
+            print(f"  {module:<24} {result['seconds']:>7.3f}s  ({slowest})")
+
+    if not args.skip_servers:
+        print("\nServer startup:")
+        for name in [n for n in args.servers.split(",") if n.strip()]:
+            result = time_server(name.strip(), args.live_timeout, args.ready_timeout, env)
+            report["servers"][name] = result
+            live = "-" if result["live_seconds"] is None else f"{result['live_seconds']:.3f}s"
+            ready = "-" if result["ready_seconds"] is None else f"{result['ready_seconds']:.3f}s"
+            print(f"  {name:<8} live {live:>9}  ready {ready:>9}  {result.get('error', '')}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote report to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", default=",".join(DEFAULT_MODULES), help="Comma-separated modules to time")
+    parser.add_argument("--top", type=int, default=10, help="Slowest nested imports kept per module")
+    parser.add_argument("--servers", default="api,main,asgi", help=f"Comma-separated servers from {sorted(SERVERS)}")
+    parser.add_argument("--skip-servers", action="store_true", help="Only time imports")
+    parser.add_argument("--live-timeout", type=float, default=120, help="Seconds to wait for /health/live")
+    parser.add_argument("--ready-timeout", type=float, default=600, help="Seconds to wait for /health/ready")
+    parser.add_argument("--release", default=None, help="Release label stored in the report (default: git describe)")
+    parser.add_argument("--output", default=None, help="Write machine-readable results to this JSON file")
+    args = parser.parse_args()
+    sys.exit(run(args))
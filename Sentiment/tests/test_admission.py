@@ -0,0 +1,192 @@
+"""
+Tests for admission control: slot accounting, deadlines and the per-client
+token bucket.
+"""
+import time
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import app.admission as admission
+from app.admission import (
+    AdmissionController, DeadlineExceeded, QueueFull, RateLimited, TokenBucketLimiter,
+    parse_deadline, run_admitted
+)
+
+
+class FakeClock:
+    """Stands in for the time module inside app.admission"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(admission, "time", SimpleNamespace(monotonic=fake.monotonic, perf_counter=fake.perf_counter))
+    return fake
+
+
+# Deadlines
+
+def test_parse_deadline_uses_header_budget(clock):
+    assert parse_deadline("250", default_ms=1000) == pytest.approx(clock.now + 0.25)
+
+def test_parse_deadline_falls_back_to_default_for_missing_or_invalid_header(clock):
+    assert parse_deadline(None, default_ms=1000) == pytest.approx(clock.now + 1.0)
+    assert parse_deadline("soon", default_ms=1000) == pytest.approx(clock.now + 1.0)
+
+def test_parse_deadline_without_budget_means_no_deadline():
+    assert parse_deadline(None, default_ms=0) is None
+    assert parse_deadline("0", default_ms=1000) is None
+
+
+# Slot accounting
+
+def test_reserve_refuses_once_running_and_waiting_places_are_taken():
+    controller = AdmissionController(max_concurrency=2, max_queue=1)
+    for _ in range(3):
+        controller.reserve()
+    with pytest.raises(QueueFull) as excinfo:
+        controller.reserve()
+    assert excinfo.value.status_code == 503
+    assert int(excinfo.value.retry_after_header) >= 1
+
+def test_acquire_and_release_balance_the_counters():
+    controller = AdmissionController(max_concurrency=2, max_queue=2)
+    controller.reserve()
+    acquired_at = controller.acquire()
+    assert controller.stats()["active"] == 1
+    assert controller.stats()["queued"] == 0
+    controller.release(acquired_at)
+    assert controller.stats()["active"] == 0
+    assert controller.stats()["queued"] == 0
+
+def test_admit_releases_the_slot_when_the_body_raises():
+    controller = AdmissionController(max_concurrency=1, max_queue=0)
+    with pytest.raises(RuntimeError):
+        with controller.admit():
+            raise RuntimeError("boom")
+    stats = controller.stats()
+    assert stats["active"] == 0 and stats["queued"] == 0
+    with controller.admit():
+        pass
+
+def test_reserved_request_counts_as_queued_until_it_gets_a_slot():
+    controller = AdmissionController(max_concurrency=1, max_queue=1)
+    controller.reserve()
+    first = controller.acquire()
+    controller.reserve()
+    assert controller.stats()["queued"] == 1
+
+    acquired = threading.Event()
+
+    def waiter():
+        controller.release(controller.acquire())
+        acquired.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    assert not acquired.wait(0.05)
+    controller.release(first)
+    assert acquired.wait(1.0)
+    thread.join()
+    stats = controller.stats()
+    assert stats["active"] == 0 and stats["queued"] == 0
+
+def test_acquire_gives_the_place_back_when_the_deadline_passes_while_queued():
+    controller = AdmissionController(max_concurrency=1, max_queue=1)
+    controller.reserve()
+    held = controller.acquire()
+    controller.reserve()
+    with pytest.raises(DeadlineExceeded):
+        controller.acquire(deadline=time.monotonic() + 0.02)
+    assert controller.stats()["queued"] == 0
+    controller.release(held)
+    assert controller.stats()["active"] == 0
+
+def test_abandoned_reservation_returns_its_place_and_never_runs():
+    controller = AdmissionController(max_concurrency=1, max_queue=0)
+    reservation = controller.reservation()
+    with pytest.raises(QueueFull):
+        controller.reserve()
+    reservation.abandon()
+    assert controller.stats()["queued"] == 0
+    with pytest.raises(DeadlineExceeded):
+        reservation.run(lambda: "ran")
+
+def test_reservation_run_releases_its_slot_and_abandon_afterwards_is_harmless():
+    controller = AdmissionController(max_concurrency=1, max_queue=0)
+    reservation = controller.reservation()
+    assert reservation.run(lambda value: value * 2, 21) == 42
+    reservation.abandon()
+    stats = controller.stats()
+    assert stats["active"] == 0 and stats["queued"] == 0
+
+
+# run_admitted
+
+def test_run_admitted_passes_arguments_through(monkeypatch):
+    monkeypatch.setattr(admission, "_admission_controller", AdmissionController(1, 0))
+    assert run_admitted(lambda a, b=0: a + b, 1, b=2, deadline=time.monotonic() + 5) == 3
+
+def test_run_admitted_drops_expired_work_without_calling_it(monkeypatch):
+    monkeypatch.setattr(admission, "_admission_controller", AdmissionController(1, 0))
+    calls = []
+    with pytest.raises(DeadlineExceeded):
+        run_admitted(lambda: calls.append(1), deadline=time.monotonic() - 1)
+    assert calls == []
+    assert admission.get_admission_controller().stats()["active"] == 0
+
+
+# Token bucket
+
+def test_token_bucket_allows_a_burst_then_rate_limits(clock):
+    limiter = TokenBucketLimiter(rate=2.0, burst=3, max_clients=10)
+    for _ in range(3):
+        limiter.check("client")
+    with pytest.raises(RateLimited) as excinfo:
+        limiter.check("client")
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.retry_after == pytest.approx(0.5)
+
+def test_token_bucket_refills_over_time(clock):
+    limiter = TokenBucketLimiter(rate=2.0, burst=3, max_clients=10)
+    for _ in range(3):
+        limiter.check("client")
+    clock.now += 0.5
+    limiter.check("client")
+    with pytest.raises(RateLimited):
+        limiter.check("client")
+
+def test_token_bucket_keeps_clients_apart(clock):
+    limiter = TokenBucketLimiter(rate=1.0, burst=1, max_clients=10)
+    limiter.check("a")
+    limiter.check("b")
+    with pytest.raises(RateLimited):
+        limiter.check("a")
+
+def test_token_bucket_evicts_least_recently_used_clients(clock):
+    limiter = TokenBucketLimiter(rate=1.0, burst=1, max_clients=2)
+    limiter.check("a")
+    limiter.check("b")
+    limiter.check("c")
+    assert limiter.stats()["clients"] == 2
+    # "a" was evicted, so it starts again with a full bucket
+    limiter.check("a")
+    with pytest.raises(RateLimited):
+        limiter.check("c")
+
+def test_token_bucket_with_zero_rate_is_disabled(clock):
+    limiter = TokenBucketLimiter(rate=0, burst=1)
+    for _ in range(100):
+        limiter.check("client")
+    assert limiter.stats()["clients"] == 0
@@ -0,0 +1,27 @@
+"""
+Tests for the offline batch scorer's input readers.
+"""
+import batch_score
+
+
+def read_rows(path, chunk_size=100):
+    return [row for chunk in batch_score.read_jsonl_chunks(str(path), chunk_size, "text", "id") for row in chunk]
+
+
+def test_jsonl_reader_keeps_going_past_bad_lines(tmp_path):
+    path = tmp_path / "input.jsonl"
+    path.write_text('{"id": 1, "text": "fine"}\n{not json\n\n42\n"plain text"\n[1, 2]\n', encoding="utf-8")
+
+    rows = read_rows(path)
+    assert [row[0] for row in rows] == [0, 1, 2, 3, 4]
+    assert rows[0] == (0, 1, "fine", None)
+    assert rows[1][2] is None and rows[1][3].startswith("Invalid JSON at column 2")
+    assert rows[2][3] == "Expected a JSON object or string, got int"
+    assert rows[3] == (3, None, "plain text", None)
+    assert rows[4][3] == "Expected a JSON object or string, got list"
+
+def test_jsonl_reader_chunks_rows(tmp_path):
+    path = tmp_path / "input.jsonl"
+    path.write_text("".join(f'"text {i}"\n' for i in range(5)), encoding="utf-8")
+    chunks = list(batch_score.read_jsonl_chunks(str(path), 2, "text", None))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
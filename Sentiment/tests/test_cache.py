@@ -0,0 +1,90 @@
+"""
+Tests for the prediction cache: LRU/TTL bookkeeping and in-flight
+coalescing, with a fake compute function in place of the model.
+"""
+import time
+import threading
+
+import pytest
+
+import app.cache as cache
+from app.admission import DeadlineExceeded
+from app.cache import PredictionCache
+
+
+@pytest.fixture(autouse=True)
+def fixed_model_identity(monkeypatch):
+    monkeypatch.setattr(cache, "get_model_identity", lambda: "test-model")
+
+
+def test_repeats_are_served_from_the_cache():
+    calls = []
+    prediction_cache = PredictionCache(max_size=10, ttl=0)
+
+    def compute():
+        calls.append(1)
+        return {"joy": 0.9}
+
+    assert prediction_cache.get_or_compute("hello  world", compute) == {"joy": 0.9}
+    assert prediction_cache.get_or_compute("hello world", compute) == {"joy": 0.9}
+    assert len(calls) == 1
+
+def test_least_recently_used_entries_are_evicted():
+    prediction_cache = PredictionCache(max_size=2, ttl=0)
+    for text in ("a", "b", "c"):
+        prediction_cache.get_or_compute(text, lambda: {"joy": 0.5})
+    assert prediction_cache.get(cache.make_cache_key("a")) is None
+    assert prediction_cache.get(cache.make_cache_key("c")) == {"joy": 0.5}
+
+
+# Coalescing
+
+def start_leader(prediction_cache, release):
+    """Start a caller that holds the in-flight computation until release is set"""
+    started = threading.Event()
+    result = {}
+
+    def compute():
+        started.set()
+        release.wait(5)
+        return {"joy": 0.7}
+
+    def leader():
+        result["value"] = prediction_cache.get_or_compute("same text", compute)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    assert started.wait(5)
+    return thread, result
+
+def test_concurrent_callers_share_one_computation():
+    prediction_cache = PredictionCache(max_size=10, ttl=0)
+    release = threading.Event()
+    thread, result = start_leader(prediction_cache, release)
+
+    follower = {}
+    follower_thread = threading.Thread(target=lambda: follower.update(
+        value=prediction_cache.get_or_compute("same text", lambda: pytest.fail("computed twice"))
+    ))
+    follower_thread.start()
+    release.set()
+    thread.join(5)
+    follower_thread.join(5)
+    assert result["value"] == follower["value"] == {"joy": 0.7}
+
+def test_followers_stop_waiting_at_their_deadline():
+    prediction_cache = PredictionCache(max_size=10, ttl=0)
+    release = threading.Event()
+    thread, result = start_leader(prediction_cache, release)
+    try:
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            prediction_cache.get_or_compute("same text", lambda: pytest.fail("computed twice"),
+                                            deadline=time.monotonic() + 0.05)
+        assert time.monotonic() - started < 1.0
+    finally:
+        release.set()
+        thread.join(5)
+    # The leader still finishes and fills the cache
+    assert result["value"] == {"joy": 0.7}
+    assert prediction_cache.get_or_compute("same text", lambda: pytest.fail("not cached")) == {"joy": 0.7}
@@ -0,0 +1,232 @@
+"""
+Tests for background batch jobs: the SQLite job store (claiming, progress
+and result paging) and the runner, with a fake batch function in place of
+the model.
+"""
+import pytest
+
+from app.jobs import JOB_COMPLETED, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JobRunner, JobStore
+from app.streaming import make_record
+
+
+def fake_batch_fn(texts, top_n=5):
+    return [{"joy": round(len(text) / 100, 4)} for text in texts]
+
+def records(values):
+    return [make_record(value, index) for index, value in enumerate(values)]
+
+def score(store, job_id, indexes):
+    """Store results for the given item indexes, as a worker would"""
+    store.save_results(job_id, [{"index": index, "emotions": {"joy": 0.5}} for index in indexes])
+
+def read_all(store, job_id, cursor=-1, limit=3):
+    """Follow next_cursor until it is None; returns (indexes, pages)"""
+    indexes, pages = [], 0
+    while True:
+        results, cursor = store.get_results(job_id, cursor, limit)
+        indexes += [result["index"] for result in results]
+        pages += 1
+        if cursor is None:
+            return indexes, pages
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"))
+
+def make_runner(store, batch_fn=fake_batch_fn, batch_size=2):
+    runner = JobRunner(store, batch_fn=batch_fn, workers=1, batch_size=batch_size,
+                       max_yield_ms=0, is_busy=lambda: False)
+    # Process jobs on the test thread instead of starting workers
+    runner._running = True
+    return runner
+
+
+# Job creation
+
+def test_create_job_counts_invalid_records_as_finished(store):
+    job = store.create_job(records(["good", "", {"id": 7, "text": "also good"}]))
+    assert job["status"] == JOB_QUEUED
+    assert job["total"] == 3
+    assert job["processed"] == 1 and job["errors"] == 1
+
+def test_create_job_rejects_empty_and_oversized_jobs(store):
+    with pytest.raises(ValueError):
+        store.create_job([])
+    with pytest.raises(ValueError):
+        store.create_job(records(["a", "b", "c"]), max_texts=2)
+    assert store.counts() == {}
+
+def test_get_job_returns_none_for_unknown_ids(store):
+    assert store.get_job("missing") is None
+
+
+# Claiming
+
+def test_claim_takes_the_oldest_queued_job_once(store):
+    first = store.create_job(records(["a"]))["id"]
+    second = store.create_job(records(["b"]))["id"]
+    assert store.claim_next_job()[0] == first
+    assert store.get_job(first)["status"] == JOB_RUNNING
+    assert store.claim_next_job()[0] == second
+    assert store.claim_next_job() is None
+
+def test_stale_running_jobs_are_taken_over(store):
+    job_id = store.create_job(records(["a"]))["id"]
+    first_claim = store.claim_next_job()
+    assert first_claim[0] == job_id
+    assert store.claim_next_job(stale_seconds=3600) is None
+    second_claim = store.claim_next_job(stale_seconds=-1)
+    assert second_claim[0] == job_id
+    assert second_claim[1] != first_claim[1]
+
+def test_a_taken_over_claim_can_no_longer_write(store):
+    job_id = store.create_job(records(["a", "b"]))["id"]
+    _, stale_owner = store.claim_next_job()
+    _, owner = store.claim_next_job(stale_seconds=-1)
+
+    assert not store.heartbeat(job_id, stale_owner)
+    assert not store.save_results(job_id, [{"index": 0, "emotions": {"joy": 0.1}}], owner=stale_owner)
+    assert not store.set_status(job_id, JOB_COMPLETED, owner=stale_owner)
+    assert store.get_job(job_id)["status"] == JOB_RUNNING
+    assert store.get_job(job_id)["processed"] == 0
+
+    assert store.heartbeat(job_id, owner)
+    assert store.save_results(job_id, [{"index": 0, "emotions": {"joy": 0.9}}], owner=owner)
+    assert store.set_status(job_id, JOB_FAILED, "boom", owner=owner)
+    results, _ = store.get_results(job_id)
+    assert results[0]["emotions"] == {"joy": 0.9}
+
+
+# Result paging
+
+def test_results_page_in_input_order(store):
+    job_id = store.create_job(records([f"text {i}" for i in range(7)]))["id"]
+    score(store, job_id, range(7))
+    store.set_status(job_id, JOB_COMPLETED)
+    indexes, pages = read_all(store, job_id, limit=3)
+    assert indexes == list(range(7))
+    assert pages == 3
+
+def test_paging_a_running_job_never_skips_pending_items(store):
+    values = [f"text {i}" for i in range(10)]
+    values[8] = ""
+    job_id = store.create_job(records(values))["id"]
+    store.claim_next_job()
+    score(store, job_id, [0, 1, 2])
+
+    results, cursor = store.get_results(job_id, -1, 100)
+    assert [result["index"] for result in results] == [0, 1, 2]
+    # Item 3 is pending, so the invalid item 8 is not returned yet
+    results, cursor = store.get_results(job_id, cursor, 100)
+    assert results == [] and cursor == 2
+
+    score(store, job_id, [3, 4, 5, 6, 7, 9])
+    store.set_status(job_id, JOB_COMPLETED)
+    indexes, _ = read_all(store, job_id, cursor)
+    assert indexes == [3, 4, 5, 6, 7, 8, 9]
+
+def test_failed_job_pages_end_and_leave_out_unscored_items(store):
+    job_id = store.create_job(records(["a", "b", "c", "d"]))["id"]
+    store.claim_next_job()
+    score(store, job_id, [0, 1])
+    store.set_status(job_id, JOB_FAILED, "boom")
+    indexes, _ = read_all(store, job_id)
+    assert indexes == [0, 1]
+
+def test_results_carry_ids_and_errors(store):
+    job_id = store.create_job(records([{"id": "x1", "text": "fine"}, ""]))["id"]
+    score(store, job_id, [0])
+    store.set_status(job_id, JOB_COMPLETED)
+    results, cursor = store.get_results(job_id)
+    assert results[0] == {"index": 0, "id": "x1", "emotions": {"joy": 0.5}}
+    assert results[1]["index"] == 1 and "error" in results[1]
+    assert cursor is None
+
+
+# Deletion and retention
+
+def test_delete_job_removes_it_and_its_items(store):
+    job_id = store.create_job(records(["a"]))["id"]
+    assert store.delete_job(job_id)
+    assert store.get_job(job_id) is None
+    assert store.get_results(job_id) == ([], None)
+    assert not store.delete_job(job_id)
+
+def test_purge_finished_only_removes_old_finished_jobs(store):
+    finished = store.create_job(records(["a"]))["id"]
+    active = store.create_job(records(["b"]))["id"]
+    store.set_status(finished, JOB_COMPLETED)
+    assert store.purge_finished(max_age_seconds=3600) == 0
+    assert store.purge_finished(max_age_seconds=-1) == 1
+    assert store.get_job(finished) is None
+    assert store.get_job(active) is not None
+
+
+# Runner
+
+def test_runner_scores_a_job_in_batches(store):
+    calls = []
+
+    def batch_fn(texts, top_n=5):
+        calls.append(list(texts))
+        return fake_batch_fn(texts, top_n)
+
+    job_id = store.create_job(records(["a", "", "ccc", "dd", "e"]))["id"]
+    runner = make_runner(store, batch_fn, batch_size=2)
+    job_id, owner = store.claim_next_job()
+    runner._process(job_id, owner)
+
+    job = store.get_job(job_id)
+    assert job["status"] == JOB_COMPLETED
+    assert job["processed"] == 5 and job["errors"] == 1 and job["progress"] == 1.0
+    assert calls == [["a", "ccc"], ["dd", "e"]]
+    results, _ = store.get_results(job_id)
+    assert [result.get("emotions") for result in results] == [
+        {"joy": 0.01}, None, {"joy": 0.03}, {"joy": 0.02}, {"joy": 0.01}
+    ]
+
+def test_runner_fails_the_job_when_a_whole_batch_fails(store):
+    calls = []
+
+    def flaky_batch_fn(texts, top_n=5):
+        calls.append(list(texts))
+        if len(calls) > 1:
+            raise RuntimeError("model exploded")
+        return fake_batch_fn(texts, top_n)
+
+    job_id = store.create_job(records(["a", "b", "c", "d"]))["id"]
+    runner = make_runner(store, flaky_batch_fn, batch_size=2)
+    job_id, owner = store.claim_next_job()
+    runner._process_claimed(job_id, owner)
+
+    job = store.get_job(job_id)
+    assert job["status"] == JOB_FAILED
+    assert "model exploded" in job["error"]
+    assert job["processed"] == 2 and job["errors"] == 0
+    indexes, _ = read_all(store, job_id)
+    assert indexes == [0, 1]
+
+def test_stopped_runner_requeues_the_job(store):
+    job_id = store.create_job(records(["a", "b"]))["id"]
+    _, owner = store.claim_next_job()
+    runner = make_runner(store)
+    runner._running = False
+    runner._process(job_id, owner)
+    assert store.get_job(job_id)["status"] == JOB_QUEUED
+    assert store.claim_next_job()[0] == job_id
+
+def test_runner_stops_without_writing_once_its_job_is_taken_over(store):
+    job_id = store.create_job(records(["a", "b", "c", "d"]))["id"]
+    _, stale_owner = store.claim_next_job()
+    runner = make_runner(store, batch_size=2)
+
+    def batch_fn(texts, top_n=5):
+        # Another worker takes the job over while this batch is scored
+        store.claim_next_job(stale_seconds=-1)
+        return fake_batch_fn(texts, top_n)
+    runner.batch_fn = batch_fn
+    runner._process(job_id, stale_owner)
+
+    job = store.get_job(job_id)
+    assert job["status"] == JOB_RUNNING
+    assert job["processed"] == 0
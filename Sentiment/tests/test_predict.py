@@ -0,0 +1,42 @@
+"""
+Tests for tokenization helpers in app.predict. A fake tokenizer stands in
+for the real one so no model is loaded.
+"""
+import pytest
+
+import app.predict as predict
+
+
+class FakeTokenizer:
+    model_input_names = ["input_ids", "token_type_ids", "attention_mask"]
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, truncation=True, max_length=None):
+        self.calls.append(list(texts))
+        ids = [[101] + [len(word) for word in text.split()] + [102] for text in texts]
+        return {
+            "input_ids": ids,
+            "token_type_ids": [[0] * len(row) for row in ids],
+            "attention_mask": [[1] * len(row) for row in ids],
+        }
+
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    fake = FakeTokenizer()
+    monkeypatch.setattr(predict, "get_model_and_tokenizer", lambda: (None, fake))
+    monkeypatch.setattr(predict, "_token_cache", predict.TokenCache())
+    return fake
+
+
+def test_tokenize_texts_returns_one_row_per_text_and_caches_them(tokenizer):
+    encodings = predict.tokenize_texts(["a bb", "ccc"])
+    assert encodings["input_ids"] == [[101, 1, 2, 102], [101, 3, 102]]
+    predict.tokenize_texts(["ccc", "dddd"])
+    assert tokenizer.calls == [["a bb", "ccc"], ["dddd"]]
+
+def test_tokenize_texts_with_no_texts_returns_empty_encodings(tokenizer):
+    assert predict.tokenize_texts([]) == {"input_ids": [], "token_type_ids": [], "attention_mask": []}
+    assert tokenizer.calls == []
@@ -0,0 +1,187 @@
+"""
+Tests for the micro-batching scheduler: lane picking, preemption of bulk
+fill waits, deadlines and result fan-out. A fake batch function stands in
+for the model.
+"""
+import time
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from app.admission import DeadlineExceeded
+from app.predict import TOP_N
+from app.scheduler import BULK_LANE, INTERACTIVE_LANE, InferenceScheduler, Lane
+
+
+def fake_batch_fn(calls=None):
+    """Batch function returning {text: 1.0, ...} with top_n entries per text"""
+    def batch_fn(texts, top_n=TOP_N):
+        if calls is not None:
+            calls.append(list(texts))
+        return [{f"{text}-{rank}": 1.0 - rank / 10 for rank in range(top_n)} for text in texts]
+    return batch_fn
+
+def make_scheduler(batch_fn=None, interactive_size=4, interactive_wait_ms=0.0, bulk_size=4, bulk_wait_ms=0.0,
+                   interactive_weight=4, bulk_weight=1):
+    return InferenceScheduler(batch_fn or fake_batch_fn(), lanes=[
+        Lane(INTERACTIVE_LANE, interactive_weight, interactive_size, interactive_wait_ms),
+        Lane(BULK_LANE, bulk_weight, bulk_size, bulk_wait_ms),
+    ])
+
+def enqueue(scheduler, lane, count, prefix=None):
+    """Put items straight on a lane's queue without starting the worker"""
+    with scheduler._cond:
+        for i in range(count):
+            item = (f"{prefix or lane}{i}", Future(), None, None, time.monotonic())
+            scheduler.lanes[lane].queue.append(item)
+        scheduler._cond.notify_all()
+
+def texts(batch):
+    return [item[0] for item in batch]
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = make_scheduler()
+    yield scheduler
+    scheduler.stop()
+
+
+# Lane picking
+
+def test_next_batch_returns_nothing_when_idle_and_stopped():
+    assert make_scheduler()._next_batch() == (None, [])
+
+def test_batches_never_exceed_the_lane_size():
+    scheduler = make_scheduler(interactive_size=3)
+    enqueue(scheduler, INTERACTIVE_LANE, 7)
+    sizes = [len(scheduler._next_batch()[1]) for _ in range(3)]
+    assert sizes == [3, 3, 1]
+
+def test_weighted_round_robin_between_busy_lanes():
+    scheduler = make_scheduler(interactive_size=1, bulk_size=1, interactive_weight=4, bulk_weight=1)
+    enqueue(scheduler, INTERACTIVE_LANE, 20)
+    enqueue(scheduler, BULK_LANE, 20)
+    picks = [scheduler._next_batch()[0].name for _ in range(10)]
+    assert picks.count(INTERACTIVE_LANE) == 8
+    assert picks.count(BULK_LANE) == 2
+    # Smooth round-robin spreads the bulk turns out
+    assert picks[:5].count(BULK_LANE) == 1
+
+def test_idle_lane_does_not_hold_back_the_busy_one():
+    scheduler = make_scheduler(bulk_size=2)
+    enqueue(scheduler, BULK_LANE, 6)
+    picks = [scheduler._next_batch() for _ in range(3)]
+    assert [lane.name for lane, _ in picks] == [BULK_LANE] * 3
+    assert texts(picks[0][1]) == ["bulk0", "bulk1"]
+
+def test_interactive_arrival_preempts_a_filling_bulk_batch():
+    scheduler = make_scheduler(bulk_size=4, bulk_wait_ms=5000)
+    scheduler._running = True
+    enqueue(scheduler, BULK_LANE, 1)
+    result = {}
+
+    def worker():
+        result["first"] = scheduler._next_batch()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    time.sleep(0.05)
+    enqueue(scheduler, INTERACTIVE_LANE, 1)
+    thread.join(1.0)
+    assert not thread.is_alive()
+
+    lane, batch = result["first"]
+    assert lane.name == INTERACTIVE_LANE
+    assert texts(batch) == ["interactive0"]
+    bulk = scheduler.lanes[BULK_LANE]
+    assert texts(bulk.queue) == ["bulk0"]
+    assert bulk.preempted and bulk.preemptions == 1
+
+    # The preempted lane runs next without waiting for its fill window again
+    started = time.monotonic()
+    lane, batch = scheduler._next_batch()
+    assert lane.name == BULK_LANE and texts(batch) == ["bulk0"]
+    assert time.monotonic() - started < 1.0
+    assert not bulk.preempted
+    scheduler._running = False
+
+
+# End to end through the worker thread
+
+def test_predict_returns_the_batch_result(scheduler):
+    assert scheduler.predict("hello", timeout=5) == fake_batch_fn()(["hello"])[0]
+
+def test_predict_many_keeps_input_order_and_trims_top_n(scheduler):
+    results = scheduler.predict_many(["a", "b", "c"], top_n=2)
+    assert [list(result) for result in results] == [["a-0", "a-1"], ["b-0", "b-1"], ["c-0", "c-1"]]
+
+def test_expired_work_is_dropped_before_the_forward_pass():
+    calls = []
+    scheduler = make_scheduler(fake_batch_fn(calls))
+    try:
+        with pytest.raises(DeadlineExceeded):
+            scheduler.predict("late", deadline=time.monotonic() - 1)
+        future = scheduler.submit("late", deadline=time.monotonic() - 1)
+        with pytest.raises(DeadlineExceeded):
+            future.result(timeout=5)
+        assert scheduler.predict("on time", timeout=5)
+        assert ["late"] not in calls
+    finally:
+        scheduler.stop()
+
+def test_batch_failure_is_raised_to_every_caller():
+    def failing_batch_fn(texts, top_n=TOP_N):
+        raise RuntimeError("model exploded")
+    scheduler = make_scheduler(failing_batch_fn)
+    try:
+        with pytest.raises(RuntimeError, match="model exploded"):
+            scheduler.predict_many(["a", "b"])
+    finally:
+        scheduler.stop()
+
+def test_submit_rejects_unknown_lanes(scheduler):
+    with pytest.raises(ValueError):
+        scheduler.submit("text", lane="express")
+
+
+# Lane activity, used by batch jobs to yield to interactive work
+
+def test_lane_busy_tracks_queued_and_running_texts_per_lane():
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_batch_fn(texts, top_n=TOP_N):
+        started.set()
+        release.wait(5)
+        return fake_batch_fn()(texts, top_n)
+
+    scheduler = make_scheduler(slow_batch_fn)
+    try:
+        bulk = scheduler.submit("bulk text", lane=BULK_LANE)
+        assert started.wait(5)
+        # A running bulk batch does not count as interactive work
+        assert scheduler.lane_busy(BULK_LANE)
+        assert not scheduler.lane_busy(INTERACTIVE_LANE)
+
+        interactive = scheduler.submit("interactive text")
+        assert scheduler.lane_busy(INTERACTIVE_LANE)
+        release.set()
+        interactive.result(timeout=5)
+        bulk.result(timeout=5)
+        assert not scheduler.lane_busy(INTERACTIVE_LANE)
+        assert not scheduler.lane_busy(BULK_LANE)
+    finally:
+        release.set()
+        scheduler.stop()
+
+def test_cancelled_texts_leave_the_lane():
+    scheduler = make_scheduler()
+    # Pretend the worker runs so submit does not start it
+    scheduler._running = True
+    future = scheduler.submit("text")
+    assert scheduler.lane_busy(INTERACTIVE_LANE)
+    future.cancel()
+    assert not scheduler.lane_busy(INTERACTIVE_LANE)
+    scheduler._running = False
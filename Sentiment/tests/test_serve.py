@@ -0,0 +1,59 @@
+"""
+Tests for the pre-fork server's worker lifecycle. A fake app module stands
+in for main so no model or database is needed.
+"""
+import os
+import sys
+import time
+import types
+import signal
+
+import pytest
+
+import serve
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="pre-fork server needs os.fork")
+
+
+def wait_for(path, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            raise AssertionError(f"{path} was not written")
+        time.sleep(0.01)
+
+def test_worker_drains_the_write_buffer_on_sigterm(tmp_path, monkeypatch):
+    ready_path = str(tmp_path / "ready")
+    drained_path = str(tmp_path / "drained")
+
+    # Stands in for main: buffered predictions are written out by cleanup()
+    fake_main = types.ModuleType("main")
+    fake_main.write_buffer = ["prediction-1", "prediction-2"]
+
+    def cleanup():
+        with open(drained_path, "w") as f:
+            f.write("\n".join(fake_main.write_buffer))
+        fake_main.write_buffer.clear()
+    fake_main.cleanup = cleanup
+    monkeypatch.setitem(sys.modules, "main", fake_main)
+
+    def fake_run_worker(index, listen_fd, host, port, torch_threads):
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        open(ready_path, "w").close()
+        while True:
+            time.sleep(0.05)
+    monkeypatch.setattr(serve, "run_worker", fake_run_worker)
+
+    pid = serve.spawn_worker(0, -1, "127.0.0.1", 0, 1)
+    try:
+        wait_for(ready_path)
+        os.kill(pid, signal.SIGTERM)
+        _, status = os.waitpid(pid, 0)
+    except BaseException:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        raise
+
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    with open(drained_path) as f:
+        assert f.read().splitlines() == ["prediction-1", "prediction-2"]